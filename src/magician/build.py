@@ -0,0 +1,123 @@
+"""
+Ahead-of-time compilation of every schema, for `magic build`.
+
+Schemas are compiled in a pool of worker processes, each writing into its
+schema's own scripts folder. Workers only compile: hashing, skipping
+schemas that are up to date and storing results in the compile manifest
+happen in the calling process, so that the manifest has a single writer.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import attrs
+
+from magician.cache import CompileCache, SchemaCache
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.parser import parse_config_file
+from magician.config.schema import WizardBackendConfig
+from magician.runner import RunOutcome
+from magician.settings import AppConfig
+
+
+@attrs.define
+class CompiledSchema:
+    schema: str
+    root_backend: Optional[WizardBackendConfig] = None
+    scripts: List[Path] = attrs.Factory(list)
+    context: Dict[str, str] = attrs.Factory(dict)
+    error: Optional[str] = None
+    duration: float = 0
+
+
+def compile_schema(
+    app_cfg: AppConfig, schema_name: str, schema_path: Path
+) -> CompiledSchema:
+    """Compiles a single schema, within a worker process."""
+    started = time.perf_counter()
+    try:
+        cache = SchemaCache(app_cfg=app_cfg) if app_cfg.schema_cache else None
+        config = parse_config_file(file=schema_path, cache=cache)
+        result = ConfigInterpreter(app_cfg=app_cfg).compile(
+            config=config, schema_name=schema_name
+        )
+    except Exception as e:
+        return CompiledSchema(
+            schema=schema_name,
+            error=str(e) or e.__class__.__name__,
+            duration=time.perf_counter() - started,
+        )
+    return CompiledSchema(
+        schema=schema_name,
+        root_backend=result.root_backend,
+        scripts=result.scripts,
+        context=result.context,
+        duration=time.perf_counter() - started,
+    )
+
+
+def build(
+    app_cfg: AppConfig,
+    schemas: Dict[str, Path],
+    jobs: Optional[int] = None,
+    force: bool = False,
+) -> List[RunOutcome]:
+    """
+    Compiles schemas whose compile cache entry is missing or outdated (all
+    of them with `force`), with `jobs` worker processes (one per core by
+    default). Outcomes of skipped schemas are marked as cached.
+    """
+    # a build shouldn't evict what it just compiled
+    compile_cache = CompileCache(
+        app_cfg=app_cfg,
+        max_entries=max(app_cfg.compile_cache_max_entries, len(schemas)),
+    )
+    outcomes: List[RunOutcome] = []
+    keys: Dict[str, str] = {}
+    to_compile: Dict[str, Path] = {}
+    for name, path in schemas.items():
+        keys[name] = compile_cache.compute_key(schema_name=name, schema_path=path)
+        if not force and compile_cache.get(schema_name=name, key=keys[name]):
+            outcomes.append(RunOutcome(schema=name, ok=True, cached=True))
+        else:
+            to_compile[name] = path
+
+    if to_compile:
+        workers = min(jobs or os.cpu_count() or 1, len(to_compile))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(compile_schema, app_cfg, name, path)
+                for name, path in to_compile.items()
+            ]
+            for future in as_completed(futures):
+                compiled = future.result()
+                outcomes.append(_store(compile_cache, compiled, keys, to_compile))
+
+    return sorted(outcomes, key=lambda outcome: outcome.schema)
+
+
+def _store(
+    compile_cache: CompileCache,
+    compiled: CompiledSchema,
+    keys: Dict[str, str],
+    schemas: Dict[str, Path],
+) -> RunOutcome:
+    name = compiled.schema
+    if compiled.error is not None or compiled.root_backend is None:
+        return RunOutcome(
+            schema=name, ok=False, error=compiled.error, duration=compiled.duration
+        )
+
+    compile_cache.put(
+        schema_name=name,
+        key=keys[name],
+        schema_path=schemas[name].resolve(),
+        root_backend=compiled.root_backend,
+        scripts=compiled.scripts,
+        context=compiled.context,
+        compile_duration=compiled.duration,
+    )
+    return RunOutcome(schema=name, ok=True, duration=compiled.duration)
@@ -0,0 +1,7 @@
+"""
+Deals with caching compiled artifacts between invocations.
+"""
+
+from .compiled import CompileCache, CompileCacheEntry
+from .schemas import SchemaCache, WarmSchemaCache
+from .index import SchemaIndex, SchemaIndexEntry
@@ -0,0 +1,247 @@
+import fcntl
+import functools
+import hashlib
+import importlib.metadata
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError
+
+from magician.config.context import current_context
+from magician.config.schema import WizardBackendConfig
+from magician.settings import AppConfig
+from magician.utils.atomic import atomic_open
+
+# 2: scripts moved into per-schema folders
+# 3: entries record the context their scripts depend on
+MANIFEST_VERSION = 3
+# cache hits only write the manifest to record their use this often
+LAST_USED_RESOLUTION = 60 * 60 * 24
+
+T = TypeVar("T")
+
+
+@functools.cache
+def magician_version() -> str:
+    try:
+        return importlib.metadata.version("magician")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class CompileCacheEntry(BaseModel):
+    key: str
+    schema_path: Path
+    root_backend: WizardBackendConfig
+    scripts: List[Path] = Field(default_factory=list)
+    # context the scripts were compiled in, as far as they depend on it
+    context: Dict[str, str] = Field(default_factory=dict)
+    # seconds compiling took
+    compile_duration: float = 0
+    created_at: float
+    last_used: float
+
+
+class CompileManifest(BaseModel):
+    version: int = MANIFEST_VERSION
+    entries: Dict[str, CompileCacheEntry] = Field(default_factory=dict)
+
+
+class CompileCache:
+    """
+    Manifest of compiled scripts living in the data folder, keyed by schema name.
+
+    An entry is only valid while its key (a hash over everything that feeds
+    compilation) matches, the context its scripts depend on (see
+    `magician.config.context`) is unchanged and every script it lists still
+    exists.
+    """
+
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        max_entries: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.app_cfg = app_cfg
+        self.max_entries = (
+            max_entries
+            if max_entries is not None
+            else app_cfg.compile_cache_max_entries
+        )
+        self.max_age = max_age if max_age is not None else app_cfg.compile_cache_max_age
+        self.manifest_path = app_cfg.data_folder / "cache" / "manifest.json"
+        self._manifest: Optional[CompileManifest] = None
+        # mtime of the manifest file as last read or written here
+        self._manifest_mtime_ns: Optional[int] = None
+
+    @property
+    def manifest(self) -> CompileManifest:
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        return self._manifest
+
+    def _file_mtime_ns(self) -> Optional[int]:
+        try:
+            return self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> None:
+        """Drops the loaded manifest if another process rewrote it since."""
+        if self._manifest is not None and (
+            self._file_mtime_ns() != self._manifest_mtime_ns
+        ):
+            logger.trace("Compile manifest changed on disk, reloading it")
+            self._manifest = None
+
+    def _load_manifest(self) -> CompileManifest:
+        self._manifest_mtime_ns = self._file_mtime_ns()
+        try:
+            raw = self.manifest_path.read_bytes()
+        except FileNotFoundError:
+            return CompileManifest()
+        try:
+            manifest = CompileManifest.model_validate_json(raw)
+        except ValidationError:
+            logger.trace(f"Discarding unreadable compile manifest {self.manifest_path}")
+            return CompileManifest()
+        if manifest.version != MANIFEST_VERSION:
+            return CompileManifest()
+        return manifest
+
+    def _update_manifest(self, change: Callable[[CompileManifest], T]) -> T:
+        """
+        Applies `change` to the manifest as currently on disk and writes it
+        back, holding a lock so that changes of other processes (reading it
+        in between) aren't lost.
+        """
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        with open(self.manifest_path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self._load_manifest()
+            changed = change(manifest)
+            with atomic_open(self.manifest_path) as file:
+                file.write(manifest.model_dump_json())
+            self._manifest = manifest
+            self._manifest_mtime_ns = self._file_mtime_ns()
+        return changed
+
+    def compute_key(self, *, schema_name: str, schema_path: Path) -> str:
+        """
+        Hashes schema contents, app config and magician version. Backend
+        options are part of the schema contents.
+        """
+        digest = hashlib.sha256()
+        for part in (
+            magician_version().encode(),
+            schema_name.encode(),
+            schema_path.read_bytes(),
+            self.app_cfg.model_dump_json().encode(),
+        ):
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def get(self, *, schema_name: str, key: str) -> Optional[CompileCacheEntry]:
+        entry = self.manifest.entries.get(schema_name)
+        if entry is None or entry.key != key:
+            return None
+        for name, value in entry.context.items():
+            if current_context(name) != value:
+                logger.trace(f"Compiled scripts for '{schema_name}' depend on {name}")
+                return None
+        if not all(script.exists() for script in entry.scripts):
+            logger.trace(f"Compiled scripts for '{schema_name}' went missing")
+            return None
+
+        now = time.time()
+        if now - entry.last_used > LAST_USED_RESOLUTION:
+            self._update_manifest(
+                lambda manifest: self._touch(manifest, schema_name, key, now)
+            )
+        entry.last_used = now
+        return entry
+
+    @staticmethod
+    def _touch(
+        manifest: CompileManifest, schema_name: str, key: str, now: float
+    ) -> None:
+        entry = manifest.entries.get(schema_name)
+        if entry is not None and entry.key == key:
+            entry.last_used = now
+
+    def put(
+        self,
+        *,
+        schema_name: str,
+        key: str,
+        schema_path: Path,
+        root_backend: WizardBackendConfig,
+        scripts: List[Path],
+        context: Optional[Dict[str, str]] = None,
+        compile_duration: float = 0,
+    ) -> CompileCacheEntry:
+        now = time.time()
+        entry = CompileCacheEntry(
+            key=key,
+            schema_path=schema_path,
+            root_backend=root_backend,
+            scripts=scripts,
+            context=context or {},
+            compile_duration=compile_duration,
+            created_at=now,
+            last_used=now,
+        )
+
+        def change(manifest: CompileManifest) -> None:
+            manifest.entries[schema_name] = entry
+            self._evict(manifest, keep=schema_name)
+
+        self._update_manifest(change)
+        return entry
+
+    def invalidate(self, *, schema_name: str) -> None:
+        self.refresh()
+        if schema_name in self.manifest.entries:
+            self._update_manifest(
+                lambda manifest: manifest.entries.pop(schema_name, None)
+            )
+
+    def evict(self, *, keep: Optional[str] = None) -> List[str]:
+        """
+        Drops entries unused for longer than `max_age` seconds, then the least
+        recently used ones beyond `max_entries`, removing their scripts.
+        """
+        return self._update_manifest(lambda manifest: self._evict(manifest, keep=keep))
+
+    def _evict(self, manifest: CompileManifest, keep: Optional[str]) -> List[str]:
+        now = time.time()
+        by_recency = sorted(
+            manifest.entries.items(),
+            key=lambda item: item[1].last_used,
+            reverse=True,
+        )
+        evicted = []
+        kept = 0
+        for schema_name, entry in by_recency:
+            if schema_name == keep:
+                kept += 1
+                continue
+            if now - entry.last_used > self.max_age or kept >= self.max_entries:
+                evicted.append(schema_name)
+            else:
+                kept += 1
+
+        for schema_name in evicted:
+            entry = manifest.entries.pop(schema_name)
+            for script in entry.scripts:
+                try:
+                    os.remove(script)
+                except FileNotFoundError:
+                    pass
+            logger.trace(f"Evicted compiled scripts for '{schema_name}'")
+        return evicted
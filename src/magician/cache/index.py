@@ -0,0 +1,234 @@
+import fcntl
+import fnmatch
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import yaml
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError
+
+from magician.cache.schemas import RACY_MTIME_WINDOW_NS, SchemaCache
+from magician.config.parser import parse_config_file
+from magician.settings import AppConfig
+from magician.utils.atomic import atomic_open
+
+INDEX_VERSION = 1
+# earlier suffixes win when a schema exists under both
+SCHEMA_SUFFIXES = (".yml", ".yaml")
+# marks entries whose contents were not read yet
+UNREAD_MTIME = -1
+
+
+class SchemaIndexEntry(BaseModel):
+    name: str
+    path: Path
+    mtime_ns: int = UNREAD_MTIME
+    size: int = -1
+    project_name: Optional[str] = None
+    description: Optional[str] = None
+    root_panes: int = 0
+    child_panes: int = 0
+    error: Optional[str] = None
+
+
+class SchemaIndexData(BaseModel):
+    version: int = INDEX_VERSION
+    folder: Optional[Path] = None
+    folder_mtime_ns: int = UNREAD_MTIME
+    entries: Dict[str, SchemaIndexEntry] = Field(default_factory=dict)
+
+
+class SchemaIndex:
+    """
+    Persistent index of the schemas folder.
+
+    Name lookups only stat the folder itself, rescanning it when its mtime
+    moved (files were added, removed or renamed). Listing additionally
+    stats every schema and re-reads the ones whose mtime or size changed.
+    """
+
+    def __init__(
+        self, app_cfg: AppConfig, schema_cache: Optional[SchemaCache] = None
+    ) -> None:
+        self.app_cfg = app_cfg
+        self.folder = app_cfg.schemas_folder.resolve()
+        self.index_path = app_cfg.data_folder / "cache" / "index.json"
+        self.schema_cache = schema_cache
+        self._data: Optional[SchemaIndexData] = None
+
+    @property
+    def data(self) -> SchemaIndexData:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def _load(self) -> SchemaIndexData:
+        try:
+            data = SchemaIndexData.model_validate_json(self.index_path.read_bytes())
+        except FileNotFoundError:
+            return SchemaIndexData(folder=self.folder)
+        except (ValidationError, ValueError, OSError):
+            logger.trace(f"Discarding unreadable schema index {self.index_path}")
+            return SchemaIndexData(folder=self.folder)
+        if data.version != INDEX_VERSION or data.folder != self.folder:
+            return SchemaIndexData(folder=self.folder)
+        return data
+
+    def _save(self, updated: Set[str], scanned: bool) -> None:
+        """
+        Merges changes into the index as currently on disk, under a lock.
+        Which schemas exist comes with the folder mtime they were scanned
+        at, so it's only taken from here if the folder got `scanned`;
+        otherwise only the `updated` entries are.
+        """
+        os.makedirs(self.index_path.parent, exist_ok=True)
+        with open(self.index_path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            saved = self._load()
+            if scanned:
+                saved.folder_mtime_ns = self.data.folder_mtime_ns
+                saved.entries = {
+                    name: saved.entries[name]
+                    if name not in updated
+                    and name in saved.entries
+                    and saved.entries[name].path == entry.path
+                    else entry
+                    for name, entry in self.data.entries.items()
+                }
+            else:
+                for name in updated & saved.entries.keys():
+                    saved.entries[name] = self.data.entries[name]
+            with atomic_open(self.index_path) as file:
+                file.write(saved.model_dump_json())
+            self._data = saved
+
+    def _folder_mtime_ns(self) -> Optional[int]:
+        try:
+            return self.folder.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _scan(self) -> Dict[str, Path]:
+        found: Dict[str, Path] = {}
+        with os.scandir(self.folder) as it:
+            for dir_entry in it:
+                path = Path(dir_entry.path)
+                if path.suffix not in SCHEMA_SUFFIXES or not dir_entry.is_file():
+                    continue
+                current = found.get(path.stem)
+                if current is None or SCHEMA_SUFFIXES.index(
+                    path.suffix
+                ) < SCHEMA_SUFFIXES.index(current.suffix):
+                    found[path.stem] = path
+        return found
+
+    def _read_entry(self, name: str, path: Path) -> SchemaIndexEntry:
+        stat = path.stat()
+        entry = SchemaIndexEntry(
+            name=name, path=path, mtime_ns=stat.st_mtime_ns, size=stat.st_size
+        )
+        try:
+            config = parse_config_file(file=path, cache=self.schema_cache)
+        except (ValueError, yaml.YAMLError, OSError) as e:
+            entry.error = str(e).splitlines()[0]
+            return entry
+
+        entry.project_name = config.project.name
+        entry.description = config.project.description
+        entry.root_panes = len(config.project.setup)
+        entry.child_panes = sum(
+            len(root_pane.panes or {})
+            for root_pane in config.project.setup.values()
+            if root_pane
+        )
+        return entry
+
+    def refresh(self, *, read: bool = True) -> None:
+        """
+        Syncs the index with the schemas folder. With `read` unset, new or
+        changed files are only recorded by name and read on a later refresh.
+        """
+        folder_mtime_ns = self._folder_mtime_ns()
+        if folder_mtime_ns is None:
+            self.data.entries.clear()
+            self.data.folder_mtime_ns = UNREAD_MTIME
+            return
+
+        scanned = False
+        updated: Set[str] = set()
+        entries = self.data.entries
+        if folder_mtime_ns != self.data.folder_mtime_ns:
+            found = self._scan()
+            for name in entries.keys() - found.keys():
+                del entries[name]
+            for name, path in found.items():
+                if name not in entries or entries[name].path != path:
+                    entries[name] = SchemaIndexEntry(name=name, path=path)
+                    updated.add(name)
+            racy = time.time_ns() - folder_mtime_ns < RACY_MTIME_WINDOW_NS
+            self.data.folder_mtime_ns = UNREAD_MTIME if racy else folder_mtime_ns
+            scanned = True
+
+        if read:
+            for name, entry in entries.items():
+                try:
+                    stat = entry.path.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                    entries[name] = self._read_entry(name, entry.path)
+                    updated.add(name)
+
+        if scanned or updated:
+            self._save(updated, scanned=scanned)
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """Returns the path of the schema with the given name, if any."""
+        if self._folder_mtime_ns() != self.data.folder_mtime_ns:
+            self.refresh(read=False)
+
+        entry = self.data.entries.get(name)
+        return entry.path if entry else None
+
+    def match(self, pattern: str) -> Dict[str, Path]:
+        """
+        Returns paths of the schemas whose name matches a glob pattern, or
+        of the single schema with the given name.
+        """
+        if not any(c in pattern for c in "*?["):
+            path = self.resolve(pattern)
+            return {pattern: path} if path else {}
+
+        if self._folder_mtime_ns() != self.data.folder_mtime_ns:
+            self.refresh(read=False)
+        return {
+            name: self.data.entries[name].path
+            for name in sorted(self.data.entries)
+            if fnmatch.fnmatchcase(name, pattern)
+        }
+
+    def list(self, filter: Optional[str] = None) -> List[SchemaIndexEntry]:
+        """
+        Lists indexed schemas, optionally filtered by a glob pattern or a
+        substring of their name, project name or description.
+        """
+        self.refresh()
+
+        entries = sorted(self.data.entries.values(), key=lambda entry: entry.name)
+        if not filter:
+            return entries
+
+        pattern = filter.lower()
+        if not any(c in pattern for c in "*?["):
+            pattern = f"*{pattern}*"
+        return [
+            entry
+            for entry in entries
+            if any(
+                fnmatch.fnmatchcase(field.lower(), pattern)
+                for field in (entry.name, entry.project_name, entry.description)
+                if field
+            )
+        ]
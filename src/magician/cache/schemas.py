@@ -0,0 +1,127 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from magician.cache.compiled import magician_version
+from magician.config.parser import load_yaml, validate_config
+from magician.config.schema import MagicConfigSchema
+from magician.settings import AppConfig
+from magician.utils.atomic import atomic_open
+
+# files modified this recently may change again within the same mtime tick,
+# so their mtime alone is not trusted on the next load
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+
+class CachedSchema(BaseModel):
+    magician_version: str
+    mtime_ns: int
+    size: int
+    sha256: str
+    config: MagicConfigSchema
+
+
+class SchemaCache:
+    """
+    On-disk cache of validated schemas. Entries are reused while the source
+    file's mtime and size are unchanged, or its contents hash to the same value.
+    """
+
+    def __init__(self, app_cfg: AppConfig) -> None:
+        self.app_cfg = app_cfg
+        self.folder = app_cfg.data_folder / "cache" / "schemas"
+
+    def _entry_path(self, file: Path) -> Path:
+        key = hashlib.sha256(str(file.resolve()).encode()).hexdigest()[:32]
+        return self.folder / f"{key}.json"
+
+    def _read(self, file: Path) -> Optional[CachedSchema]:
+        try:
+            raw = self._entry_path(file).read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            cached = CachedSchema.model_validate_json(raw)
+        except ValidationError:
+            logger.trace(f"Discarding unreadable schema cache entry for {file}")
+            return None
+        if cached.magician_version != magician_version():
+            return None
+        return cached
+
+    def _write(self, file: Path, cached: CachedSchema) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        with atomic_open(self._entry_path(file)) as entry:
+            entry.write(cached.model_dump_json(by_alias=True))
+
+    def load(self, file: Path) -> MagicConfigSchema:
+        stat = file.stat()
+        cached = self._read(file)
+        if (
+            cached
+            and cached.mtime_ns == stat.st_mtime_ns
+            and cached.size == stat.st_size
+        ):
+            return cached.config
+
+        contents = file.read_bytes()
+        digest = hashlib.sha256(contents).hexdigest()
+        if cached and cached.sha256 == digest:
+            config = cached.config
+        else:
+            config = validate_config(load_yaml(contents))
+
+        racy = time.time_ns() - stat.st_mtime_ns < RACY_MTIME_WINDOW_NS
+        self._write(
+            file,
+            CachedSchema(
+                magician_version=magician_version(),
+                mtime_ns=-1 if racy else stat.st_mtime_ns,
+                size=stat.st_size,
+                sha256=digest,
+                config=config,
+            ),
+        )
+        return config
+
+    def remove(self, file: Path) -> None:
+        self._entry_path(file).unlink(missing_ok=True)
+
+
+class WarmSchemaCache(SchemaCache):
+    """
+    Keeps validated schemas in memory on top of the on-disk cache (unless
+    `persist` is off), for long-lived processes. Entries are reused while
+    the file's mtime and size are unchanged.
+    """
+
+    def __init__(self, app_cfg: AppConfig, persist: bool = True) -> None:
+        super().__init__(app_cfg=app_cfg)
+        self.persist = persist
+        self._schemas: Dict[Path, Tuple[int, int, MagicConfigSchema]] = {}
+
+    def load(self, file: Path) -> MagicConfigSchema:
+        stat = file.stat()
+        key = file.resolve()
+        cached = self._schemas.get(key)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        if self.persist:
+            config = super().load(file)
+        else:
+            config = validate_config(load_yaml(file.read_bytes()))
+        if time.time_ns() - stat.st_mtime_ns >= RACY_MTIME_WINDOW_NS:
+            self._schemas[key] = (stat.st_mtime_ns, stat.st_size, config)
+        else:
+            self._schemas.pop(key, None)
+        return config
+
+    def remove(self, file: Path) -> None:
+        self._schemas.pop(file.resolve(), None)
+        super().remove(file)
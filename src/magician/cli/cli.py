@@ -1,15 +1,92 @@
+"""
+Command line entrypoint.
+
+Keep module level imports down to what every command needs: pydantic,
+YAML parsing and plugins are imported inside the commands using them so
+that `magic --help` and friends start fast.
+"""
+
 import pathlib
 import click
 import shutil
 import os
 import subprocess
-from magician.config.interpreter import ConfigInterpreter
-from magician.config.parser import parse_config_file
-from magician.settings import get_config
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from magician.runner import RunOutcome
+    from magician.settings import AppConfig
+
+TRACED = "magician.traced"
+# set in the context object when the daemon already declined the run
+TRIED_DAEMON = "tried_daemon"
 
 
 @click.group()
-def cli(): ...
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="Writes timed spans of this invocation as a Chrome trace to the given file.",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    default=False,
+    help="Prints a summary table of timed spans to stderr.",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    profile: Optional[pathlib.Path] = None,
+    timings: bool = False,
+):
+    if not profile and not timings:
+        return
+    # traced invocations stay in process, for there to be something to trace
+    ctx.meta[TRACED] = True
+
+    from magician.utils import tracing
+
+    tracing.enable()
+
+    def report():
+        if profile:
+            tracing.tracer.write_chrome_trace(profile)
+        if timings:
+            click.echo(tracing.tracer.format_summary(), err=True)
+
+    ctx.call_on_close(report)
+
+
+def find_schema(app_cfg: "AppConfig", schema: str) -> Optional[pathlib.Path]:
+    from magician.cache import SchemaIndex
+
+    return SchemaIndex(app_cfg=app_cfg).resolve(schema)
+
+
+def echo_outcome(outcome: "RunOutcome", detail: str = "") -> None:
+    if not outcome.ok:
+        status = click.style("fail", fg="red")
+        error = (outcome.error or "").replace("\n", "\n      ")
+        click.echo(f"{status}  {outcome.schema}: {error}", err=True)
+        return
+
+    status = click.style("ok", fg="green")
+    detail = f"{detail}{outcome.duration * 1000:.0f} ms"
+    if outcome.cached:
+        detail += ", cached"
+    click.echo(f"{status}    {outcome.schema} ({detail})", err=True)
+
+
+def precompile_schema(app_cfg: "AppConfig", schema: str, path: pathlib.Path) -> None:
+    """Compiles a schema right after editing it, reporting whether it's valid."""
+    from magician.runner import SchemaRunner
+
+    if path.exists():
+        outcome = SchemaRunner(app_cfg=app_cfg).precompile(schema, path)
+        echo_outcome(outcome, detail="compiled in ")
 
 
 @cli.command()
@@ -21,14 +98,14 @@ def edit(schema: str):
     """
     Creates new schema based on a template.
     """
+    from magician.settings import get_config
+
     app_cfg = get_config()
-    dst_path = app_cfg.schemas_folder / f"{schema}.yml"
-    if not dst_path.exists():
-        dst_path = app_cfg.schemas_folder / f"{schema}.yaml"
-    if not dst_path.exists():
+    dst_path = find_schema(app_cfg, schema)
+    if not dst_path:
         click.echo(
             click.style(
-                f"Schema under the name '{schema}' does not exist in {dst_path}",
+                f"Schema under the name '{schema}' does not exist in {app_cfg.schemas_folder}",
                 fg="red",
             )
         )
@@ -36,6 +113,7 @@ def edit(schema: str):
 
     editor = os.environ.get("EDITOR", "nano")
     subprocess.call([editor, dst_path.resolve()])
+    precompile_schema(app_cfg, schema, dst_path)
 
 
 @cli.command()
@@ -54,6 +132,8 @@ def new(schema: str, empty: bool = False):
     """
     Creates new schema based on a template.
     """
+    from magician.settings import get_config
+
     app_cfg = get_config()
     dst_path = app_cfg.schemas_folder / f"{schema}.yml"
 
@@ -84,6 +164,7 @@ def new(schema: str, empty: bool = False):
 
     editor = os.environ.get("EDITOR", "nano")
     subprocess.call([editor, dst_path.resolve()])
+    precompile_schema(app_cfg, schema, dst_path)
 
 
 @cli.command()
@@ -95,12 +176,12 @@ def remove(schema: str):
     """
     Removes a schema.
     """
+    from magician.settings import get_config
+
     app_cfg = get_config()
-    dst_path = app_cfg.schemas_folder.resolve() / f"{schema}.yml"
+    dst_path = find_schema(app_cfg, schema)
 
-    if not dst_path.exists():
-        dst_path = app_cfg.schemas_folder / f"{schema}.yaml"
-    if not dst_path.exists():
+    if not dst_path:
         click.echo(
             click.style(f"Schema under the name '{schema}' does not exist.", fg="red")
         )
@@ -122,6 +203,8 @@ def save(schema: pathlib.Path):
     """
     Saves local schema file over to the internal schemas folder.
     """
+    from magician.settings import get_config
+
     app_cfg = get_config()
     dst_path = app_cfg.schemas_folder / f"{schema.stem}.yml"
 
@@ -137,29 +220,393 @@ def save(schema: pathlib.Path):
         src=schema,
         dst=dst_path,
     )
+    precompile_schema(app_cfg, schema.stem, dst_path)
+
+
+@cli.command(name="list")
+@click.option(
+    "--filter",
+    "-f",
+    "filter_",
+    type=str,
+    default=None,
+    help="Glob or substring matched against schema and project names/descriptions.",
+)
+def list_(filter_: Optional[str] = None):
+    """
+    Lists available schemas.
+    """
+    from magician.cache import SchemaCache, SchemaIndex
+    from magician.settings import get_config
+
+    app_cfg = get_config()
+    index = SchemaIndex(
+        app_cfg=app_cfg,
+        schema_cache=SchemaCache(app_cfg=app_cfg) if app_cfg.schema_cache else None,
+    )
+    for entry in index.list(filter=filter_):
+        if entry.error:
+            click.echo(
+                f"{entry.name}  " + click.style(f"invalid: {entry.error}", fg="red")
+            )
+            continue
+
+        line = click.style(entry.name, bold=True)
+        if entry.project_name:
+            line += f" ({entry.project_name})"
+        line += f"  {entry.root_panes} root / {entry.child_panes} child panes"
+        if entry.description:
+            line += click.style(f"  {entry.description}", dim=True)
+        click.echo(line)
+
+
+@cli.command()
+@click.argument("schemas", nargs=-1, required=True, type=str)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Recompiles the schema even if cached scripts are up to date.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Schemas compiled and launched at once (defaults to run_concurrency).",
+)
+@click.pass_context
+def run(
+    ctx: click.Context,
+    schemas: Tuple[str, ...],
+    no_cache: bool = False,
+    jobs: Optional[int] = None,
+):
+    """
+    Run predefined config(s). Accepts several schema names or glob patterns,
+    which are compiled and launched concurrently. Single schemas are run by
+    `magic serve` while it is up.
+    """
+    tried_daemon = (ctx.obj or {}).get(TRIED_DAEMON)
+    if len(schemas) == 1 and not (no_cache or tried_daemon or ctx.meta.get(TRACED)):
+        from magician.daemon import run_in_daemon
+
+        code = run_in_daemon(schemas[0])
+        if code is not None:
+            ctx.exit(code)
+
+    from magician.utils.tracing import span
+
+    with span("get_config"):
+        from magician.settings import get_config
+
+        app_cfg = get_config()
+    with span("imports"):
+        from magician.cache import SchemaIndex
+        from magician.runner import RunOutcome, SchemaRunner
+
+    index = SchemaIndex(app_cfg=app_cfg)
+    with span("resolve_schema"):
+        resolved = {pattern: index.match(pattern) for pattern in schemas}
+
+    runner = SchemaRunner(app_cfg=app_cfg, use_cache=not no_cache)
+    if len(schemas) == 1 and not any(c in schemas[0] for c in "*?["):
+        schema = schemas[0]
+        schema_path = resolved[schema].get(schema)
+        if not schema_path:
+            click.echo(
+                click.style(
+                    f"No schema named '{schema}' under the folder {app_cfg.schemas_folder}",
+                    fg="red",
+                ),
+                err=True,
+            )
+            raise click.Abort()
+        runner.run(schema_name=schema, schema_path=schema_path)
+        return
+
+    missing = [pattern for pattern, found in resolved.items() if not found]
+    to_run = {name: path for found in resolved.values() for name, path in found.items()}
+    started = time.perf_counter()
+    outcomes = runner.run_many(to_run, jobs=jobs or app_cfg.run_concurrency)
+    elapsed = time.perf_counter() - started
+    outcomes.extend(
+        RunOutcome(schema=pattern, ok=False, error="no matching schema")
+        for pattern in missing
+    )
+
+    for outcome in outcomes:
+        echo_outcome(outcome)
+
+    failed = sum(not outcome.ok for outcome in outcomes)
+    click.echo(
+        f"{len(outcomes) - failed} launched, {failed} failed in {elapsed * 1000:.0f} ms",
+        err=True,
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Worker processes compiling schemas (defaults to one per core).",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Recompiles schemas even if their compiled scripts are up to date.",
+)
+def build(jobs: Optional[int] = None, force: bool = False):
+    """
+    Compiles every schema ahead of time, in parallel, so that runs find
+    them cached. Schemas already compiled as they are are skipped.
+    """
+    from magician.build import build as build_schemas
+    from magician.cache import SchemaIndex
+    from magician.settings import get_config
+
+    app_cfg = get_config()
+    schemas = SchemaIndex(app_cfg=app_cfg).match("*")
+    started = time.perf_counter()
+    outcomes = build_schemas(app_cfg, schemas, jobs=jobs, force=force)
+    elapsed = time.perf_counter() - started
+
+    for outcome in outcomes:
+        if outcome.cached:
+            status = click.style("skip", dim=True)
+            click.echo(f"{status}  {outcome.schema} (up to date)", err=True)
+        else:
+            echo_outcome(outcome, detail="compiled in ")
+
+    failed = sum(not outcome.ok for outcome in outcomes)
+    skipped = sum(outcome.cached for outcome in outcomes)
+    click.echo(
+        f"{len(outcomes) - failed - skipped} compiled, {skipped} up to date, "
+        f"{failed} failed in {elapsed * 1000:.0f} ms",
+        err=True,
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument("schema", type=str)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="Where to write the launcher (defaults to ~/.local/bin/magic-<schema>).",
+)
+def export(schema: str, output: Optional[pathlib.Path] = None):
+    """
+    Writes a standalone launcher for a schema, starting its compiled
+    scripts without Python. It runs `magic run` instead once the schema,
+    app config, magician or anything else the scripts depend on changed.
+    """
+    from magician.launcher import (
+        LauncherException,
+        default_launcher_path,
+        write_launcher,
+    )
+    from magician.runner import SchemaRunner
+    from magician.settings import get_config
+
+    app_cfg = get_config()
+    schema_path = find_schema(app_cfg, schema)
+    if not schema_path:
+        click.echo(
+            click.style(
+                f"No schema named '{schema}' under the folder {app_cfg.schemas_folder}",
+                fg="red",
+            ),
+            err=True,
+        )
+        raise click.Abort()
+
+    entry, _ = SchemaRunner(app_cfg=app_cfg).prepare(
+        schema_name=schema, schema_path=schema_path
+    )
+    path = output or default_launcher_path(schema)
+    try:
+        write_launcher(app_cfg, schema, schema_path, entry, path)
+    except LauncherException as e:
+        click.echo(click.style(str(e), fg="red"), err=True)
+        raise click.Abort()
+    click.echo(f"Wrote {path}", err=True)
+
+
+@cli.command()
+@click.option(
+    "--stop",
+    is_flag=True,
+    default=False,
+    help="Stops the running daemon instead.",
+)
+@click.option(
+    "--watch",
+    "-w",
+    is_flag=True,
+    default=False,
+    help="Also precompiles schemas as they are saved, like `magic watch`.",
+)
+def serve(stop: bool = False, watch: bool = False):
+    """
+    Runs a daemon keeping the app config, parsed schemas and compiled
+    scripts warm, so that `magic run` starts panes sooner. Runs in the
+    foreground until stopped.
+    """
+    from magician.daemon import socket_path
+    from magician.daemon.client import request
+    from magician.settings import get_config
+
+    path = socket_path(get_config().data_folder)
+    if stop:
+        if request({"command": "stop"}, path=path) is None:
+            click.echo("No daemon is running.", err=True)
+        return
+
+    from magician.daemon.server import DaemonError, serve as serve_forever
+
+    click.echo(f"Listening on {path}", err=True)
+    try:
+        serve_forever(path, watch=echo_outcome if watch else None)
+    except DaemonError as e:
+        click.echo(click.style(str(e), fg="red"), err=True)
+        raise click.Abort()
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+def watch():
+    """
+    Precompiles schemas as they are saved, reporting invalid ones right
+    away. Compiles for runs from the current directory and environment.
+    Runs in the foreground until interrupted.
+    """
+    from magician.cache import SchemaIndex
+    from magician.runner import SchemaRunner
+    from magician.settings import get_config
+    from magician.watch import SchemaWatcher, precompile
+
+    app_cfg = get_config()
+    runner = SchemaRunner(app_cfg=app_cfg)
+    index = SchemaIndex(app_cfg=app_cfg, schema_cache=runner.schema_cache)
+    click.echo(f"Watching {app_cfg.schemas_folder}", err=True)
+    try:
+        with SchemaWatcher(
+            app_cfg.schemas_folder, debounce=app_cfg.watch_debounce
+        ) as watcher:
+            for names in watcher.changes():
+                for outcome in precompile(runner, index, names):
+                    echo_outcome(outcome, detail="compiled in ")
+    except KeyboardInterrupt:
+        pass
 
 
 @cli.command()
 @click.argument("schema", type=str)
-def run(schema: str):
-    """Run predefined config"""
+@click.option(
+    "--plan",
+    is_flag=True,
+    default=False,
+    help="Prints what would change without touching the sessions.",
+)
+def reconcile(schema: str, plan: bool = False):
+    """
+    Updates running tmux sessions of a schema in place, creating, renaming
+    or killing only the windows that changed.
+    """
+    from magician.plugins.tmux_reconcile import (
+        SessionLayout,
+        reconcile as reconcile_session,
+    )
+    from magician.runner import SchemaRunner
+    from magician.settings import get_config
+
     app_cfg = get_config()
-    schemas_folder = app_cfg.schemas_folder
-    schema_path = schemas_folder / f"{schema}.yml"
-    if not schema_path.exists():
-        schema_path = schemas_folder / f"{schema}.yaml"
-    if not schema_path.exists():
+    schema_path = find_schema(app_cfg, schema)
+    if not schema_path:
         click.echo(
             click.style(
-                f"No schema named '{schema}' under the folder {schemas_folder}",
+                f"No schema named '{schema}' under the folder {app_cfg.schemas_folder}",
                 fg="red",
             ),
             err=True,
         )
         raise click.Abort()
 
-    intr = ConfigInterpreter(app_cfg=app_cfg)
-    magic_cfg = parse_config_file(file=schema_path)
+    entry, _ = SchemaRunner(app_cfg=app_cfg).prepare(
+        schema_name=schema, schema_path=schema_path
+    )
+    layouts = [
+        SessionLayout.read(path)
+        for path in entry.scripts
+        if path.name.endswith(".layout.json")
+    ]
+    if not layouts:
+        click.echo(f"Schema '{schema}' has no tmux sessions to reconcile.", err=True)
+        return
+
+    for layout in layouts:
+        actions = reconcile_session(layout, dry_run=plan)
+        header = click.style(layout.session_name, bold=True)
+        if actions is None:
+            click.echo(f"{header}: not running, `magic run {schema}` starts it")
+            continue
+        click.echo(f"{header}:")
+        for action in actions:
+            click.echo(f"  {action}")
+
+
+@cli.command()
+@click.argument("schema", type=str)
+@click.option(
+    "--runs",
+    "last_runs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only takes the given amount of latest runs into account.",
+)
+@click.option(
+    "--commands",
+    "show_commands",
+    is_flag=True,
+    default=False,
+    help="Also prints how long each pane's commands took, when they exited.",
+)
+def stats(schema: str, last_runs: Optional[int] = None, show_commands: bool = False):
+    """
+    Summarizes how long a schema's panes took to get ready across runs,
+    as recorded with `telemetry` enabled in the config.
+    """
+    from magician.settings import get_config
+    from magician.telemetry import (
+        TelemetryLog,
+        command_summaries,
+        format_summaries,
+        ready_summaries,
+        telemetry_log_path,
+    )
+
+    app_cfg = get_config()
+    runs = TelemetryLog(telemetry_log_path(app_cfg, schema)).read_runs()
+    if last_runs:
+        runs = runs[-last_runs:]
+    summaries = ready_summaries(runs)
+    if not summaries:
+        hint = "" if app_cfg.telemetry else ", set `telemetry = true` in the config"
+        click.echo(f"No telemetry recorded for '{schema}' yet{hint}.", err=True)
+        return
 
-    intr.compile(config=magic_cfg, schema_name=schema)
-    intr.run(config=magic_cfg, schema_name=schema)
+    click.echo(f"{len(runs)} runs of {schema}, time from launch until panes got ready:")
+    click.echo(format_summaries(summaries, title="pane"))
+    if show_commands and (commands := command_summaries(runs)):
+        click.echo()
+        click.echo(format_summaries(commands, title="command"))
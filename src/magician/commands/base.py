@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Any, Tuple
+from typing import Any, List, Tuple
 
 from magician.config.schema import WizardBackendType
+from magician.ir.ops import Op, Opaque
 
 
 class BaseCommand(ABC):
@@ -17,3 +18,10 @@ class BaseCommand(ABC):
 
     @abstractmethod
     def run(self, **_) -> Any: ...
+
+    def to_ops(self) -> List[Op]:
+        """
+        IR ops equivalent to this command. Commands without an IR
+        counterpart are kept opaque and rendered through `run`.
+        """
+        return [Opaque(self)]
@@ -0,0 +1,30 @@
+from typing import Iterable, List, Optional
+
+from magician.ir.ops import Op, lower
+from magician.plugins.base import BasePlugin
+from .base import BaseCommand
+
+
+class OpCommand(BaseCommand):
+    """Command made of IR ops, see `magician.ir`."""
+
+    BACKEND_AGNOSTIC: bool = True
+
+    def __init__(
+        self,
+        *,
+        plugin: BasePlugin,
+        op: Optional[Op] = None,
+        ops: Iterable[Op] = (),
+        **_,
+    ) -> None:
+        super().__init__()
+
+        self.plugin = plugin
+        self.ops = [op, *ops] if op else list(ops)
+
+    def run(self, **_) -> List[str]:
+        return lower(self.ops, plugin=self.plugin)
+
+    def to_ops(self) -> List[Op]:
+        return list(self.ops)
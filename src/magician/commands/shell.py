@@ -4,6 +4,7 @@ from typing import List, Optional, Tuple
 import attrs
 
 from magician.config.schema import WizardBackendType
+from magician.ir.ops import Exec, Op
 from magician.plugins.base import BasePlugin
 from .base import BaseCommand
 
@@ -19,6 +20,7 @@ class ShellCommand(BaseCommand):
     SUPPORTED_BACKENDS: Tuple[WizardBackendType, ...] = (
         WizardBackendType.KITTY,
         WizardBackendType.TMUX,
+        WizardBackendType.TMUX_CONTROL,
     )
 
     def __init__(
@@ -39,7 +41,12 @@ class ShellCommand(BaseCommand):
         self.cmd = cmd
         self.plugin = plugin
 
+    @property
+    def full_cmd(self) -> List[str]:
+        return [*self.opts.prefix, *self.cmd, *self.opts.suffix]
+
     def run(self, **_) -> List[str]:
-        return self.plugin.run_cmd(
-            command=[*self.opts.prefix, *self.cmd, *self.opts.suffix]
-        )
+        return self.plugin.run_cmd(command=self.full_cmd)
+
+    def to_ops(self) -> List[Op]:
+        return [Exec(self.full_cmd)]
@@ -0,0 +1,22 @@
+"""
+Parts of the calling process's environment that compiled scripts can
+depend on, recorded by compiles that do so (see `CompileResult.context`)
+and checked by the compile cache before reusing their scripts.
+"""
+
+import os
+from typing import Callable, Dict
+
+CWD = "cwd"
+PATH = "PATH"
+
+CONTEXT: Dict[str, Callable[[], str]] = {
+    # relative directories of schemas are resolved against it
+    CWD: os.getcwd,
+    # baked into panes started inside virtual environments
+    PATH: lambda: os.environ.get("PATH", ""),
+}
+
+
+def current_context(name: str) -> str:
+    return CONTEXT[name]()
@@ -1,9 +1,12 @@
+import json
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Type
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
 
+import attrs
 from loguru import logger
 from magician.commands.base import BaseCommand
 from magician.commands.shell import ShellCommand, ShellCommandOptions
+from magician.config.context import CWD, PATH, current_context
 from magician.config.schema import (
     MacroCommand,
     MagicConfigSchema,
@@ -14,24 +17,47 @@ from magician.config.schema import (
     WizardBackendType,
     WizardConfig,
 )
+from magician.ir.memo import ExpansionMemo
+from magician.ir.ops import Env, Op, lower
+from magician.ir.optimize import count_ops, optimize, passes_for
 from magician.macros.base import BaseMacro
 from magician.macros.mapping import MACRO_MAPPINGS
 from magician.macros.plugins.create_pane import CreatePaneMacro
 from magician.macros.shell.goto_dir import GotoDirectoryMacro
 from magician.plugins.base import BasePlugin
-from magician.plugins.kitty import KittyPlugin
-from magician.plugins.tmux import TmuxPlugin
+from magician.readiness import (
+    LogProbe,
+    Probe,
+    check_dependencies,
+    probe_from_config,
+    reset_log_offsets,
+    wait_command,
+    write_log_offsets,
+)
+from magician.schedule import gate_command, reset_schedule, start_positions
 from magician.settings import AppConfig
-import functools
+from magician.telemetry import Telemetry, TelemetryLog, telemetry_log_path
+from magician.utils.lazy import LazyMapping
+from magician.utils.tracing import span
 
 ROOT_PLUGINS = {
     WizardBackendType.KITTY,
+    WizardBackendType.TMUX_CONTROL,
 }
 
-PLUGIN_BACKEND_MAP: Dict[WizardBackendType, Type[BasePlugin]] = {
-    WizardBackendType.KITTY: KittyPlugin,
-    WizardBackendType.TMUX: TmuxPlugin,
-}
+# plugin modules are only imported once a schema uses their backend
+PLUGIN_BACKEND_MAP: LazyMapping[WizardBackendType, Type[BasePlugin]] = LazyMapping(
+    {
+        WizardBackendType.KITTY: "magician.plugins.kitty:KittyPlugin",
+        WizardBackendType.TMUX: "magician.plugins.tmux:TmuxPlugin",
+        WizardBackendType.TMUX_CONTROL: (
+            "magician.plugins.tmux_control:TmuxControlPlugin"
+        ),
+    }
+)
+
+# root pane name, and nested pane name for panes of nested backends
+PaneKey = Tuple[str, Optional[str]]
 
 
 class InterpreterException(Exception): ...
@@ -40,6 +66,33 @@ class InterpreterException(Exception): ...
 class NotFoundException(InterpreterException): ...
 
 
+@attrs.define
+class OpStats:
+    before: Dict[str, int] = attrs.field(factory=dict)
+    after: Dict[str, int] = attrs.field(factory=dict)
+
+    def add(self, before: List[Op], after: List[Op]) -> None:
+        for counts, ops in ((self.before, before), (self.after, after)):
+            for name, count in count_ops(ops).items():
+                counts[name] = counts.get(name, 0) + count
+
+
+@attrs.define
+class CompileResult:
+    root_backend: WizardBackendConfig
+    scripts: List[Path] = attrs.field(factory=list)
+    # IR op counts per script, before and after optimization
+    op_stats: Dict[str, OpStats] = attrs.field(factory=dict)
+    # logs that panes wait on, whose sizes get recorded when runs start
+    readiness_logs: List[Path] = attrs.field(factory=list)
+    # values of the calling process's context the scripts depend on
+    context: Dict[str, str] = attrs.field(factory=dict)
+
+    def depends_on_dir(self, path: Optional[Path]) -> None:
+        if path and not path.expanduser().is_absolute():
+            self.context[CWD] = current_context(CWD)
+
+
 class ConfigInterpreter:
     def __init__(self, app_cfg: AppConfig) -> None:
         self.app_cfg = app_cfg
@@ -55,8 +108,25 @@ class ConfigInterpreter:
         else:
             return WizardBackendConfig(name=backend, options={})
 
+    def scripts_folder(self, schema_name: str) -> Path:
+        """
+        Scripts are kept per schema, as nested script names (schema and
+        pane name) could otherwise collide with other schemas' scripts.
+        """
+        return self.app_cfg.data_folder / "scripts" / schema_name
+
+    def setup_plugin(
+        self, backend: WizardBackendConfig, schema_name: str
+    ) -> BasePlugin:
+        plugin_cls = PLUGIN_BACKEND_MAP[backend.name]
+        return plugin_cls(
+            app_cfg=self.app_cfg,
+            scripts_folder=self.scripts_folder(schema_name),
+            **backend.options,
+        )
+
     def setup_plugins(
-        self, config: WizardConfig
+        self, config: WizardConfig, schema_name: str
     ) -> Tuple[BasePlugin, Optional[BasePlugin]]:
         root_backend = self._read_backend(backend=config.root.backend)
 
@@ -65,10 +135,8 @@ class ConfigInterpreter:
                 f"Backend type '{root_backend.name.value}' not supported as a root plugin."
             )
 
-        root_backend_plugin_cls = PLUGIN_BACKEND_MAP[root_backend.name]
-        root_backend_plugin = root_backend_plugin_cls(
-            app_cfg=self.app_cfg,
-            **root_backend.options,
+        root_backend_plugin = self.setup_plugin(
+            backend=root_backend, schema_name=schema_name
         )
 
         if not config.root.nested:
@@ -76,28 +144,32 @@ class ConfigInterpreter:
 
         nested_backend = self._read_backend(backend=config.root.nested.backend)
 
-        nested_backend_cls = PLUGIN_BACKEND_MAP[nested_backend.name]
-        nested_backend_plugin = nested_backend_cls(
-            app_cfg=self.app_cfg,
-            **nested_backend.options,
+        nested_backend_plugin = self.setup_plugin(
+            backend=nested_backend, schema_name=schema_name
         )
 
         return (root_backend_plugin, nested_backend_plugin)
 
+    def _macro_cls(self, cmd: MacroCommand) -> Type[BaseMacro]:
+        macro_cls = MACRO_MAPPINGS.get(cmd.macro)
+        if not macro_cls:
+            raise NotFoundException(f"Macro named '{cmd.macro}' does not exist.")
+        return macro_cls
+
     def gather_raw_commands(
         self,
         cmd_data: List[RunCommand],
         plugin: BasePlugin,
+        cwd: Optional[Path] = None,
     ) -> List[BaseCommand | BaseMacro]:
         raw_cmds = []
         for cmd in cmd_data:
             if isinstance(cmd, MacroCommand):
-                macro_cls = MACRO_MAPPINGS.get(cmd.macro)
-                if not macro_cls:
-                    raise NotFoundException(
-                        f"Macro named '{cmd.macro}' does not exist."
-                    )
-                macro = macro_cls(plugin=plugin, app_cfg=self.app_cfg, **cmd.options)
+                macro_cls = self._macro_cls(cmd)
+                options = cmd.options
+                if macro_cls.CWD_DEPENDENT and cwd and "cwd" not in options:
+                    options = {"cwd": cwd, **options}
+                macro = macro_cls(plugin=plugin, app_cfg=self.app_cfg, **options)
                 raw_cmds.append(macro)
             else:
                 # string commands become shell commands
@@ -110,17 +182,198 @@ class ConfigInterpreter:
     def process_raw_commands(
         self, raw_cmds: List[BaseCommand | BaseMacro]
     ) -> List[BaseCommand]:
-        processed_cmds = []
-        for raw_cmd in raw_cmds:
-            if isinstance(raw_cmd, BaseMacro):
-                cmd = raw_cmd.process()
-                processed_cmds.append(cmd)
+        with span("compile.process_macros"):
+            processed_cmds = []
+            for raw_cmd in raw_cmds:
+                if isinstance(raw_cmd, BaseMacro):
+                    cmd = raw_cmd.process()
+                    processed_cmds.append(cmd)
+                else:
+                    processed_cmds.append(raw_cmd)
+            return processed_cmds
+
+    @staticmethod
+    def _pane_dir(base_dir: Optional[Path], data: PaneEntry) -> Optional[Path]:
+        if data.dir:
+            return base_dir / data.dir if base_dir else data.dir
+        return base_dir
+
+    def readiness_log_path(self, schema_name: str) -> Path:
+        return self.app_cfg.data_folder / "readiness" / f"{schema_name}.jsonl"
+
+    def log_offsets_path(self, schema_name: str) -> Path:
+        return self.app_cfg.data_folder / "readiness" / f"{schema_name}.offsets"
+
+    def compile_wait_commands(
+        self,
+        panes: Dict[str, PaneEntry],
+        root_pane_dir: Optional[Path],
+        schema_name: str,
+        result: Optional[CompileResult] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Builds the readiness wait command of every pane with dependencies.
+        Dependencies without a `ready` probe count as ready once launched.
+        Logs waited on are added to the `result`'s `readiness_logs`.
+        """
+        try:
+            check_dependencies({name: data.depends_on for name, data in panes.items()})
+        except ValueError as e:
+            raise InterpreterException(str(e)) from e
+
+        probes: Dict[str, Probe] = {}
+        timeouts: Dict[str, float] = {}
+        for name, data in panes.items():
+            if data.ready:
+                probes[name] = probe_from_config(
+                    data.ready, cwd=self._pane_dir(root_pane_dir, data)
+                )
+                timeouts[name] = data.ready.timeout
+
+        wait_cmds: Dict[str, List[str]] = {}
+        for name, data in panes.items():
+            dependencies = [dep for dep in data.depends_on if dep in probes]
+            if not dependencies:
+                continue
+            wait_cmds[name] = wait_command(
+                pane=name,
+                probes={dep: probes[dep] for dep in dependencies},
+                timeout=max(timeouts[dep] for dep in dependencies),
+                readiness_log=self.readiness_log_path(schema_name),
+                offsets=self.log_offsets_path(schema_name),
+            )
+            if result is not None:
+                for dep in dependencies:
+                    probe = probes[dep]
+                    if (
+                        isinstance(probe, LogProbe)
+                        and probe.path not in result.readiness_logs
+                    ):
+                        result.readiness_logs.append(probe.path)
+        return wait_cmds
+
+    def schedule_state_path(self, schema_name: str) -> Path:
+        return self.app_cfg.data_folder / "schedule" / f"{schema_name}.json"
+
+    def compile_gate_commands(
+        self, setup: Dict[str, Optional[RootPaneEntry]], schema_name: str
+    ) -> Dict[PaneKey, List[str]]:
+        """
+        Builds the gate command of every pane that has to wait for its turn
+        to start, when starts are throttled. Root panes with nested panes
+        start right away, their nested panes taking turns instead.
+        """
+        max_starts = self.app_cfg.max_concurrent_starts
+        if not max_starts:
+            return {}
+
+        stages: Dict[PaneKey, int] = {}
+        for name, data in setup.items():
+            data = data or RootPaneEntry()
+            if data.nested and data.panes:
+                for child_name, child_data in data.panes.items():
+                    stages[(name, child_name)] = (child_data or PaneEntry()).stage
             else:
-                processed_cmds.append(raw_cmd)
-        return processed_cmds
+                stages[(name, None)] = data.stage
+        positions, stage_ends = start_positions(stages)
+        return {
+            key: gate_command(
+                state=self.schedule_state_path(schema_name),
+                position=position,
+                stage_ends=stage_ends,
+                max_starts=max_starts,
+                interval=self.app_cfg.start_interval,
+            )
+            # the first pane is always part of the first wave
+            for key, position in positions.items()
+            if position
+        }
 
-    def compile(self, config: MagicConfigSchema, schema_name: str) -> None:
-        root_plugin, nested_plugin = self.setup_plugins(config=config.wizard)
+    def build_ops(self, cmds: List[BaseCommand]) -> List[Op]:
+        return [op for cmd in cmds for op in cmd.to_ops()]
+
+    def expand_commands(
+        self,
+        cmd_data: List[RunCommand],
+        plugin: BasePlugin,
+        cwd: Optional[Path],
+        memo: ExpansionMemo,
+    ) -> List[Op]:
+        """
+        Expands run commands into ops, reusing earlier identical expansions
+        for the same plugin (and directory, for macros depending on it).
+        """
+        ops: List[Op] = []
+        for cmd in cmd_data:
+            if isinstance(cmd, MacroCommand):
+                macro_cls = self._macro_cls(cmd)
+                key = (
+                    "macro",
+                    cmd.macro,
+                    json.dumps(cmd.options, sort_keys=True, default=str),
+                    id(plugin),
+                    cwd if macro_cls.CWD_DEPENDENT else None,
+                )
+            else:
+                key = ("shell", cmd, id(plugin))
+            ops.extend(
+                memo.expand(
+                    key,
+                    lambda cmd=cmd: self.build_ops(
+                        self.process_raw_commands(
+                            self.gather_raw_commands(
+                                cmd_data=[cmd], plugin=plugin, cwd=cwd
+                            )
+                        )
+                    ),
+                )
+            )
+        return ops
+
+    def render_ops(
+        self,
+        ops: List[Op],
+        plugin: BasePlugin,
+        stats: Optional[OpStats] = None,
+        telemetry: Optional[Telemetry] = None,
+        result: Optional[CompileResult] = None,
+    ) -> List[str]:
+        """Optimizes ops for the plugin and lowers them into script lines."""
+        if result is not None and any(
+            isinstance(op, Env) and op.name == PATH for op in ops
+        ):
+            result.context[PATH] = current_context(PATH)
+        with span("compile.optimize"):
+            optimized = optimize(ops, passes=passes_for(plugin, telemetry=telemetry))
+        if stats is not None:
+            stats.add(before=ops, after=optimized)
+        with span("compile.lower"):
+            return lower(optimized, plugin=plugin)
+
+    def write_script(
+        self,
+        plugin: BasePlugin,
+        name: str,
+        contents: Iterable[str],
+        result: CompileResult,
+    ) -> None:
+        with span("compile.write_script", plugin=plugin.__class__.__name__, name=name):
+            plugin.write_script(name=name, contents=contents)
+        result.scripts.extend(
+            path.resolve() for path in plugin.get_script_artifacts(script_name=name)
+        )
+
+    def compile(self, config: MagicConfigSchema, schema_name: str) -> CompileResult:
+        with span("compile", schema=schema_name):
+            return self._compile(config=config, schema_name=schema_name)
+
+    def _compile(self, config: MagicConfigSchema, schema_name: str) -> CompileResult:
+        root_plugin, nested_plugin = self.setup_plugins(
+            config=config.wizard, schema_name=schema_name
+        )
+        result = CompileResult(
+            root_backend=self._read_backend(backend=config.wizard.root.backend)
+        )
         logger.trace("Starting config compilation")
         logger.trace(
             f"Root plugin: {root_plugin.__class__.__name__}, Nested plugin: {nested_plugin.__class__.__name__}"
@@ -129,147 +382,323 @@ class ConfigInterpreter:
         project = config.project
         project_dir = project.dir  # base dir will serve as root of project
 
-        root_script_cmds = []
-        root_script_cmds.extend(root_plugin.pre_init())
-        for root_pane_name, root_pane_data in project.setup.items():
-            if not root_pane_data:
-                root_pane_data = RootPaneEntry()
+        memo = ExpansionMemo()
+        telemetry = self.telemetry(schema_name)
+        gate_cmds = self.compile_gate_commands(project.setup, schema_name)
+        root_script_name = f"{schema_name}"
+        root_stats = result.op_stats.setdefault(root_script_name, OpStats())
+
+        def root_script_cmds() -> Iterator[str]:
+            # lines are compiled pane by pane as the script gets written
+            yield from root_plugin.pre_init(session_name=schema_name)
+            for root_pane_name, root_pane_data in project.setup.items():
+                with span("compile.root_pane", name=root_pane_name):
+                    yield from self.compile_root_pane(
+                        name=root_pane_name,
+                        data=root_pane_data or RootPaneEntry(),
+                        project_dir=project_dir,
+                        root_plugin=root_plugin,
+                        nested_plugin=nested_plugin,
+                        schema_name=schema_name,
+                        result=result,
+                        stats=root_stats,
+                        memo=memo,
+                        telemetry=telemetry,
+                        gate_cmds=gate_cmds,
+                    )
+            yield from root_plugin.post_init()
 
-            raw_root_cmds: List[BaseCommand | BaseMacro] = []
-            raw_root_cmds.append(
-                CreatePaneMacro(
-                    app_cfg=self.app_cfg,
-                    plugin=root_plugin,
-                    name=root_pane_name,
-                )
-            )
+        self.write_script(
+            plugin=root_plugin,
+            name=root_script_name,
+            contents=root_script_cmds(),
+            result=result,
+        )
+        logger.trace(
+            f"Expanded {memo.misses} distinct run commands, reused {memo.hits}"
+        )
 
-            # goto dir command if project and/or pane have "dir" attributes
-            root_pane_dir: Optional[Path] = None
-            if project_dir:
-                root_pane_dir = project_dir
-            if root_pane_data.dir:
-                root_pane_dir = (
-                    root_pane_dir / root_pane_data.dir
-                    if root_pane_dir
-                    else root_pane_data.dir
-                )
-            if root_pane_dir:
-                raw_root_cmds.append(
-                    GotoDirectoryMacro(
-                        plugin=root_plugin, app_cfg=self.app_cfg, dir=root_pane_dir
-                    )
-                )
+        offsets_path = self.log_offsets_path(schema_name)
+        if result.readiness_logs:
+            write_log_offsets(offsets_path, result.readiness_logs)
+        else:
+            offsets_path.unlink(missing_ok=True)
 
-            if root_pane_data.run_before:
-                raise InterpreterException("Root pane CANNOT have 'run-before' set.")
+        return result
 
-            root_run_cmds_factory = functools.partial(
-                self.gather_raw_commands, cmd_data=root_pane_data.run or []
+    def compile_root_pane(
+        self,
+        name: str,
+        data: RootPaneEntry,
+        project_dir: Optional[Path],
+        root_plugin: BasePlugin,
+        nested_plugin: Optional[BasePlugin],
+        schema_name: str,
+        result: CompileResult,
+        stats: Optional[OpStats] = None,
+        memo: Optional[ExpansionMemo] = None,
+        telemetry: Optional[Telemetry] = None,
+        gate_cmds: Optional[Dict[PaneKey, List[str]]] = None,
+    ) -> List[str]:
+        memo = memo if memo is not None else ExpansionMemo()
+        gate_cmds = gate_cmds or {}
+        raw_root_cmds: List[BaseCommand | BaseMacro] = []
+        raw_root_cmds.append(
+            CreatePaneMacro(
+                app_cfg=self.app_cfg,
+                plugin=root_plugin,
+                name=name,
+                exec_mode=data.exec_mode,
             )
+        )
 
-            if not root_pane_data.nested:
-                # prepare commands right away and continue to next pane
-                root_run_cmds = root_run_cmds_factory(plugin=root_plugin)
-                raw_root_cmds.extend(root_run_cmds)
-                root_cmds = self.process_raw_commands(raw_cmds=raw_root_cmds)
-                for cmd in root_cmds:
-                    root_script_cmds.extend(cmd.run())
-                continue
-            if not nested_plugin:
-                raise InterpreterException(
-                    "Must have a nested backend for a root pane with nested=true"
-                )
-            if not root_pane_data.panes:
-                raise InterpreterException(
-                    "Root pane with nested=true must have at least 1 child pane."
+        # goto dir command if project and/or pane have "dir" attributes
+        root_pane_dir = self._pane_dir(project_dir, data)
+        result.depends_on_dir(root_pane_dir)
+        if root_pane_dir:
+            raw_root_cmds.append(
+                GotoDirectoryMacro(
+                    plugin=root_plugin, app_cfg=self.app_cfg, dir=root_pane_dir
                 )
+            )
 
-            # if nested, handle nested script
-
-            child_script_cmds = []
-            child_script_cmds.extend(nested_plugin.pre_init())
-            for child_pane_name, child_pane_data in root_pane_data.panes.items():
-                if not child_pane_data:
-                    child_pane_data = PaneEntry()
+        if data.run_before:
+            raise InterpreterException("Root pane CANNOT have 'run-before' set.")
+        if data.depends_on or data.ready:
+            raise InterpreterException(
+                "Only child panes can have 'depends-on' and 'ready' set."
+            )
 
-                raw_child_cmds: List[BaseCommand | BaseMacro] = []
-                raw_child_cmds.append(
-                    CreatePaneMacro(
-                        app_cfg=self.app_cfg,
-                        plugin=nested_plugin,
-                        name=child_pane_name,
+        if not data.nested:
+            # gates would run as their own window when commands aren't run
+            # in a shell, holding nothing back
+            gate_cmd = gate_cmds.get((name, None))
+            if gate_cmd and root_plugin.SHELL_COMMANDS:
+                raw_root_cmds.append(
+                    ShellCommand(
+                        plugin=root_plugin, cmd=gate_cmd, opts=self.shell_cmd_opts
                     )
                 )
+            # prepare commands right away and continue to next pane
+            ops = self.build_ops(self.process_raw_commands(raw_cmds=raw_root_cmds))
+            ops.extend(
+                self.expand_commands(
+                    cmd_data=data.run or [],
+                    plugin=root_plugin,
+                    cwd=root_pane_dir,
+                    memo=memo,
+                )
+            )
+            return self.render_ops(
+                ops,
+                plugin=root_plugin,
+                stats=stats,
+                telemetry=telemetry,
+                result=result,
+            )
+        if not nested_plugin:
+            raise InterpreterException(
+                "Must have a nested backend for a root pane with nested=true"
+            )
+        if not data.panes:
+            raise InterpreterException(
+                "Root pane with nested=true must have at least 1 child pane."
+            )
 
-                child_pane_dir: Optional[Path] = None
-                if root_pane_dir:
-                    child_pane_dir = root_pane_dir
-                if child_pane_data.dir:
-                    child_pane_dir = (
-                        child_pane_dir / child_pane_data.dir
-                        if child_pane_dir
-                        else child_pane_data.dir
-                    )
-                if child_pane_dir:
-                    raw_child_cmds.append(
-                        GotoDirectoryMacro(
-                            plugin=nested_plugin,
-                            app_cfg=self.app_cfg,
-                            dir=child_pane_dir,
-                        )
-                    )
+        # if nested, handle nested script
+        child_panes = {
+            child_pane_name: child_pane_data or PaneEntry()
+            for child_pane_name, child_pane_data in data.panes.items()
+        }
+        wait_cmds = self.compile_wait_commands(
+            panes=child_panes,
+            root_pane_dir=root_pane_dir,
+            schema_name=schema_name,
+            result=result,
+        )
 
-                child_run_before_cmds = self.gather_raw_commands(
-                    cmd_data=child_pane_data.run_before or [],
-                    plugin=nested_plugin,
-                )
-                child_run_cmds = self.gather_raw_commands(
-                    cmd_data=child_pane_data.run or [],
-                    plugin=nested_plugin,
-                )
+        child_script_name = f"{schema_name}_{name}"
+        child_stats = result.op_stats.setdefault(child_script_name, OpStats())
 
-                # run-before cmd set goes BEFORE parent commands
-                # then parent's
-                # then child's run cmds.
-                root_run_cmds = root_run_cmds_factory(plugin=nested_plugin)
-                computed_run_cmds = [
-                    *child_run_before_cmds,
-                    *root_run_cmds,
-                    *child_run_cmds,
-                ]
+        def child_script_cmds() -> Iterator[str]:
+            yield from nested_plugin.pre_init(session_name=child_script_name)
+            for child_pane_name, child_pane_data in child_panes.items():
+                with span("compile.child_pane", name=child_pane_name):
+                    yield from self.compile_child_pane(
+                        name=child_pane_name,
+                        data=child_pane_data,
+                        root_pane_dir=root_pane_dir,
+                        root_run=data.run or [],
+                        nested_plugin=nested_plugin,
+                        wait_cmd=wait_cmds.get(child_pane_name),
+                        gate_cmd=gate_cmds.get((name, child_pane_name)),
+                        stats=child_stats,
+                        memo=memo,
+                        telemetry=telemetry.scoped(name) if telemetry else None,
+                        result=result,
+                    )
+            yield from nested_plugin.post_init()
 
-                raw_child_cmds.extend(computed_run_cmds)
-                child_cmds = self.process_raw_commands(raw_cmds=raw_child_cmds)
+        self.write_script(
+            plugin=nested_plugin,
+            name=child_script_name,
+            contents=child_script_cmds(),
+            result=result,
+        )
 
-                for cmd in child_cmds:
-                    # we're ASSUMING all cmds so far return List[str] when run
-                    child_script_cmds.extend(cmd.run())
+        run_child_script_cmd = ShellCommand(
+            plugin=root_plugin,  # root plugin will be calling the script
+            cmd=nested_plugin.get_script_cmd(script_name=child_script_name),
+            opts=self.shell_cmd_opts,
+        )
 
-            child_script_cmds.extend(nested_plugin.post_init())
+        raw_root_cmds.append(run_child_script_cmd)
+        root_cmds = self.process_raw_commands(raw_cmds=raw_root_cmds)
+        return self.render_ops(
+            self.build_ops(root_cmds),
+            plugin=root_plugin,
+            stats=stats,
+            telemetry=telemetry,
+            result=result,
+        )
 
-            child_script_name = f"{schema_name}_{root_pane_name}"
-            nested_plugin.write_script(
-                name=child_script_name, contents=child_script_cmds
+    def compile_child_pane(
+        self,
+        name: str,
+        data: PaneEntry,
+        root_pane_dir: Optional[Path],
+        root_run: List[RunCommand],
+        nested_plugin: BasePlugin,
+        wait_cmd: Optional[List[str]] = None,
+        gate_cmd: Optional[List[str]] = None,
+        stats: Optional[OpStats] = None,
+        memo: Optional[ExpansionMemo] = None,
+        telemetry: Optional[Telemetry] = None,
+        result: Optional[CompileResult] = None,
+    ) -> List[str]:
+        memo = memo if memo is not None else ExpansionMemo()
+        raw_child_cmds: List[BaseCommand | BaseMacro] = []
+        raw_child_cmds.append(
+            CreatePaneMacro(
+                app_cfg=self.app_cfg,
+                plugin=nested_plugin,
+                name=name,
+                exec_mode=data.exec_mode,
             )
+        )
 
-            run_child_script_cmd = ShellCommand(
-                plugin=root_plugin,  # root plugin will be calling the script
-                cmd=nested_plugin.get_script_cmd(script_name=child_script_name),
-                opts=self.shell_cmd_opts,
+        child_pane_dir = self._pane_dir(root_pane_dir, data)
+        if result is not None:
+            result.depends_on_dir(child_pane_dir)
+        if child_pane_dir:
+            raw_child_cmds.append(
+                GotoDirectoryMacro(
+                    plugin=nested_plugin,
+                    app_cfg=self.app_cfg,
+                    dir=child_pane_dir,
+                )
             )
 
-            raw_root_cmds.append(run_child_script_cmd)
-            root_cmds = self.process_raw_commands(raw_cmds=raw_root_cmds)
-
-            for cmd in root_cmds:
-                root_script_cmds.extend(cmd.run())
-
-        root_script_cmds.extend(root_plugin.post_init())
+        # waiting for its turn to start goes first,
+        # then waiting on dependencies,
+        # then run-before cmd set goes BEFORE parent commands
+        # then parent's
+        # then child's run cmds.
+        # like in root panes, gates are dropped where commands aren't run in
+        # a shell, but dependencies the schema asks for can't be
+        if not nested_plugin.SHELL_COMMANDS:
+            if wait_cmd:
+                raise InterpreterException(
+                    f"Pane '{name}' has 'depends-on' set, which its backend "
+                    "can't wait for when not running commands in a shell."
+                )
+            gate_cmd = None
+        for pre_cmd in (gate_cmd, wait_cmd):
+            if pre_cmd:
+                raw_child_cmds.append(
+                    ShellCommand(
+                        plugin=nested_plugin, cmd=pre_cmd, opts=self.shell_cmd_opts
+                    )
+                )
+        ops = self.build_ops(self.process_raw_commands(raw_cmds=raw_child_cmds))
+        # parent commands repeat in every child pane, the memo expands them
+        # once (or once per directory, for macros depending on it)
+        for cmd_data in (data.run_before or [], root_run, data.run or []):
+            ops.extend(
+                self.expand_commands(
+                    cmd_data=cmd_data,
+                    plugin=nested_plugin,
+                    cwd=child_pane_dir,
+                    memo=memo,
+                )
+            )
+        return self.render_ops(
+            ops,
+            plugin=nested_plugin,
+            stats=stats,
+            telemetry=telemetry,
+            result=result,
+        )
 
-        root_script_name = f"{schema_name}"
-        root_plugin.write_script(name=root_script_name, contents=root_script_cmds)
+    def telemetry(self, schema_name: str) -> Optional[Telemetry]:
+        if not self.app_cfg.telemetry:
+            return None
+        path = telemetry_log_path(self.app_cfg, schema_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return Telemetry(path=path, shell=self.app_cfg.default_shell)
+
+    def record_run(self, schema_name: str) -> None:
+        """
+        Marks the start of a run, for telemetry, log readiness probes and
+        the start schedule.
+        """
+        reset_log_offsets(self.log_offsets_path(schema_name))
+        if self.app_cfg.telemetry:
+            TelemetryLog(telemetry_log_path(self.app_cfg, schema_name)).record_run()
+        if self.app_cfg.max_concurrent_starts:
+            reset_schedule(self.schedule_state_path(schema_name))
 
     def run(self, config: MagicConfigSchema, schema_name: str) -> None:
-        root_plugin, _ = self.setup_plugins(config=config.wizard)
-        root_plugin.run_script(name=schema_name)
+        root_plugin, _ = self.setup_plugins(
+            config=config.wizard, schema_name=schema_name
+        )
+        self.record_run(schema_name)
+        with span("run_script", schema=schema_name):
+            root_plugin.run_script(name=schema_name)
+
+    def run_compiled(self, root_backend: WizardBackendConfig, schema_name: str) -> None:
+        """Runs previously compiled scripts without needing the schema."""
+        root_plugin = self.setup_plugin(backend=root_backend, schema_name=schema_name)
+        self.record_run(schema_name)
+        with span("run_script", schema=schema_name):
+            root_plugin.run_script(name=schema_name)
+
+    def launch_compiled(
+        self, root_backend: WizardBackendConfig, schema_name: str
+    ) -> Optional[List[str]]:
+        """
+        Like `run_compiled`, but returns the command left for the caller's
+        terminal, if any (see `BasePlugin.launch_script`).
+        """
+        root_plugin = self.setup_plugin(backend=root_backend, schema_name=schema_name)
+        self.record_run(schema_name)
+        with span("launch_script", schema=schema_name):
+            return root_plugin.launch_script(name=schema_name)
+
+    def launcher_command(
+        self, root_backend: WizardBackendConfig, schema_name: str
+    ) -> Optional[List[str]]:
+        """
+        Command launching compiled scripts without magician, if the root
+        backend has one (see `BasePlugin.exec_command`).
+        """
+        root_plugin = self.setup_plugin(backend=root_backend, schema_name=schema_name)
+        return root_plugin.exec_command(name=schema_name)
+
+    async def run_compiled_async(
+        self, root_backend: WizardBackendConfig, schema_name: str
+    ) -> None:
+        root_plugin = self.setup_plugin(backend=root_backend, schema_name=schema_name)
+        self.record_run(schema_name)
+        with span("run_script", schema=schema_name):
+            await root_plugin.run_script_async(name=schema_name)
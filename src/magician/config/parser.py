@@ -1,24 +1,31 @@
 from pathlib import Path
-from typing import Type
+from typing import TYPE_CHECKING, Any, Optional
 
-from pydantic_settings import (
-    BaseSettings,
-    PydanticBaseSettingsSource,
-    SettingsConfigDict,
-    YamlConfigSettingsSource,
-)
+import yaml
 
 from magician.config.schema import MagicConfigSchema
 
+if TYPE_CHECKING:
+    from magician.cache.schemas import SchemaCache
 
-def parse_config_file(file: Path) -> MagicConfigSchema:
-    class MagicConfig(MagicConfigSchema):
-        model_config = SettingsConfigDict(yaml_file=file)
+try:
+    # libyaml bindings are several times faster than the pure python loader
+    YamlLoader: Any = yaml.CSafeLoader
+except AttributeError:  # pragma: no cover - pyyaml built without libyaml
+    YamlLoader = yaml.SafeLoader
 
-        @classmethod
-        def settings_customise_sources(
-            cls, settings_cls: Type[BaseSettings], *args, **kwargs
-        ) -> tuple[PydanticBaseSettingsSource, ...]:
-            return (YamlConfigSettingsSource(settings_cls),)
 
-    return MagicConfig()  # type: ignore
+def load_yaml(contents: bytes) -> Any:
+    return yaml.load(contents, Loader=YamlLoader)
+
+
+def validate_config(data: Any) -> MagicConfigSchema:
+    return MagicConfigSchema.model_validate(data or {})
+
+
+def parse_config_file(
+    file: Path, cache: Optional["SchemaCache"] = None
+) -> MagicConfigSchema:
+    if cache:
+        return cache.load(file)
+    return validate_config(load_yaml(file.read_bytes()))
@@ -1,8 +1,7 @@
 from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
-from pydantic_settings import BaseSettings, PydanticBaseSettingsSource
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class MacroCommand(BaseModel):
@@ -13,12 +12,54 @@ class MacroCommand(BaseModel):
 RunCommand = str | MacroCommand
 
 
+class ReadinessProbeConfig(BaseModel):
+    """How to tell a pane is ready, checked by panes depending on it."""
+
+    tcp: Optional[int | str] = None  # "port" or "host:port" accepting connections
+    file: Optional[Path] = None  # file exists
+    log: Optional[Path] = None  # log file gets a line matching `pattern`
+    pattern: Optional[str] = None
+    timeout: float = Field(default=120, gt=0)
+
+    @model_validator(mode="after")
+    def check_single_probe(self) -> "ReadinessProbeConfig":
+        probes = [p for p in (self.tcp, self.file, self.log) if p is not None]
+        if len(probes) != 1:
+            raise ValueError("Exactly one of 'tcp', 'file' or 'log' must be set.")
+        if (self.log is None) != (self.pattern is None):
+            raise ValueError("'pattern' must be set together with 'log'.")
+        return self
+
+
+class ExecModeConfig(BaseModel):
+    """
+    Runs a pane's commands as its initial program, in its directory, instead
+    of typing them into an interactive shell.
+    """
+
+    # start an interactive shell once commands finish (or get interrupted)
+    shell: bool = False
+
+
 class PaneEntry(BaseModel):
     dir: Optional[Path] = None
     run: Optional[List[RunCommand]] = Field(default_factory=list)
     run_before: Optional[List[RunCommand]] = Field(
         default_factory=list, alias="run-before"
     )
+    # sibling panes that must be ready before this pane's commands run
+    depends_on: List[str] = Field(default_factory=list, alias="depends-on")
+    ready: Optional[ReadinessProbeConfig] = None
+    exec_mode: Optional[ExecModeConfig] = Field(default=None, alias="exec")
+    # panes of lower stages start first, see `max_concurrent_starts`
+    stage: int = 0
+
+    @field_validator("exec_mode", mode="before")
+    @classmethod
+    def exec_mode_from_bool(cls, value: Any) -> Any:
+        if isinstance(value, bool):
+            return ExecModeConfig() if value else None
+        return value
 
 
 class RootPaneEntry(PaneEntry):
@@ -37,6 +78,7 @@ class ProjectConfig(BaseModel):
 class WizardBackendType(Enum):
     KITTY = "kitty"
     TMUX = "tmux"
+    TMUX_CONTROL = "tmux-control"
 
 
 class WizardBackendConfig(BaseModel):
@@ -61,12 +103,10 @@ class WizardConfig(BaseModel):
     root: RootPaneConfig
 
 
-class MagicConfigSchema(BaseSettings):
+class MagicConfigSchema(BaseModel):
+    """Use `parse_config_file` for loading schemas from YAML files."""
+
+    model_config = ConfigDict(extra="forbid", validate_default=True)
+
     wizard: WizardConfig
     project: ProjectConfig
-
-    @classmethod
-    def settings_customise_sources(
-        cls, *args, **kwargs
-    ) -> tuple[PydanticBaseSettingsSource, ...]:
-        raise Exception("This class is not meant to be directly initialized.")
@@ -0,0 +1,6 @@
+"""
+Optional daemon keeping schemas warm between runs, see `magic serve`.
+Only the client is imported here, the server needs the whole app.
+"""
+
+from .client import configured_socket_path, run_in_daemon, socket_path
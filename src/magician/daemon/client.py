@@ -0,0 +1,87 @@
+"""
+Client side of `magic serve`, handing runs over to the daemon when one is
+listening. It sticks to the standard library (the app config is read as
+plain TOML) so that doing so costs little more than starting Python.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tomllib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from magician import paths
+
+# bumped whenever messages change, older daemons leave runs to the client
+PROTOCOL_VERSION = 1
+SOCKET_NAME = "magic.sock"
+# where to find the daemon instead of the data folder
+SOCKET_ENV = "MAGICIAN_SOCKET"
+
+LAUNCHED = "launched"
+FAILED = "failed"
+UNHANDLED = "unhandled"
+
+
+def socket_path(data_folder: Path) -> Path:
+    override = os.environ.get(SOCKET_ENV)
+    return Path(override) if override else data_folder / SOCKET_NAME
+
+
+def configured_socket_path() -> Path:
+    """Socket of the daemon serving the app config, without loading it."""
+    data_folder = Path(paths.DATA_FOLDER)
+    if SOCKET_ENV not in os.environ:
+        try:
+            with open(paths.CONFIG_FILE, "rb") as file:
+                data_folder = Path(tomllib.load(file).get("data_folder", data_folder))
+        except (OSError, tomllib.TOMLDecodeError):
+            pass
+    return socket_path(data_folder)
+
+
+def request(
+    message: Dict[str, Any], path: Optional[Path] = None
+) -> Optional[Dict[str, Any]]:
+    """Sends a message to the daemon, returning its reply unless none listens."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(str(path or configured_socket_path()))
+        except OSError:
+            return None
+        sock.sendall(json.dumps({"version": PROTOCOL_VERSION, **message}).encode())
+        sock.sendall(b"\n")
+        with sock.makefile("rb") as file:
+            line = file.readline()
+    # a daemon going away mid request answers nothing
+    return json.loads(line) if line else None
+
+
+def run_in_daemon(schema: str) -> Optional[int]:
+    """
+    Runs a schema through the daemon, returning the exit code. Returns None
+    when there is no daemon, or it left the run to the caller, which is
+    also how errors preceding the launch get reported the usual way.
+    """
+    if any(c in schema for c in "*?["):
+        return None
+    reply = request(
+        {
+            "command": "run",
+            "schema": schema,
+            "cwd": os.getcwd(),
+            "env": dict(os.environ),
+        }
+    )
+    if reply is None or reply.get("status") not in (LAUNCHED, FAILED):
+        return None
+    if reply["status"] == FAILED:
+        print(f"Failed launching '{schema}': {reply.get('error')}", file=sys.stderr)
+        return 1
+    if launch := reply.get("launch"):
+        subprocess.run(launch)
+    return 0
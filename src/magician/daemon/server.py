@@ -0,0 +1,237 @@
+"""
+`magic serve`: a long-lived process running schemas for `magic run`.
+
+It keeps the app config, validated schemas and the compile manifest in
+memory, along with kitty remote control connections. Changed files are
+noticed by their mtime: the app config on every request, schemas and the
+manifest as they get used.
+
+Requests are handled one at a time, each in the client's working
+directory and environment, which is what compiled scripts and launched
+terminals see. Launches needing the client's terminal (attaching to tmux,
+starting kitty) are handed back to it as a command to run. With `--watch`,
+schemas also get precompiled as they are saved, in between requests and
+in the directory and environment of the latest run (which compiled scripts
+may depend on, see `magician.config.context`).
+"""
+
+import contextlib
+import json
+import os
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from magician import settings
+from magician.cache import SchemaIndex, WarmSchemaCache
+from magician.config.interpreter import PLUGIN_BACKEND_MAP
+from magician.config.schema import WizardBackendType
+from magician.plugins import kitty_remote
+from magician.runner import RunOutcome, SchemaRunner
+from magician.watch import SchemaWatcher, precompile
+
+from .client import FAILED, LAUNCHED, PROTOCOL_VERSION, UNHANDLED, request
+
+Stamp = Optional[Tuple[int, int]]
+
+
+class DaemonError(Exception): ...
+
+
+def _stamp(path: Path) -> Stamp:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@contextlib.contextmanager
+def client_context(cwd: str, env: Dict[str, str]) -> Iterator[None]:
+    """Runs as if started by the client, in its directory and environment."""
+    saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+
+
+class Daemon:
+    def __init__(self) -> None:
+        self.stopped = False
+        self._config_stamp: Stamp = None
+        self._runner: Optional[SchemaRunner] = None
+        self._index: Optional[SchemaIndex] = None
+        self._last_context: Optional[Tuple[str, Dict[str, str]]] = None
+        # requests and precompiling schemas take turns
+        self._lock = threading.Lock()
+
+    def _warm(self) -> Tuple[SchemaRunner, SchemaIndex]:
+        """Runner and index of the current app config, reloading it if edited."""
+        stamp = _stamp(settings.CONFIG_FILE_PATH)
+        if self._runner is None or self._index is None or stamp != self._config_stamp:
+            logger.trace("Loading app config")
+            app_cfg = settings.get_config()
+            schema_cache = WarmSchemaCache(
+                app_cfg=app_cfg, persist=app_cfg.schema_cache
+            )
+            self._runner = SchemaRunner(app_cfg=app_cfg, schema_cache=schema_cache)
+            self._index = SchemaIndex(app_cfg=app_cfg, schema_cache=schema_cache)
+            self._config_stamp = stamp
+        self._runner.compile_cache.refresh()
+        return self._runner, self._index
+
+    def warm_up(self) -> None:
+        """Reads every schema and imports every plugin ahead of the first run."""
+        _, index = self._warm()
+        index.refresh()
+        for backend in WizardBackendType:
+            PLUGIN_BACKEND_MAP[backend]
+
+    def run(self, schema: str) -> Dict[str, Any]:
+        runner, index = self._warm()
+        schema_path = index.resolve(schema)
+        if not schema_path:
+            return {"status": UNHANDLED}
+        try:
+            entry, _ = runner.prepare(schema_name=schema, schema_path=schema_path)
+        except Exception as e:
+            logger.trace(f"Leaving '{schema}' to the client: {e}")
+            return {"status": UNHANDLED}
+
+        try:
+            launch = runner.interpreter.launch_compiled(
+                root_backend=entry.root_backend, schema_name=schema
+            )
+        except Exception as e:
+            error = (str(e) or e.__class__.__name__).splitlines()[0]
+            return {"status": FAILED, "error": error}
+        return {"status": LAUNCHED, "launch": launch}
+
+    def precompile(self, names: Set[str]) -> List[RunOutcome]:
+        with self._lock:
+            last_context = self._last_context
+            with (
+                client_context(*last_context)
+                if last_context
+                else contextlib.nullcontext()
+            ):
+                runner, index = self._warm()
+                return precompile(runner, index, names)
+
+    def watch(
+        self, report: Callable[[RunOutcome], None], stop: threading.Event
+    ) -> None:
+        """Precompiles schemas as they change, until `stop` gets set."""
+        with self._lock:
+            app_cfg = self._warm()[0].app_cfg
+        with SchemaWatcher(
+            app_cfg.schemas_folder, debounce=app_cfg.watch_debounce
+        ) as watcher:
+            for names in watcher.changes(stop):
+                for outcome in self.precompile(names):
+                    report(outcome)
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if message.get("version") != PROTOCOL_VERSION:
+            return {"status": UNHANDLED}
+        with self._lock:
+            return self._handle(message)
+
+    def _handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        match message.get("command"):
+            case "run":
+                self._last_context = (message["cwd"], message["env"])
+                with client_context(*self._last_context):
+                    return self.run(message["schema"])
+            case "ping":
+                return {"status": "ok", "pid": os.getpid()}
+            case "stop":
+                self.stopped = True
+                return {"status": "ok"}
+            case _:
+                return {"status": UNHANDLED}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        try:
+            message = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        try:
+            reply = self.server.daemon.handle(message)
+        except Exception as e:
+            logger.trace(f"Failed handling {message.get('command')}: {e}")
+            reply = {"status": UNHANDLED}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    def __init__(self, path: Path, daemon: Daemon) -> None:
+        self.path = path
+        self.daemon = daemon
+        super().__init__(str(path), _RequestHandler)
+
+    def serve_until_stopped(self) -> None:
+        while not self.daemon.stopped:
+            self.handle_request()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.path.unlink(missing_ok=True)
+
+
+def bind(path: Path, daemon: Daemon) -> DaemonServer:
+    """Listens on `path`, replacing the socket of a daemon no longer running."""
+    if request({"command": "ping"}, path=path):
+        raise DaemonError(f"A daemon is already listening on {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    # created private rather than narrowed down once others could connect,
+    # before the daemon starts any thread that could see the umask change
+    umask = os.umask(0o177)
+    try:
+        return DaemonServer(path, daemon)
+    finally:
+        os.umask(umask)
+
+
+def serve(
+    path: Path,
+    daemon: Optional[Daemon] = None,
+    watch: Optional[Callable[[RunOutcome], None]] = None,
+) -> None:
+    """
+    Serves requests until stopped. With `watch` given, schemas are
+    precompiled as they change and their outcomes passed to it.
+    """
+    daemon = daemon or Daemon()
+    stop_watching = threading.Event()
+    watcher: Optional[threading.Thread] = None
+    kitty_remote.connections.keep_open = True
+    try:
+        with bind(path, daemon) as server:
+            daemon.warm_up()
+            if watch:
+                watcher = threading.Thread(
+                    target=daemon.watch, args=(watch, stop_watching), daemon=True
+                )
+                watcher.start()
+            server.serve_until_stopped()
+    finally:
+        stop_watching.set()
+        if watcher:
+            watcher.join()
+        kitty_remote.connections.close()
+        kitty_remote.connections.keep_open = False
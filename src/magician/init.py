@@ -1,8 +1,20 @@
-from .cli import cli
+import sys
 
 
 def main():
-    cli.cli()
+    args = sys.argv[1:]
+    tried_daemon = len(args) == 2 and args[0] == "run" and not args[1].startswith("-")
+    if tried_daemon:
+        # plain runs the daemon takes don't even need to import click
+        from magician.daemon import run_in_daemon
+
+        code = run_in_daemon(args[1])
+        if code is not None:
+            sys.exit(code)
+
+    from .cli import cli
+
+    cli.cli(obj={cli.TRIED_DAEMON: tried_daemon})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""
+Intermediate representation of compiled panes, and its optimizer.
+"""
+
+from .memo import ExpansionMemo
+from .ops import Chdir, CreatePane, Env, Exec, Op, Opaque, lower
+from .optimize import optimize, passes_for
@@ -0,0 +1,29 @@
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from .ops import Op
+
+
+class ExpansionMemo:
+    """
+    Compile-scoped memo of run commands expanded into ops. Ops are immutable
+    and only bound to a pane when lowered, so panes repeating a command
+    (most notably, every child repeating its parent's `run`) share a single
+    expansion instead of re-parsing strings and re-processing macros.
+    """
+
+    def __init__(self) -> None:
+        self._expansions: Dict[Hashable, Tuple[Op, ...]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def expand(self, key: Hashable, build: Callable[[], List[Op]]) -> Tuple[Op, ...]:
+        ops = self._expansions.get(key)
+        if ops is None:
+            self.misses += 1
+            ops = self._expansions[key] = tuple(build())
+        else:
+            self.hits += 1
+        return ops
+
+    def __len__(self) -> int:
+        return len(self._expansions)
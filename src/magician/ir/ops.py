@@ -0,0 +1,157 @@
+"""
+Backend independent operations a compiled pane is made of.
+
+Ops are small immutable `__slots__` objects; plugins lower them into
+script lines through `lower`, after `magician.ir.optimize` had a go at them.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from magician.commands.base import BaseCommand
+    from magician.plugins.base import BasePlugin
+
+
+class Op:
+    __slots__ = ()
+
+    def _key(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and self._key() == other._key()  # type: ignore[attr-defined]
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._key()))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __setattr__(self, *_) -> None:
+        raise AttributeError(f"{type(self).__name__} ops are immutable")
+
+
+class CreatePane(Op):
+    """
+    Opens a pane, with `env` set in its environment from the start.
+
+    `direct` panes get their directory and commands folded into `cwd` and
+    `run` by the optimizer, and start by running them rather than a shell
+    (followed by one, with `then_shell`).
+    """
+
+    __slots__ = ("name", "env", "direct", "then_shell", "cwd", "run")
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        env: Iterable[Tuple[str, str]] = (),
+        direct: bool = False,
+        then_shell: bool = False,
+        cwd: Optional[Path] = None,
+        run: Iterable["Op"] = (),
+    ) -> None:
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "env", tuple(env))
+        object.__setattr__(self, "direct", direct)
+        object.__setattr__(self, "then_shell", then_shell)
+        object.__setattr__(self, "cwd", cwd)
+        object.__setattr__(self, "run", tuple(run))
+
+    def replace(self, **changes: Any) -> "CreatePane":
+        return CreatePane(
+            **{slot: changes.get(slot, getattr(self, slot)) for slot in self.__slots__}
+        )
+
+
+class Chdir(Op):
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path) -> None:
+        object.__setattr__(self, "path", path)
+
+
+class Exec(Op):
+    """Runs commands in the pane's shell, one after the other."""
+
+    __slots__ = ("commands",)
+
+    def __init__(self, *commands: Iterable[str]) -> None:
+        object.__setattr__(
+            self, "commands", tuple(tuple(command) for command in commands)
+        )
+
+
+class Env(Op):
+    __slots__ = ("name", "value")
+
+    def __init__(self, name: str, value: str) -> None:
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "value", value)
+
+
+class Opaque(Op):
+    """
+    Command the IR knows nothing about, rendered as is. Optimizations
+    don't move anything across it.
+    """
+
+    __slots__ = ("command",)
+
+    def __init__(self, command: "BaseCommand") -> None:
+        object.__setattr__(self, "command", command)
+
+    def _key(self) -> Tuple[Any, ...]:
+        return (id(self.command),)
+
+
+def shell_commands(ops: Iterable[Op], plugin: "BasePlugin") -> List[List[str]]:
+    """Shell commands doing what ops would do in a pane's shell."""
+    commands: List[List[str]] = []
+    for op in ops:
+        match op:
+            case Chdir():
+                commands.append(["cd", str(op.path)])
+            case Exec():
+                commands.extend(list(command) for command in op.commands)
+            case Env():
+                commands.append(plugin.env_command(name=op.name, value=op.value))
+            case _:
+                raise NotImplementedError(f"Can't run op {op!r} as a command")
+    return commands
+
+
+def lower(ops: Iterable[Op], plugin: "BasePlugin") -> List[str]:
+    """Turns ops into the plugin's script lines."""
+    lines: List[str] = []
+    for op in ops:
+        match op:
+            case CreatePane():
+                env: Optional[Dict[str, str]] = dict(op.env) if op.env else None
+                if op.cwd or op.run:
+                    lines.extend(
+                        plugin.create_pane(
+                            name=op.name,
+                            env=env,
+                            cwd=op.cwd,
+                            command=shell_commands(op.run, plugin=plugin),
+                            then_shell=op.then_shell,
+                        )
+                    )
+                else:
+                    lines.extend(plugin.create_pane(name=op.name, env=env))
+            case Chdir():
+                lines.extend(plugin.goto_dir(path=op.path))
+            case Exec():
+                lines.extend(
+                    plugin.run_cmds(commands=[list(command) for command in op.commands])
+                )
+            case Env():
+                lines.extend(plugin.set_env(name=op.name, value=op.value))
+            case Opaque():
+                lines.extend(op.command.run())
+            case _:
+                raise NotImplementedError(f"Can't lower op {op!r}")
+    return lines
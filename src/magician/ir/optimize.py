@@ -0,0 +1,146 @@
+"""
+Optimizer passes over a pane's ops. Each pass takes and returns a list of
+ops, leaving the input untouched.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+from .ops import Chdir, CreatePane, Env, Exec, Op
+
+if TYPE_CHECKING:
+    from magician.plugins.base import BasePlugin
+    from magician.telemetry import Telemetry
+
+Pass = Callable[[List[Op]], List[Op]]
+
+# shell builtins (and common wrappers around them) that may leave the shell
+# in another directory; anything else runs in a child process
+CWD_CHANGING_COMMANDS = frozenset(
+    {"cd", "pushd", "popd", "source", ".", "eval", "exec", "z", "zi", "j"}
+)
+
+
+def changes_cwd(command: Sequence[str]) -> bool:
+    return bool(command) and command[0] in CWD_CHANGING_COMMANDS
+
+
+def drop_redundant_chdir(ops: List[Op]) -> List[Op]:
+    """Drops `Chdir` ops into the directory the shell is known to be in."""
+    optimized: List[Op] = []
+    cwd: Optional[Path] = None
+    for op in ops:
+        match op:
+            case Chdir():
+                if op.path == cwd:
+                    continue
+                cwd = op.path
+            case CreatePane():
+                cwd = None
+            case Exec():
+                if any(changes_cwd(command) for command in op.commands):
+                    cwd = None
+            case Env():
+                pass
+            case _:
+                cwd = None
+        optimized.append(op)
+    return optimized
+
+
+def inject_env(ops: List[Op]) -> List[Op]:
+    """
+    Moves `Env` ops coming before anything runs in a pane into its
+    `CreatePane`, so that the pane starts with them instead of exporting
+    them through its shell.
+    """
+    optimized: List[Op] = []
+    pane: Optional[int] = None  # index of the pane still open to injection
+    for op in ops:
+        match op:
+            case CreatePane():
+                pane = len(optimized)
+            case Env() if pane is not None:
+                created = optimized[pane]
+                assert isinstance(created, CreatePane)
+                optimized[pane] = created.replace(
+                    env=(*created.env, (op.name, op.value))
+                )
+                continue
+            case Chdir():
+                pass
+            case _:
+                pane = None
+        optimized.append(op)
+    return optimized
+
+
+def direct_panes(ops: List[Op]) -> List[Op]:
+    """Makes every pane `direct`."""
+    return [op.replace(direct=True) if isinstance(op, CreatePane) else op for op in ops]
+
+
+def direct_exec(ops: List[Op]) -> List[Op]:
+    """
+    Folds what follows a `direct` pane's creation into it: its first
+    directory becomes `cwd`, and later commands, directory and environment
+    changes its `run`.
+    """
+    optimized: List[Op] = []
+    pane: Optional[CreatePane] = None  # direct pane being filled in, last op
+    for op in ops:
+        if isinstance(op, CreatePane):
+            pane = op if op.direct else None
+        elif pane is not None and isinstance(op, (Chdir, Exec, Env)):
+            if isinstance(op, Chdir) and pane.cwd is None and not pane.run:
+                pane = pane.replace(cwd=op.path)
+            else:
+                pane = pane.replace(run=(*pane.run, op))
+            optimized[-1] = pane
+            continue
+        else:
+            pane = None
+        optimized.append(op)
+    return optimized
+
+
+def merge_exec(ops: List[Op]) -> List[Op]:
+    """Merges consecutive `Exec` ops, so that they're sent at once."""
+    optimized: List[Op] = []
+    for op in ops:
+        previous = optimized[-1] if optimized else None
+        if isinstance(op, Exec) and isinstance(previous, Exec):
+            optimized[-1] = Exec(*previous.commands, *op.commands)
+        else:
+            optimized.append(op)
+    return optimized
+
+
+def passes_for(
+    plugin: "BasePlugin", telemetry: Optional["Telemetry"] = None
+) -> List[Pass]:
+    passes: List[Pass] = [drop_redundant_chdir]
+    if plugin.INJECTS_ENV:
+        passes.append(inject_env)
+    if telemetry is not None and plugin.SHELL_COMMANDS:
+        passes.append(telemetry.instrument)
+    if plugin.EXECS_DIRECT:
+        if plugin.DIRECT_PANES:
+            passes.append(direct_panes)
+        passes.append(direct_exec)
+    if plugin.MERGES_EXEC:
+        passes.append(merge_exec)
+    return passes
+
+
+def optimize(ops: List[Op], passes: Sequence[Pass]) -> List[Op]:
+    for optimizer_pass in passes:
+        ops = optimizer_pass(ops)
+    return ops
+
+
+def count_ops(ops: Sequence[Op]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for op in ops:
+        counts[type(op).__name__] = counts.get(type(op).__name__, 0) + 1
+    return counts
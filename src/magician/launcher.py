@@ -0,0 +1,161 @@
+"""
+Standalone launchers for schemas, see `magic export`.
+
+A launcher is a POSIX shell script exec'ing a schema's compiled scripts
+the way `magic run` would, without starting Python. It checks the same
+inputs as the compile cache: it embeds a hash of the schema, the app
+config, magician's installed metadata (changing with its version) and the
+compiled scripts themselves, along with the directory and environment the
+scripts depend on (see `magician.config.context`). It hands over to
+`magic run`, which recompiles them, once any of these changed.
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import shlex
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from magician.cache import CompileCacheEntry
+from magician.config.context import CWD, PATH
+from magician.config.interpreter import ConfigInterpreter
+from magician.readiness import read_log_offsets
+from magician.schedule import new_state
+from magician.settings import CONFIG_FILE_PATH, AppConfig
+from magician.telemetry import PRECISE_NOW, RUN, Telemetry, telemetry_log_path
+from magician.utils.atomic import write_lines_atomic
+from magician.utils.shell import ShellWord, join_command
+
+
+class LauncherException(Exception): ...
+
+
+def default_launcher_path(schema_name: str) -> Path:
+    return Path.home() / ".local" / "bin" / f"magic-{schema_name}"
+
+
+# shell expressions for the current value of compile context parts
+CONTEXT_EXPRESSIONS = {CWD: '"$(pwd -P)"', PATH: '"$PATH"'}
+
+
+def metadata_file() -> Optional[Path]:
+    try:
+        distribution = importlib.metadata.distribution("magician")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    for file in distribution.files or []:
+        if file.name == "METADATA":
+            return Path(str(distribution.locate_file(file))).resolve()
+    return None
+
+
+def hashed_files(schema_path: Path, scripts: List[Path]) -> List[Path]:
+    """Files whose contents launchers check, in the order they are hashed."""
+    files = [schema_path.resolve()]
+    if CONFIG_FILE_PATH.exists():
+        files.append(CONFIG_FILE_PATH.resolve())
+    if metadata := metadata_file():
+        files.append(metadata)
+    files.extend(scripts)
+    return files
+
+
+def files_hash(files: Iterable[Path]) -> str:
+    """sha256 of the files' concatenated contents, same as `cat | sha256sum`."""
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def run_marker_commands(
+    interpreter: ConfigInterpreter, schema_name: str
+) -> List[List[str]]:
+    """Shell equivalent of `ConfigInterpreter.record_run`."""
+    app_cfg = interpreter.app_cfg
+    commands: List[List[str]] = []
+    offsets_path = interpreter.log_offsets_path(schema_name)
+    for position, log in enumerate(read_log_offsets(offsets_path)):
+        size = ShellWord(f'"$(cat {shlex.quote(str(log))} 2>/dev/null | wc -c)"')
+        redirect = ShellWord(">>" if position else ">")
+        commands.append(
+            ["printf", "%s %s\\n", size, str(log), redirect, str(offsets_path)]
+        )
+    if app_cfg.telemetry:
+        log_path = telemetry_log_path(app_cfg, schema_name)
+        commands.append(["mkdir", "-p", str(log_path.parent)])
+        commands.append(Telemetry(path=log_path).marker(RUN, "", now=PRECISE_NOW))
+    if app_cfg.max_concurrent_starts:
+        state_path = interpreter.schedule_state_path(schema_name)
+        commands.append(["mkdir", "-p", str(state_path.parent)])
+        state = json.dumps(new_state())
+        commands.append(["printf", "%s", state, ShellWord(">"), str(state_path)])
+    return commands
+
+
+def launcher_lines(
+    *,
+    schema_name: str,
+    files: List[Path],
+    digest: str,
+    context: Dict[str, str],
+    commands: List[List[str]],
+    launch: List[str],
+    magic_bin: str,
+) -> Iterator[str]:
+    quoted_files = " ".join(shlex.quote(str(file)) for file in files)
+    fallback = f"exec {join_command([magic_bin, 'run', schema_name])}"
+    yield "#!/bin/sh"
+    yield f"# Launches the '{schema_name}' schema, written by `magic export`."
+    yield "# Falls back to `magic run` once what it was compiled from changed."
+    yield f"# magic-schema-hash: {digest}"
+    yield "if command -v sha256sum >/dev/null 2>&1; then"
+    yield f"  current=$(cat {quoted_files} 2>/dev/null | sha256sum)"
+    yield "else"
+    yield f"  current=$(cat {quoted_files} 2>/dev/null | shasum -a 256)"
+    yield "fi"
+    yield 'case "$current" in'
+    yield f"  '{digest} '*) ;;"
+    yield f"  *) {fallback} ;;"
+    yield "esac"
+    for name, value in sorted(context.items()):
+        expression = CONTEXT_EXPRESSIONS[name]
+        yield f"[ {expression} = {shlex.quote(value)} ] || {fallback}"
+    for command in commands:
+        yield join_command(command)
+    yield f"exec {join_command(launch)}"
+    yield ""
+
+
+def write_launcher(
+    app_cfg: AppConfig,
+    schema_name: str,
+    schema_path: Path,
+    entry: CompileCacheEntry,
+    path: Path,
+) -> None:
+    """Writes the launcher of a compiled schema to `path`."""
+    interpreter = ConfigInterpreter(app_cfg=app_cfg)
+    launch = interpreter.launcher_command(
+        root_backend=entry.root_backend, schema_name=schema_name
+    )
+    if launch is None:
+        raise LauncherException(
+            f"Schemas with a '{entry.root_backend.name.value}' root backend "
+            "(and these options) can't be launched without magician."
+        )
+
+    files = hashed_files(schema_path, entry.scripts)
+    lines = launcher_lines(
+        schema_name=schema_name,
+        files=files,
+        digest=files_hash(files),
+        context=entry.context,
+        commands=run_marker_commands(interpreter, schema_name),
+        launch=launch,
+        magic_bin=shutil.which("magic") or "magic",
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_lines_atomic(path, lines, executable=True)
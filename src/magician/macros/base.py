@@ -6,6 +6,10 @@ from magician.settings import AppConfig
 
 
 class BaseMacro(ABC):
+    # macros whose output depends on the pane's directory get it as `cwd`,
+    # others are expanded once and shared by every pane using them
+    CWD_DEPENDENT: bool = False
+
     def __init__(self, plugin: BasePlugin, app_cfg: AppConfig, **kwargs) -> None:
         self.plugin = plugin
         self.app_cfg = app_cfg
@@ -1,11 +1,14 @@
 from magician.macros.base import BaseMacro
-from magician.macros.python.activate_venv import PythonActivateVenvMacro
-from magician.macros.shell.goto_dir import GotoDirectoryMacro
+from magician.utils.lazy import LazyMapping
 
-
-MACRO_MAPPINGS: dict[str, type[BaseMacro]] = {
-    # user-centred macros
-    "python-activate-venv": PythonActivateVenvMacro,
-    # special macros (mainly internal usage)
-    "goto-dir": GotoDirectoryMacro,
-}
+# macro modules are only imported once a schema uses them
+MACRO_MAPPINGS: LazyMapping[str, type[BaseMacro]] = LazyMapping(
+    {
+        # user-centred macros
+        "python-activate-venv": (
+            "magician.macros.python.activate_venv:PythonActivateVenvMacro"
+        ),
+        # special macros (mainly internal usage)
+        "goto-dir": "magician.macros.shell.goto_dir:GotoDirectoryMacro",
+    }
+)
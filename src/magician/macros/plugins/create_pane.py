@@ -1,5 +1,7 @@
 from typing import Optional
-from magician.commands.wrapper import WrapperCommand
+from magician.commands.op import OpCommand
+from magician.config.schema import ExecModeConfig
+from magician.ir.ops import CreatePane
 from magician.macros.base import BaseMacro
 from magician.plugins.base import BasePlugin
 from magician.settings import AppConfig
@@ -11,14 +13,20 @@ class CreatePaneMacro(BaseMacro):
         app_cfg: AppConfig,
         plugin: BasePlugin,
         name: Optional[str] = None,
+        exec_mode: Optional[ExecModeConfig] = None,
         **kwargs,
     ) -> None:
         super().__init__(plugin, app_cfg, **kwargs)
         self.plugin = plugin
         self.name = name
+        self.exec_mode = exec_mode
 
-    def process(self) -> WrapperCommand:
-        return WrapperCommand(
-            callable=self.plugin.create_pane,
-            name=self.name,
+    def process(self) -> OpCommand:
+        return OpCommand(
+            plugin=self.plugin,
+            op=CreatePane(
+                name=self.name,
+                direct=self.exec_mode is not None,
+                then_shell=bool(self.exec_mode and self.exec_mode.shell),
+            ),
         )
@@ -1,46 +1,82 @@
+import os
 from pathlib import Path
 from typing import Optional
 from loguru import logger
+from magician.commands.base import BaseCommand
+from magician.commands.op import OpCommand
 from magician.commands.shell import ShellCommand
+from magician.ir.ops import Env
 from magician.plugins.base import BasePlugin
 from magician.settings import AppConfig, ShellType
 from ..base import BaseMacro
+from .venv import VirtualEnv, find_venv
 
 
 class PythonActivateVenvMacro(BaseMacro):
+    """
+    Starts the pane inside the project's virtual environment, found at
+    compile time. Falls back to sourcing `.venv`'s activate script when none
+    was found, the backend can't start panes with an environment or
+    `inject` is off (for shells whose startup files rewrite `PATH`).
+    """
+
+    CWD_DEPENDENT = True
+
     def __init__(
         self,
         plugin: BasePlugin,
         app_cfg: AppConfig,
         cwd: Optional[Path] = None,
         shell: Optional[ShellType] = None,
+        inject: bool = True,
         **kwargs,
     ) -> None:
         super().__init__(plugin, app_cfg, **kwargs)
-        self.cwd = cwd or Path()
+        self.cwd = cwd
         if not shell:
             shell = app_cfg.default_shell
             logger.trace(f"Using default shell {shell} for activate-venv macro.")
         else:
             logger.trace(f"Using provided shell {shell} for activate-venv macro.")
 
-        self.shell = shell or self.app_cfg.default_shell
+        # options of schemas come as plain strings
+        self.shell = ShellType(shell or self.app_cfg.default_shell)
+        self.inject = inject
         self.plugin = plugin
 
     @property
-    def script_extension(self) -> str:
+    def activate_script(self) -> str:
         match self.shell:
             case ShellType.BASH | ShellType.ZSH:
-                return "sh"
+                return "activate"
             case ShellType.FISH:
-                return "fish"
+                return "activate.fish"
             case _:
                 raise NotImplementedError(
                     f"Shell type {self.shell} is not supported for macro."
                 )
 
-    def process(self) -> ShellCommand:
-        file = self.cwd / ".venv" / "bin" / f"activate.{self.script_extension}"
+    def find_venv(self) -> Optional[VirtualEnv]:
+        if not self.cwd:
+            return None
+        directory = self.cwd.expanduser()
+        # relative directories depend on where the terminal starts
+        if not directory.is_absolute():
+            return None
+        return find_venv(directory)
+
+    def process(self) -> BaseCommand:
+        venv = self.find_venv()
+        if venv and self.inject and self.plugin.INJECTS_ENV:
+            environment = venv.environment(path=os.environ.get("PATH", ""))
+            return OpCommand(
+                plugin=self.plugin,
+                ops=[Env(name, value) for name, value in environment.items()],
+            )
+
+        # panes are already in their directory by now
+        venv_dir = venv.path if venv else Path(".venv")
+        file = venv_dir / "bin" / self.activate_script
         resolved_file = str(file)
 
         return ShellCommand(plugin=self.plugin, cmd=f"source {resolved_file}")
@@ -0,0 +1,104 @@
+"""
+Finds a project's virtual environment at compile time, so that panes can be
+started inside it instead of sourcing its activate script.
+"""
+
+import base64
+import functools
+import hashlib
+import os
+import re
+import tomllib
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import attrs
+from loguru import logger
+
+# in-project layouts, `.venv` being uv's and poetry's (in-project) default
+VENV_DIR_NAMES = (".venv", "venv")
+
+
+@attrs.define(frozen=True)
+class VirtualEnv:
+    path: Path
+
+    @property
+    def bin_dir(self) -> Path:
+        return self.path / "bin"
+
+    def environment(self, path: str) -> Dict[str, str]:
+        """Variables `activate` would set, given the `PATH` to extend."""
+        return {
+            "VIRTUAL_ENV": str(self.path),
+            "PATH": os.pathsep.join(filter(None, (str(self.bin_dir), path))),
+        }
+
+
+def is_venv(path: Path) -> bool:
+    return (path / "pyvenv.cfg").is_file() and (path / "bin").is_dir()
+
+
+def _project_name(directory: Path) -> Optional[str]:
+    try:
+        with open(directory / "pyproject.toml", "rb") as file:
+            pyproject = tomllib.load(file)
+    except (OSError, tomllib.TOMLDecodeError):
+        return None
+    poetry = pyproject.get("tool", {}).get("poetry", {})
+    return poetry.get("name") or pyproject.get("project", {}).get("name")
+
+
+def poetry_virtualenvs_folder() -> Path:
+    if folder := os.environ.get("POETRY_VIRTUALENVS_PATH"):
+        return Path(folder).expanduser()
+    from platformdirs import user_cache_dir
+
+    return Path(user_cache_dir("pypoetry")) / "virtualenvs"
+
+
+def poetry_env_prefix(name: str, directory: Path) -> str:
+    """Name poetry gives a project's environments, minus its python version."""
+    sanitized_name = re.sub(r'[ $`!*@"\\\r\n\t]', "_", name.lower())[:42]
+    normalized_dir = os.path.normcase(os.path.realpath(directory))
+    digest = hashlib.sha256(normalized_dir.encode()).digest()
+    return f"{sanitized_name}-{base64.urlsafe_b64encode(digest).decode()[:8]}"
+
+
+def _candidates(directory: Path) -> Iterator[Path]:
+    if uv_env := os.environ.get("UV_PROJECT_ENVIRONMENT"):
+        yield directory / Path(uv_env).expanduser()
+    for dir_name in VENV_DIR_NAMES:
+        yield directory / dir_name
+    if name := _project_name(directory):
+        prefix = poetry_env_prefix(name, directory)
+        # highest python version first
+        yield from sorted(
+            poetry_virtualenvs_folder().glob(f"{prefix}-py*"),
+            key=lambda path: [
+                int(part) for part in re.findall(r"\d+", path.name[len(prefix) :])
+            ],
+            reverse=True,
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def _find_venv(directory: Path, mtime_ns: int) -> Optional[VirtualEnv]:
+    for candidate in _candidates(directory):
+        if is_venv(candidate):
+            logger.trace(f"Found virtual environment {candidate} for {directory}")
+            return VirtualEnv(path=candidate)
+    logger.trace(f"No virtual environment found for {directory}")
+    return None
+
+
+def find_venv(directory: Path) -> Optional[VirtualEnv]:
+    """
+    Virtual environment of the project in `directory`. Detections are cached
+    until the directory changes, e.g. by creating a `.venv` in it.
+    """
+    try:
+        mtime_ns = directory.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _find_venv(directory, mtime_ns)
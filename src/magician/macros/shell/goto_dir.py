@@ -1,5 +1,6 @@
 from pathlib import Path
-from magician.commands.wrapper import WrapperCommand
+from magician.commands.op import OpCommand
+from magician.ir.ops import Chdir
 from magician.macros.base import BaseMacro
 from magician.plugins.base import BasePlugin
 from magician.settings import AppConfig
@@ -12,5 +13,5 @@ class GotoDirectoryMacro(BaseMacro):
         super().__init__(plugin, app_cfg, **kwargs)
         self.dir = dir
 
-    def process(self) -> WrapperCommand:
-        return WrapperCommand(callable=self.plugin.goto_dir, path=self.dir)
+    def process(self) -> OpCommand:
+        return OpCommand(plugin=self.plugin, op=Chdir(path=Path(self.dir)))
@@ -0,0 +1,16 @@
+"""
+Where the app keeps its files by default. Kept apart from the settings, and
+as plain strings, for code that has to start quickly (see `magic serve`).
+"""
+
+import os
+
+# from platformdirs import user_config_path
+# CONFIG_FOLDER = user_config_path("Magician", "vieiraleao2005")
+
+ROOT_FOLDER = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+CONFIG_FILE = os.path.join(ROOT_FOLDER, "config.toml")
+SAMPLE_CONFIG_FILE = os.path.join(ROOT_FOLDER, "config.sample.toml")
+DATA_FOLDER = os.path.join(ROOT_FOLDER, "data")
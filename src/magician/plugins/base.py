@@ -1,10 +1,13 @@
+import asyncio
 from abc import ABC, abstractmethod
 from enum import Enum, auto
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, List, Optional
 import attrs
 
-from magician.settings import AppConfig
+from magician.settings import AppConfig, ShellType
+from magician.utils.open import platform_cmd
+from magician.utils.shell import join_command
 
 
 class PluginLevel(Enum):
@@ -18,8 +21,27 @@ class PluginInfo:
 
 
 class BasePlugin(ABC):
-    def __init__(self, app_cfg: AppConfig, *args, **kwargs) -> None:
+    # whether consecutive commands may be sent to a pane's shell at once
+    MERGES_EXEC: bool = False
+    # `create_pane` can start panes with environment variables set
+    INJECTS_ENV: bool = False
+    # `create_pane` can start panes in a directory, running commands
+    EXECS_DIRECT: bool = False
+    # every pane starts that way, not only those opting in
+    DIRECT_PANES: bool = False
+    # commands run through a shell, rather than as programs of their own
+    SHELL_COMMANDS: bool = True
+
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        *args,
+        scripts_folder: Optional[Path] = None,
+        **kwargs,
+    ) -> None:
         self.app_cfg = app_cfg
+        # backends keep their scripts in folders of their own under this one
+        self.scripts_folder = scripts_folder or app_cfg.data_folder
 
     # methods for generating scripts, returning lists of plugin-specific commands
 
@@ -39,14 +61,79 @@ class BasePlugin(ABC):
     @abstractmethod
     def run_cmd(self, *, command: List[str], **__) -> List[str]: ...
 
+    def run_cmds(self, *, commands: List[List[str]], **__) -> List[str]:
+        """Runs commands one after the other in the current pane"""
+        return [line for command in commands for line in self.run_cmd(command=command)]
+
+    def direct_command(
+        self, commands: List[List[str]], then_shell: bool = False
+    ) -> List[str]:
+        """
+        Program running `commands` as a pane's own, without loading the
+        shell's interactive startup files.
+        """
+        if not commands:
+            return []
+        shell = self.app_cfg.default_shell.value
+        script = "; ".join(join_command(command) for command in commands)
+        if then_shell:
+            if self.app_cfg.default_shell is not ShellType.FISH:
+                # a handler, unlike ignoring it, still lets commands get interrupted
+                script = f"trap : INT; {script}"
+            script = f"{script}; exec {shell} -l"
+        return [shell, "-c", script]
+
+    def env_command(self, *, name: str, value: str) -> List[str]:
+        if self.app_cfg.default_shell is ShellType.FISH:
+            return ["set", "-gx", name, value]
+        return ["export", f"{name}={value}"]
+
+    def set_env(self, *, name: str, value: str, **__) -> List[str]:
+        return self.run_cmd(command=self.env_command(name=name, value=value))
+
     # methods for managing scripts
 
     @abstractmethod
-    def write_script(self, *, name: str, contents: List[str], **__) -> None: ...
+    def get_script_path(self, *, script_name: str) -> Path: ...
+
+    def get_script_artifacts(self, *, script_name: str) -> List[Path]:
+        """
+        Returns every file a written script depends on
+        """
+        return [self.get_script_path(script_name=script_name)]
+
+    @abstractmethod
+    def write_script(self, *, name: str, contents: Iterable[str], **__) -> None:
+        """
+        Writes the script, consuming `contents` lazily. The previous script
+        is only replaced once the new one is complete.
+        """
 
     @abstractmethod
     def run_script(self, *, name: str) -> None: ...
 
+    async def run_script_async(self, *, name: str) -> None:
+        """
+        Runs script without blocking the event loop, for launching several
+        at once. Plugins able to launch through asyncio subprocesses override it.
+        """
+        await asyncio.to_thread(self.run_script, name=name)
+
+    def launch_script(self, *, name: str) -> Optional[List[str]]:
+        """
+        Runs script for someone else's terminal, like the daemon does for
+        its clients: does what needs no terminal and returns the command
+        the caller has to run for the rest, if any.
+        """
+        return platform_cmd(self.get_script_cmd(script_name=name))
+
+    def exec_command(self, *, name: str) -> Optional[List[str]]:
+        """
+        Command launching a written script the way `run_script` does, with
+        no Python involved, for launchers to exec. None if there is none.
+        """
+        return platform_cmd(self.get_script_cmd(script_name=name))
+
     @abstractmethod
     def remove_script(self, *, name: str) -> None: ...
 
@@ -1,57 +1,179 @@
+import asyncio
 import os
+import shlex
 
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+
+import attrs
+from loguru import logger
 
 from magician.settings import AppConfig
 
-from ..utils.open import open_app
+from ..utils.atomic import write_lines_atomic
+from ..utils.open import open_app, open_app_async
 from .base import BasePlugin
+from .kitty_remote import (
+    KittyRemoteUnavailable,
+    connections,
+    open_session,
+    read_session_file,
+)
+
+
+@attrs.define
+class KittyProjectConfig:
+    # open sessions inside a running kitty through remote control
+    # instead of spawning a new kitty process
+    remote: bool = False
+    # kitty `listen_on` address, defaults to $KITTY_LISTEN_ON
+    listen_on: Optional[str] = None
+    # launch every command in a window of its own, instead of running
+    # a tab's commands one after the other in a single shell
+    launch_per_command: bool = False
 
 
 class KittyPlugin(BasePlugin):
+    INJECTS_ENV = True
+    EXECS_DIRECT = True
+
     def __init__(self, app_cfg: AppConfig, *args, **kwargs) -> None:
         super().__init__(app_cfg, *args, **kwargs)
-        self.data_folder = self.app_cfg.data_folder / "kitty/"
+        self.kitty_cfg = KittyProjectConfig(
+            **{
+                k: v
+                for k, v in kwargs.items()
+                if k in attrs.fields_dict(KittyProjectConfig)
+            }
+        )
+        self.data_folder = self.scripts_folder / "kitty/"
+        # environment of programs launched in the current tab
+        self._tab_env: Dict[str, str] = {}
 
         os.makedirs(self.data_folder, exist_ok=True)
 
+    @property
+    def DIRECT_PANES(self) -> bool:  # type: ignore[override]
+        return not self.kitty_cfg.launch_per_command
+
+    @property
+    def SHELL_COMMANDS(self) -> bool:  # type: ignore[override]
+        return self.DIRECT_PANES
+
     def pre_init(self, *_, **__) -> List[str]:
+        self._tab_env = {}
         return []
 
     def post_init(self, *_, **__) -> List[str]:
         return []
 
-    def create_pane(self, *, name: Optional[str], **__) -> List[str]:
-        return [f"new_tab {name}"]
+    def create_pane(
+        self,
+        *,
+        name: Optional[str],
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[Path] = None,
+        command: Optional[List[List[str]]] = None,
+        then_shell: bool = False,
+        **__,
+    ) -> List[str]:
+        self._tab_env = dict(env or {})
+        lines = [f"new_tab {name}"]
+        program = self.direct_command(command or [], then_shell=then_shell)
+        if program:
+            start_dir = str(cwd.expanduser().resolve()) if cwd else None
+            lines.append(self._launch(shlex.join(program), cwd=start_dir))
+        elif cwd:
+            lines.extend(self.goto_dir(path=cwd))
+        return lines
 
     def goto_dir(self, *, path: Path, **__) -> List[str]:
-        resolved_path = str(path.resolve())
+        resolved_path = str(path.expanduser().resolve())
         return [f"cd {resolved_path}"]
 
+    def _launch(self, cmd: str, cwd: Optional[str] = None) -> str:
+        env_args = "".join(
+            f" --env {shlex.quote(f'{key}={value}')}"
+            for key, value in self._tab_env.items()
+        )
+        cwd_arg = f" --cwd {shlex.quote(cwd)}" if cwd else ""
+        return f"launch{env_args}{cwd_arg} {cmd}"
+
     def run_cmd(self, *, command: List[str], **__) -> List[str]:
-        joint_cmd = " ".join(command)
-        return [f"launch {joint_cmd}"]
+        return [self._launch(" ".join(command))]
+
+    def set_env(self, *, name: str, value: str, **__) -> List[str]:
+        # every launch is a program of its own, so it gets passed along to them
+        self._tab_env[name] = value
+        return []
 
-    def _get_script_path(self, *, script_name: str) -> Path:
+    def get_script_path(self, *, script_name: str) -> Path:
         return self.data_folder / f"{script_name}.conf"
 
-    def write_script(self, *, name: str, contents: List[str], **__) -> None:
-        with open(self._get_script_path(script_name=name), "w") as file:
-            file.write("\n".join(contents))
+    def write_script(self, *, name: str, contents: Iterable[str], **__) -> None:
+        write_lines_atomic(self.get_script_path(script_name=name), contents)
 
     def remove_script(self, *, name: str, **__) -> None:
-        script_path = self._get_script_path(script_name=name)
+        script_path = self.get_script_path(script_name=name)
         if not script_path.exists():
             raise Exception(f"Script named {name} doesn't exist.")
 
-        os.remove(self._get_script_path(script_name=name))
+        os.remove(self.get_script_path(script_name=name))
+
+    @property
+    def listen_on(self) -> Optional[str]:
+        return self.kitty_cfg.listen_on or os.environ.get("KITTY_LISTEN_ON")
+
+    def run_script_remote(self, *, name: str) -> bool:
+        """
+        Opens script in the running kitty instance, returning False when
+        there is none to talk to.
+        """
+        listen_on = self.listen_on
+        if not listen_on:
+            logger.trace("No kitty listen_on address, can't use remote control")
+            return False
+
+        script_path = self.get_script_path(script_name=name)
+        if not script_path.exists():
+            raise Exception(f"Script named {name} doesn't exist.")
+
+        tabs = read_session_file(script_path)
+        try:
+            with connections.client(listen_on) as client:
+                open_session(client, tabs)
+        except KittyRemoteUnavailable as e:
+            logger.trace(f"Falling back to new kitty instance: {e}")
+            return False
+        return True
 
     def run_script(self, *, name: str) -> None:
+        if self.kitty_cfg.remote and self.run_script_remote(name=name):
+            return
         open_app(self.get_script_cmd(script_name=name))
 
+    async def run_script_async(self, *, name: str) -> None:
+        if self.kitty_cfg.remote and await asyncio.to_thread(
+            self.run_script_remote, name=name
+        ):
+            return
+        code = await open_app_async(self.get_script_cmd(script_name=name))
+        if code:
+            raise Exception(f"kitty exited with code {code}")
+
+    def launch_script(self, *, name: str) -> Optional[List[str]]:
+        if self.kitty_cfg.remote and self.run_script_remote(name=name):
+            return None
+        return super().launch_script(name=name)
+
+    def exec_command(self, *, name: str) -> Optional[List[str]]:
+        # the remote control protocol is spoken from python
+        if self.kitty_cfg.remote:
+            return None
+        return super().exec_command(name=name)
+
     def get_script_cmd(self, *, script_name: str, **__) -> List[str]:
-        script_path = self._get_script_path(script_name=script_name)
+        script_path = self.get_script_path(script_name=script_name)
         if not script_path.exists():
             raise Exception(f"Script named {script_name} doesn't exist.")
 
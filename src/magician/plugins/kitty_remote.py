@@ -0,0 +1,266 @@
+"""
+Client for kitty's remote control protocol, used for opening compiled
+sessions inside an already running kitty instance.
+"""
+
+import contextlib
+import json
+import shlex
+import socket
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import attrs
+from loguru import logger
+
+KITTY_CMD_PREFIX = b"\x1bP@kitty-cmd"
+KITTY_CMD_SUFFIX = b"\x1b\\"
+# oldest protocol version that knows every command/field used here
+KITTY_PROTOCOL_VERSION = (0, 26, 0)
+
+
+class KittyRemoteError(Exception): ...
+
+
+class KittyRemoteUnavailable(KittyRemoteError): ...
+
+
+def encode_message(cmd: str, payload: Dict[str, Any], no_response=False) -> bytes:
+    message = {
+        "cmd": cmd,
+        "version": list(KITTY_PROTOCOL_VERSION),
+        "no_response": no_response,
+        "payload": payload,
+    }
+    return KITTY_CMD_PREFIX + json.dumps(message).encode() + KITTY_CMD_SUFFIX
+
+
+def decode_message(raw: bytes) -> Dict[str, Any]:
+    if not raw.startswith(KITTY_CMD_PREFIX) or not raw.endswith(KITTY_CMD_SUFFIX):
+        raise KittyRemoteError(f"Malformed kitty response: {raw!r}")
+    return json.loads(raw[len(KITTY_CMD_PREFIX) : -len(KITTY_CMD_SUFFIX)])
+
+
+def connect(listen_on: str, timeout: float = 1.0) -> socket.socket:
+    """
+    Connects to a kitty `listen_on` address: `unix:/path`, `unix:@abstract`
+    or `tcp:host:port`.
+    """
+    kind, _, address = listen_on.partition(":")
+    try:
+        match kind:
+            case "unix":
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                if address.startswith("@"):
+                    address = "\0" + address[1:]
+                sock.settimeout(timeout)
+                sock.connect(address)
+            case "tcp":
+                host, _, port = address.rpartition(":")
+                sock = socket.create_connection((host, int(port)), timeout=timeout)
+            case _:
+                raise KittyRemoteUnavailable(
+                    f"Unsupported kitty listen_on address '{listen_on}'"
+                )
+    except OSError as e:
+        raise KittyRemoteUnavailable(f"Cannot reach kitty at {listen_on}: {e}")
+    return sock
+
+
+class KittyRemoteClient:
+    def __init__(self, listen_on: str, timeout: float = 5.0) -> None:
+        self.listen_on = listen_on
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._buffer = b""
+
+    def open(self) -> None:
+        self._sock = connect(self.listen_on)
+        self._sock.settimeout(self.timeout)
+
+    def close(self) -> None:
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self) -> "KittyRemoteClient":
+        self.open()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def alive(self) -> bool:
+        """Whether kitty still holds its end of the connection."""
+        if not self._sock:
+            return False
+        self._sock.settimeout(0)
+        try:
+            return bool(self._sock.recv(1, socket.MSG_PEEK))
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        finally:
+            self._sock.settimeout(self.timeout)
+
+    def _read_message(self) -> bytes:
+        assert self._sock
+        while True:
+            end = self._buffer.find(KITTY_CMD_SUFFIX)
+            if end != -1:
+                end += len(KITTY_CMD_SUFFIX)
+                raw, self._buffer = self._buffer[:end], self._buffer[end:]
+                return raw
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise KittyRemoteError("kitty closed the connection")
+            self._buffer += chunk
+
+    def send(self, cmd: str, payload: Dict[str, Any]) -> Any:
+        assert self._sock, "Client is not connected."
+        self._sock.sendall(encode_message(cmd, payload))
+        response = decode_message(self._read_message())
+        if not response.get("ok"):
+            raise KittyRemoteError(
+                f"kitty command '{cmd}' failed: {response.get('error')}"
+            )
+        return response.get("data")
+
+    def launch(
+        self,
+        *,
+        args: List[str],
+        launch_type: str = "window",
+        cwd: Optional[str] = None,
+        tab_title: Optional[str] = None,
+        match: Optional[str] = None,
+        env: Optional[List[str]] = None,
+    ) -> Any:
+        payload: Dict[str, Any] = {"args": args, "type": launch_type}
+        if cwd:
+            payload["cwd"] = cwd
+        if tab_title:
+            payload["tab_title"] = tab_title
+        if match:
+            payload["match"] = match
+        if env:
+            payload["env"] = env
+        return self.send("launch", payload)
+
+
+class KittyConnections:
+    """
+    Remote control connections by `listen_on` address. Unless kept open,
+    as long-lived processes like `magic serve` do, every use connects anew.
+    """
+
+    def __init__(self) -> None:
+        self.keep_open = False
+        self._clients: Dict[str, KittyRemoteClient] = {}
+
+    @contextlib.contextmanager
+    def client(self, listen_on: str) -> Iterator[KittyRemoteClient]:
+        if not self.keep_open:
+            with KittyRemoteClient(listen_on=listen_on) as client:
+                yield client
+            return
+
+        client = self._clients.get(listen_on)
+        if client is None or not client.alive():
+            logger.trace(f"Connecting to kitty at {listen_on}")
+            client = KittyRemoteClient(listen_on=listen_on)
+            client.open()
+            self._clients[listen_on] = client
+        try:
+            yield client
+        except BaseException:
+            # whatever was left unread would answer the next command
+            self._clients.pop(listen_on).close()
+            raise
+
+    def close(self) -> None:
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
+
+
+connections = KittyConnections()
+
+
+@attrs.define
+class SessionLaunch:
+    args: List[str]
+    cwd: Optional[str] = None
+    env: List[str] = attrs.field(factory=list)
+
+
+@attrs.define
+class SessionTab:
+    title: Optional[str] = None
+    cwd: Optional[str] = None
+    launches: List[SessionLaunch] = attrs.field(factory=list)
+
+
+def parse_launch(rest: str) -> SessionLaunch:
+    """Splits a `launch` directive into its `--cwd`/`--env` options and program."""
+    launch = SessionLaunch(args=shlex.split(rest))
+    while launch.args and launch.args[0].startswith("--"):
+        option, _, value = launch.args.pop(0).partition("=")
+        if not value:
+            value = launch.args.pop(0)
+        match option:
+            case "--cwd":
+                launch.cwd = value
+            case "--env":
+                launch.env.append(value)
+            case _:
+                logger.trace(f"Ignoring kitty launch option '{option}'")
+    return launch
+
+
+def read_session_file(path: Path) -> List[SessionTab]:
+    """Reads back the subset of kitty session syntax the plugin emits."""
+    tabs: List[SessionTab] = []
+    with open(path) as file:
+        for line in file:
+            directive, _, rest = line.strip().partition(" ")
+            match directive:
+                case "new_tab":
+                    tabs.append(SessionTab(title=rest or None))
+                case "cd":
+                    if not tabs:
+                        tabs.append(SessionTab())
+                    tabs[-1].cwd = rest
+                case "launch":
+                    if not tabs:
+                        tabs.append(SessionTab())
+                    tabs[-1].launches.append(parse_launch(rest))
+                case "" | "#":
+                    continue
+                case _:
+                    logger.trace(f"Ignoring kitty session directive '{directive}'")
+    return tabs
+
+
+def open_session(client: KittyRemoteClient, tabs: List[SessionTab]) -> None:
+    """
+    Opens every tab of a session in the connected kitty instance. The first
+    launch of a tab creates it, later ones become windows inside it.
+    """
+    for tab in tabs:
+        launches = tab.launches or [SessionLaunch(args=[])]
+        window_id = client.launch(
+            args=launches[0].args,
+            launch_type="tab",
+            cwd=launches[0].cwd or tab.cwd,
+            tab_title=tab.title,
+            env=launches[0].env,
+        )
+        for launch in launches[1:]:
+            client.launch(
+                args=launch.args,
+                cwd=launch.cwd or tab.cwd,
+                match=f"window_id:{window_id}" if window_id is not None else None,
+                env=launch.env,
+            )
@@ -1,26 +1,47 @@
 import os
+import re
 import shlex
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Type
 
 import attrs
 
-from magician.utils.ensure_executable import ensure_executable
 from magician.settings import AppConfig
+from magician.utils.atomic import write_lines_atomic
+from magician.utils.shell import join_command
 
-from ..utils.open import open_app
+from ..utils.open import open_app, open_app_async
 from .base import BasePlugin
+from .tmux_reconcile import DIGEST_OPTION, SessionLayout, WindowSpec
 
-from uuid import uuid4
 
-ad
 @attrs.define
 class TmuxProjectConfig:
     start_count_at_one: bool = False
+    # emit tmux commands into a source-file that a single client loads,
+    # instead of one `tmux` invocation per line
+    batch: bool = False
+
+
 class TmuxPlugin(BasePlugin):
+    CONFIG_CLS: Type[TmuxProjectConfig] = TmuxProjectConfig
+    MERGES_EXEC = True
+    INJECTS_ENV = True
+    EXECS_DIRECT = True
+
     def __init__(self, app_cfg: AppConfig, *args, **kwargs) -> None:
         super().__init__(app_cfg, *args, **kwargs)
+        self.tmux_cfg = self.CONFIG_CLS(
+            **{
+                k: v
+                for k, v in kwargs.items()
+                if k in attrs.fields_dict(self.CONFIG_CLS)
+            }
+        )
+        self.data_folder = self.scripts_folder / "tmux/"
         self._window_current_index = -1
+        self._session_name = ""
+        self._windows: List[WindowSpec] = []
         os.makedirs(self.data_folder, exist_ok=True)
 
     @property
@@ -32,10 +53,59 @@ class TmuxPlugin(BasePlugin):
         self._window_current_index += 1
         return self.window_current_index
 
+    def _target(self, index: int) -> str:
+        if self.tmux_cfg.batch:
+            return f"{self._session_name}:{index}"
+        return f'"$SESSION_NAME":{index}'
+
+    def _tmux(self, cmd: str) -> str:
+        return cmd if self.tmux_cfg.batch else f"tmux {cmd}"
+
+    @staticmethod
+    def safe_session_name(name: str) -> str:
+        # tmux reserves ":" and "." for targets
+        return re.sub(r"[^\w-]", "_", name)
+
+    def _tag_window(self) -> Optional[str]:
+        """
+        Tags the last created window with a digest of its commands, letting
+        reconciliation tell unchanged windows apart later on.
+        """
+        if not self._windows:
+            return None
+        window = self._windows[-1]
+        return (
+            f"set-option -w -t {self._target(window.index)} "
+            f"{DIGEST_OPTION} {window.digest}"
+        )
+
+    def _with_tag(self, cmd: Optional[str]) -> List[str]:
+        tag = self._tag_window()
+        if not tag:
+            return [self._tmux(cmd)] if cmd else []
+        if not cmd:
+            return [self._tmux(tag)]
+        if self.tmux_cfg.batch:
+            return [tag, cmd]
+        # chained into the same client call, so tagging costs no extra fork
+        return [self._tmux(f"{tag} \\; {cmd}")]
+
+    def layout(self) -> SessionLayout:
+        return SessionLayout(session_name=self._session_name, windows=self._windows)
+
+    def get_layout_path(self, *, script_name: str) -> Path:
+        return self.data_folder / f"{script_name}.layout.json"
+
     def pre_init(self, *_, session_name: Optional[str] = None, **__) -> List[str]:
-        # reset index for preparing a new script
+        # reset state for preparing a new script
         self._window_current_index = -1
-        self._session_name = session_name or uuid4().hex
+        self._windows = []
+        # named after the script, so recompiling keeps targeting the same session
+        self._session_name = self.safe_session_name(session_name or "magician")
+
+        if self.tmux_cfg.batch:
+            # session existence is checked by the wrapper script
+            return [f"new-session -d -s {self._session_name}"]
 
         return [
             f"SESSION_NAME={self._session_name}",
@@ -47,50 +117,134 @@ class TmuxPlugin(BasePlugin):
         ]
 
     def post_init(self, *_, **__) -> List[str]:
-        return ['tmux attach-session -t "$SESSION_NAME"']
-
-    def create_pane(self, *, name: Optional[str], **__) -> List[str]:
+        if self.tmux_cfg.batch:
+            # attaching needs a terminal, so the wrapper script does it
+            return self._with_tag(None)
+        return self._with_tag('attach-session -t "$SESSION_NAME"')
+
+    def create_pane(
+        self,
+        *,
+        name: Optional[str],
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[Path] = None,
+        command: Optional[List[List[str]]] = None,
+        then_shell: bool = False,
+        **__,
+    ) -> List[str]:
         safe_name: Optional[str] = shlex.quote(name) if name else None
-
+        start_dir = str(cwd.expanduser()) if cwd else None
+        program = self.direct_command(command or [], then_shell=then_shell)
+
+        cmd = (
+            f"new-window -t {self._session_name}:{self.window_increment_index()} -k"
+            + (f" -n {safe_name}" if safe_name else "")
+            + "".join(
+                f" -e {shlex.quote(f'{key}={value}')}"
+                for key, value in (env or {}).items()
+            )
+            + (f" -c {shlex.quote(start_dir)}" if start_dir else "")
+            + (f" {shlex.join(program)}" if program else "")
+        )
+        lines = self._with_tag(cmd)
+        self._windows.append(
+            WindowSpec(
+                index=self.window_current_index,
+                name=name,
+                env=env or {},
+                cwd=start_dir,
+                command=program,
+            )
+        )
+        return lines
+
+    def _record_send(self, send: str) -> None:
+        if self._windows:
+            self._windows[-1].sends.append(send)
+
+    def _send(self, text: str) -> List[str]:
+        """Types a line into the current window's shell."""
+        self._record_send(text)
         return [
-            f"tmux new-window -t {self._session_name}:{self.window_increment_index()} -k"
-            + (f" -n {safe_name}" if safe_name else ""),
+            self._tmux(
+                f"send-keys -t {self._target(self.window_current_index)} "
+                f"{shlex.quote(text)} C-m"
+            )
         ]
 
     def goto_dir(self, *, path: Path, resolve: bool = False, **__) -> List[str]:
         if resolve:
             path = path.resolve()
-        safe_path = shlex.quote(f"cd {path}")
-        return [
-            f'tmux send-keys -t "$SESSION_NAME":{self.window_current_index} {safe_path} C-m'
-        ]
+        return self._send(f"cd {path}")
 
     def run_cmd(self, *, command: List[str], **__) -> List[str]:
-        safe_cmd = shlex.quote(shlex.join(command))
-        ]
+        return self._send(join_command(command))
+
+    def run_cmds(self, *, commands: List[List[str]], **__) -> List[str]:
+        # one send-keys for the whole sequence
+        return self._send("; ".join(join_command(command) for command in commands))
 
-    def _get_script_path(self, *, script_name: str) -> Path:
-        return self._get_script_path(script_name="salve")
+    def get_script_path(self, *, script_name: str) -> Path:
         return self.data_folder / f"{script_name}.sh"
 
-    def write_script(self, *, name: str, contents: List[str], **__) -> None:
-        path = self._get_script_path(script_name=name)
-        with open(path, "w") as file:
-            file.write("\n".join(contents))
-        ensure_executable(path=path)
+    def _get_source_file_path(self, *, script_name: str) -> Path:
+        return self.data_folder / f"{script_name}.tmux"
+
+    def get_script_artifacts(self, *, script_name: str) -> List[Path]:
+        artifacts = [
+            self.get_script_path(script_name=script_name),
+            self.get_layout_path(script_name=script_name),
+        ]
+        if self.tmux_cfg.batch:
+            artifacts.append(self._get_source_file_path(script_name=script_name))
+        return artifacts
+
+    def _batch_wrapper(self, *, source_file: Path) -> List[str]:
+        safe_source_file = shlex.quote(str(source_file.resolve()))
+        return [
+            f"SESSION_NAME={self._session_name}",
+            'if tmux has-session -t "$SESSION_NAME" 2>/dev/null; then',
+            '   tmux attach-session -t "$SESSION_NAME"',
+            "   exit 0",
+            "fi",
+            f"tmux start-server \\; source-file {safe_source_file}",
+            'tmux attach-session -t "$SESSION_NAME"',
+        ]
+
+    def write_script(self, *, name: str, contents: Iterable[str], **__) -> None:
+        path = self.get_script_path(script_name=name)
+        if self.tmux_cfg.batch:
+            source_file = self._get_source_file_path(script_name=name)
+            write_lines_atomic(source_file, contents)
+            contents = self._batch_wrapper(source_file=source_file)
+
+        write_lines_atomic(path, contents, executable=True)
+        # windows are only known once contents have been consumed
+        self.layout().write(self.get_layout_path(script_name=name))
 
     def remove_script(self, *, name: str, **__) -> None:
-        script_path = self._get_script_path(script_name=name)
+        script_path = self.get_script_path(script_name=name)
         if not script_path.exists():
             raise Exception(f"Script named {name} doesn't exist.")
 
-        os.remove(self._get_script_path(script_name=name))
+        os.remove(self.get_script_path(script_name=name))
+        for path in (
+            self._get_source_file_path(script_name=name),
+            self.get_layout_path(script_name=name),
+        ):
+            if path.exists():
+                os.remove(path)
 
     def run_script(self, *, name: str) -> None:
         open_app(self.get_script_cmd(script_name=name))
 
+    async def run_script_async(self, *, name: str) -> None:
+        code = await open_app_async(self.get_script_cmd(script_name=name))
+        if code:
+            raise Exception(f"tmux script exited with code {code}")
+
     def get_script_cmd(self, *, script_name: str, **__) -> List[str]:
-        script_path = self._get_script_path(script_name=script_name)
+        script_path = self.get_script_path(script_name=script_name)
         if not script_path.exists():
             raise Exception(f"Script named {script_name} doesn't exist.")
 
@@ -0,0 +1,279 @@
+"""
+Drives tmux through a single control-mode (`tmux -C`) connection instead of
+generated bash scripts.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import IO, Iterable, List, Optional
+
+import attrs
+from loguru import logger
+
+from magician.settings import AppConfig
+from magician.utils.atomic import atomic_open
+
+from .tmux import TmuxPlugin, TmuxProjectConfig
+from .tmux_reconcile import SessionLayout
+
+
+class TmuxControlError(Exception):
+    def __init__(self, command: str, output: List[str]) -> None:
+        self.command = command
+        self.output = output
+        super().__init__(f"tmux command '{command}' failed: {' '.join(output)}")
+
+
+@attrs.define
+class TmuxControlConfig(TmuxProjectConfig):
+    # tmux server socket name, as in `tmux -L <socket_name>`
+    socket_name: Optional[str] = None
+    tmux_bin: str = "tmux"
+
+
+class TmuxControlClient:
+    """
+    Control-mode connection attached to a single session.
+
+    Commands are written one per line; every command gets a reply block
+    framed by `%begin` and `%end` (or `%error`) lines, while asynchronous
+    notifications (`%output`, `%window-add`, ...) arrive between blocks.
+    """
+
+    def __init__(
+        self, *, socket_name: Optional[str] = None, tmux_bin: str = "tmux"
+    ) -> None:
+        self.socket_name = socket_name
+        self.tmux_bin = tmux_bin
+        self._proc: Optional[subprocess.Popen] = None
+
+    def base_cmd(self) -> List[str]:
+        cmd = [self.tmux_bin]
+        if self.socket_name:
+            cmd.extend(["-L", self.socket_name])
+        return cmd
+
+    def has_session(self, session_name: str) -> bool:
+        result = subprocess.run(
+            [*self.base_cmd(), "has-session", "-t", session_name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return result.returncode == 0
+
+    def open(self, session_name: str) -> None:
+        """Creates the session with a control client attached to it."""
+        self._proc = subprocess.Popen(
+            [*self.base_cmd(), "-C", "new-session", "-s", session_name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        # new-session itself is answered like any other command
+        self._read_reply(command=f"new-session -s {session_name}")
+
+    def close(self) -> None:
+        if not self._proc:
+            return
+        assert self._proc.stdin
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._proc.wait()
+        self._proc = None
+
+    def __enter__(self) -> "TmuxControlClient":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def _stdout(self) -> IO[str]:
+        assert self._proc and self._proc.stdout
+        return self._proc.stdout
+
+    def _read_reply(self, *, command: str) -> List[str]:
+        output: List[str] = []
+        in_block = False
+        for line in self._stdout:
+            line = line.rstrip("\n")
+            if not in_block:
+                if line.startswith("%begin"):
+                    in_block = True
+                elif line.startswith("%exit"):
+                    break
+                # anything else is a notification
+                continue
+            if line.startswith("%end"):
+                return output
+            if line.startswith("%error"):
+                raise TmuxControlError(command=command, output=output)
+            output.append(line)
+
+        assert self._proc
+        stderr = self._proc.stderr.read() if self._proc.stderr else ""
+        raise TmuxControlError(
+            command=command,
+            output=[*output, stderr.strip() or "control client exited"],
+        )
+
+    def command(self, command: str) -> List[str]:
+        return self.run([command])[0]
+
+    def run(self, commands: List[str]) -> List[List[str]]:
+        """
+        Streams every command before reading replies, which come back in
+        order. Raises on the first failed command once all were answered.
+        """
+        assert self._proc and self._proc.stdin
+        for command in commands:
+            self._proc.stdin.write(f"{command}\n")
+        self._proc.stdin.flush()
+
+        replies: List[List[str]] = []
+        error: Optional[TmuxControlError] = None
+        for command in commands:
+            try:
+                replies.append(self._read_reply(command=command))
+            except TmuxControlError as e:
+                if self._proc.poll() is not None:
+                    raise
+                error = error or e
+                replies.append(e.output)
+        if error:
+            raise error
+        return replies
+
+
+class TmuxControlPlugin(TmuxPlugin):
+    """
+    Same operations as the tmux plugin, but scripts are lists of tmux
+    commands that get streamed through a control-mode client.
+    """
+
+    CONFIG_CLS = TmuxControlConfig
+
+    def __init__(self, app_cfg: AppConfig, *args, **kwargs) -> None:
+        super().__init__(app_cfg, *args, **kwargs)
+        # control mode speaks tmux's command language, same as batch output
+        self.tmux_cfg.batch = True
+        self.data_folder = self.scripts_folder / "tmux-control/"
+        os.makedirs(self.data_folder, exist_ok=True)
+
+    @property
+    def control_cfg(self) -> TmuxControlConfig:
+        assert isinstance(self.tmux_cfg, TmuxControlConfig)
+        return self.tmux_cfg
+
+    def pre_init(self, *_, session_name: Optional[str] = None, **__) -> List[str]:
+        super().pre_init(session_name=session_name)
+        # session is created when the control client connects
+        return []
+
+    def post_init(self, *_, **__) -> List[str]:
+        return self._with_tag(None)
+
+    def layout(self) -> SessionLayout:
+        layout = super().layout()
+        layout.socket_name = self.control_cfg.socket_name
+        layout.tmux_bin = self.control_cfg.tmux_bin
+        return layout
+
+    def get_script_path(self, *, script_name: str) -> Path:
+        return self.data_folder / f"{script_name}.json"
+
+    def get_script_artifacts(self, *, script_name: str) -> List[Path]:
+        return [
+            self.get_script_path(script_name=script_name),
+            self.get_layout_path(script_name=script_name),
+        ]
+
+    def write_script(self, *, name: str, contents: Iterable[str], **__) -> None:
+        with atomic_open(self.get_script_path(script_name=name)) as file:
+            # commands are streamed in rather than `json.dump`ed as a whole
+            file.write('{"commands": [')
+            for index, command in enumerate(contents):
+                file.write(", " if index else "")
+                file.write(json.dumps(command))
+            file.write("], ")
+            # session name is only set once contents have been consumed
+            file.write(
+                json.dumps(
+                    {
+                        "session_name": self._session_name,
+                        "socket_name": self.control_cfg.socket_name,
+                        "tmux_bin": self.control_cfg.tmux_bin,
+                    }
+                )[1:]
+            )
+        self.layout().write(self.get_layout_path(script_name=name))
+
+    def remove_script(self, *, name: str, **__) -> None:
+        script_path = self.get_script_path(script_name=name)
+        if not script_path.exists():
+            raise Exception(f"Script named {name} doesn't exist.")
+
+        os.remove(script_path)
+        self.get_layout_path(script_name=name).unlink(missing_ok=True)
+
+    def run_script(self, *, name: str) -> None:
+        subprocess.run(self.launch_script(name=name))
+
+    def launch_script(self, *, name: str) -> List[str]:
+        script_path = self.get_script_path(script_name=name)
+        if not script_path.exists():
+            raise Exception(f"Script named {name} doesn't exist.")
+
+        return build_session(script_path=script_path)
+
+    def exec_command(self, *, name: str) -> None:
+        # sessions are built through a control mode client, from python
+        return None
+
+    def get_script_cmd(self, *, script_name: str, **__) -> List[str]:
+        script_path = self.get_script_path(script_name=script_name)
+        if not script_path.exists():
+            raise Exception(f"Script named {script_name} doesn't exist.")
+
+        return [sys.executable, "-m", __name__, f"{script_path.resolve()}"]
+
+
+def build_session(script_path: Path) -> List[str]:
+    """
+    Builds the session described by a written script, unless it already
+    exists, and returns the command for attaching to it.
+    """
+    with open(script_path) as file:
+        script = json.load(file)
+
+    session_name = script["session_name"]
+    client = TmuxControlClient(
+        socket_name=script["socket_name"],
+        tmux_bin=script["tmux_bin"],
+    )
+    if client.has_session(session_name):
+        logger.trace(f"tmux session {session_name} already exists")
+    else:
+        client.open(session_name)
+        with client:
+            client.run(script["commands"])
+
+    return [*client.base_cmd(), "attach-session", "-t", session_name]
+
+
+def main() -> None:
+    attach_cmd = build_session(script_path=Path(sys.argv[1]))
+    tmux_bin = shutil.which(attach_cmd[0]) or attach_cmd[0]
+    os.execv(tmux_bin, attach_cmd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Brings a running tmux session in line with its compiled layout, touching
+only the windows that changed.
+
+Compiled windows are tagged with a digest of what gets typed into them (the
+`@magician-digest` window option), so that windows whose commands are
+unchanged keep running; those only get renamed or moved when needed.
+Live windows are matched to compiled ones by digest, then by name and only
+then by index, so that adding or removing a window leaves the others be.
+"""
+
+import hashlib
+import json
+import shlex
+import subprocess
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import attrs
+
+from magician.utils.atomic import atomic_open
+
+DIGEST_OPTION = "@magician-digest"
+
+
+@attrs.define
+class WindowSpec:
+    index: int
+    name: Optional[str] = None
+    # lines typed into the window's shell, in order
+    sends: List[str] = attrs.field(factory=list)
+    # environment, directory and program the window is started with
+    env: Dict[str, str] = attrs.field(factory=dict)
+    cwd: Optional[str] = None
+    command: List[str] = attrs.field(factory=list)
+
+    @property
+    def digest(self) -> str:
+        start = {
+            key: value
+            for key, value in (
+                ("env", self.env),
+                ("cwd", self.cwd),
+                ("command", self.command),
+            )
+            if value
+        }
+        # windows started plainly keep the digest they always had
+        data: Any = [self.sends, start] if start else self.sends
+        return hashlib.sha1(json.dumps(data).encode()).hexdigest()[:16]
+
+
+@attrs.define
+class SessionLayout:
+    session_name: str
+    tmux_bin: str = "tmux"
+    socket_name: Optional[str] = None
+    windows: List[WindowSpec] = attrs.field(factory=list)
+
+    def base_cmd(self) -> List[str]:
+        cmd = [self.tmux_bin]
+        if self.socket_name:
+            cmd.extend(["-L", self.socket_name])
+        return cmd
+
+    def write(self, path: Path) -> None:
+        with atomic_open(path) as file:
+            json.dump(attrs.asdict(self), file)
+
+    @classmethod
+    def read(cls, path: Path) -> "SessionLayout":
+        with open(path) as file:
+            data = json.load(file)
+        data["windows"] = [WindowSpec(**window) for window in data["windows"]]
+        return cls(**data)
+
+
+@attrs.define
+class LiveWindow:
+    index: int
+    name: str
+    digest: str = ""
+    # tmux's `@<n>` id, which stays the same as windows move
+    window_id: str = ""
+
+
+class ActionKind(Enum):
+    KEEP = "="
+    RENAME = "~"
+    REPLACE = "!"
+    CREATE = "+"
+    KILL = "-"
+
+
+@attrs.define
+class ReconcileAction:
+    kind: ActionKind
+    index: int
+    name: Optional[str] = None
+    old_name: Optional[str] = None
+    # where the live window the action applies to is, if any
+    old_index: Optional[int] = None
+    window_id: str = ""
+
+    @property
+    def moved(self) -> bool:
+        return self.old_index is not None and self.old_index != self.index
+
+    def __str__(self) -> str:
+        label = f"{self.kind.value} {self.kind.name.lower():<7} {self.index}"
+        if self.kind is ActionKind.RENAME:
+            label = f"{label} {self.old_name} -> {self.name}"
+        else:
+            label = f"{label} {self.name or self.old_name or ''}".rstrip()
+        if self.moved and self.kind in (ActionKind.KEEP, ActionKind.RENAME):
+            label += f" (from {self.old_index})"
+        return label
+
+
+def list_live_windows(layout: SessionLayout) -> Optional[List[LiveWindow]]:
+    """Lists the session's windows, or returns None if it isn't running."""
+    result = subprocess.run(
+        [
+            *layout.base_cmd(),
+            "list-windows",
+            "-t",
+            layout.session_name,
+            "-F",
+            "#{window_index}\t#{window_id}\t"
+            f"#{{{DIGEST_OPTION}}}\t#{{window_name}}",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+
+    windows = []
+    for line in result.stdout.splitlines():
+        index, window_id, digest, name = line.split("\t", 3)
+        windows.append(
+            LiveWindow(index=int(index), name=name, digest=digest, window_id=window_id)
+        )
+    return windows
+
+
+def match_windows(
+    desired: List[WindowSpec], live: List[LiveWindow]
+) -> Dict[int, LiveWindow]:
+    """
+    Pairs desired windows (by position) with live ones: unchanged windows
+    wherever they are (preferably with the same name or index), then
+    windows with the same name and finally the ones at the same index.
+    """
+    unmatched = list(live)
+    matches: Dict[int, LiveWindow] = {}
+
+    def take(position: int, current: Optional[LiveWindow]) -> None:
+        if current is not None:
+            matches[position] = current
+            unmatched.remove(current)
+
+    for position, window in enumerate(desired):
+        unchanged = [
+            current for current in unmatched if current.digest == window.digest
+        ]
+        if unchanged:
+            take(
+                position,
+                min(
+                    unchanged,
+                    key=lambda current: (
+                        current.name != window.name,
+                        current.index != window.index,
+                    ),
+                ),
+            )
+    for position, window in enumerate(desired):
+        if position not in matches and window.name:
+            take(
+                position,
+                next((c for c in unmatched if c.name == window.name), None),
+            )
+    for position, window in enumerate(desired):
+        if position not in matches:
+            take(
+                position,
+                next((c for c in unmatched if c.index == window.index), None),
+            )
+    return matches
+
+
+def plan(desired: List[WindowSpec], live: List[LiveWindow]) -> List[ReconcileAction]:
+    matches = match_windows(desired, live)
+    actions: List[ReconcileAction] = []
+    for position, window in enumerate(desired):
+        current = matches.get(position)
+        if current is None:
+            kind = ActionKind.CREATE
+        elif current.digest != window.digest:
+            kind = ActionKind.REPLACE
+        elif window.name and current.name != window.name:
+            kind = ActionKind.RENAME
+        else:
+            kind = ActionKind.KEEP
+        actions.append(
+            ReconcileAction(
+                kind=kind,
+                index=window.index,
+                name=window.name,
+                old_name=current.name if current else None,
+                old_index=current.index if current else None,
+                window_id=current.window_id if current else "",
+            )
+        )
+    matched = [id(current) for current in matches.values()]
+    # highest indexes first, in case tmux renumbers windows as they close
+    for current in sorted(live, key=lambda window: window.index, reverse=True):
+        if id(current) not in matched:
+            actions.append(
+                ReconcileAction(
+                    kind=ActionKind.KILL,
+                    index=current.index,
+                    old_name=current.name,
+                    old_index=current.index,
+                    window_id=current.window_id,
+                )
+            )
+    return actions
+
+
+def window_commands(session_name: str, window: WindowSpec) -> List[List[str]]:
+    """tmux commands (re)creating a window, including its digest tag."""
+    target = f"{session_name}:{window.index}"
+    commands = [
+        [
+            "new-window",
+            "-k",
+            "-t",
+            target,
+            *(["-n", window.name] if window.name else []),
+            *(
+                arg
+                for key, value in window.env.items()
+                for arg in ("-e", f"{key}={value}")
+            ),
+            *(["-c", window.cwd] if window.cwd else []),
+            *window.command,
+        ],
+        ["set-option", "-w", "-t", target, DIGEST_OPTION, window.digest],
+    ]
+    commands.extend(["send-keys", "-t", target, send, "C-m"] for send in window.sends)
+    return commands
+
+
+def action_commands(
+    layout: SessionLayout, actions: List[ReconcileAction]
+) -> List[List[str]]:
+    """
+    Kept windows that move go out of the way first (to indexes past every
+    other window), compiled windows get (re)created in place, and the kept
+    ones move to where they belong. Live windows left over get killed last,
+    so that the session never runs out of windows.
+    """
+    session = layout.session_name
+    windows = {window.index: window for window in layout.windows}
+
+    def target(index: int) -> str:
+        return f"{session}:{index}"
+
+    def live_target(action: ReconcileAction, index: int) -> str:
+        return action.window_id or target(index)
+
+    kept = [
+        action
+        for action in actions
+        if action.kind in (ActionKind.KEEP, ActionKind.RENAME)
+    ]
+    moving = [action for action in kept if action.moved]
+    # index each live window is at, by the index it started at
+    live_at = {
+        action.old_index: action.old_index
+        for action in actions
+        if action.old_index is not None
+    }
+    # live windows are gone once another one takes their index
+    occupant = {index: index for index in live_at}
+
+    def place(old_index: Optional[int], index: int) -> None:
+        if (replaced := occupant.pop(index, None)) is not None:
+            live_at.pop(replaced, None)
+        if old_index is not None:
+            occupant.pop(live_at[old_index], None)
+            live_at[old_index] = index
+            occupant[index] = old_index
+
+    commands: List[List[str]] = []
+    spare = max([*live_at, *windows, -1]) + 1
+    for offset, action in enumerate(moving):
+        assert action.old_index is not None
+        source = live_target(action, action.old_index)
+        commands.append(
+            ["move-window", "-d", "-s", source, "-t", target(spare + offset)]
+        )
+        place(action.old_index, spare + offset)
+    for action in actions:
+        if action.kind in (ActionKind.CREATE, ActionKind.REPLACE):
+            commands.extend(window_commands(session, windows[action.index]))
+            place(None, action.index)
+            occupant[action.index] = -1  # not a live window
+    for action in moving:
+        assert action.old_index is not None
+        source = live_target(action, live_at[action.old_index])
+        commands.append(
+            ["move-window", "-d", "-k", "-s", source, "-t", target(action.index)]
+        )
+        place(action.old_index, action.index)
+    for action in kept:
+        if action.kind is ActionKind.RENAME:
+            assert action.name
+            commands.append(
+                ["rename-window", "-t", live_target(action, action.index), action.name]
+            )
+
+    kept_indexes = {action.old_index for action in kept}
+    for action in actions:
+        if (
+            action.kind in (ActionKind.REPLACE, ActionKind.KILL)
+            and action.old_index not in kept_indexes
+            and action.old_index in live_at
+        ):
+            index = live_at.pop(action.old_index)
+            commands.append(["kill-window", "-t", live_target(action, index)])
+    return commands
+
+
+def apply(layout: SessionLayout, actions: List[ReconcileAction]) -> None:
+    """Runs every needed tmux command through a single client invocation."""
+    commands = action_commands(layout, actions)
+    if not commands:
+        return
+
+    argv = [*layout.base_cmd()]
+    for command in commands:
+        if len(argv) > len(layout.base_cmd()):
+            argv.append(";")
+        argv.extend(command)
+    result = subprocess.run(argv, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(
+            f"tmux failed reconciling session {layout.session_name}: "
+            + (result.stderr.strip() or shlex.join(argv))
+        )
+
+
+def reconcile(
+    layout: SessionLayout, dry_run: bool = False
+) -> Optional[List[ReconcileAction]]:
+    """
+    Diffs the live session against `layout`, applying the changes unless
+    `dry_run` is set. Returns None if the session isn't running.
+    """
+    live = list_live_windows(layout)
+    if live is None:
+        return None
+    actions = plan(layout.windows, live)
+    if not dry_run:
+        apply(layout, actions)
+    return actions
@@ -0,0 +1,330 @@
+"""
+Readiness probes for panes other panes depend on.
+
+Panes with `depends-on` get a `python -m magician.readiness wait ...` command
+ahead of their own commands, so every pane starts as soon as the panes it
+depends on are ready, while panes without dependencies start right away.
+
+Log probes match lines written since the run started: `magic run` records
+the size of every probed log in an offsets file before launching, as waits
+only start once their pane did.
+"""
+
+import argparse
+import json
+import re
+import socket
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional
+
+import attrs
+
+from magician.utils.modules import module_command
+
+if TYPE_CHECKING:
+    from magician.config.schema import ReadinessProbeConfig
+
+
+class Probe(ABC):
+    @abstractmethod
+    def check(self) -> bool: ...
+
+    @abstractmethod
+    def to_args(self, name: str) -> List[str]:
+        """Arguments for passing this probe to the `wait` command"""
+
+
+@attrs.define
+class TcpProbe(Probe):
+    host: str
+    port: int
+    connect_timeout: float = 0.2
+
+    @classmethod
+    def parse(cls, address: str) -> "TcpProbe":
+        host, _, port = address.rpartition(":")
+        return cls(host=host or "127.0.0.1", port=int(port))
+
+    def check(self) -> bool:
+        try:
+            with socket.create_connection(
+                (self.host, self.port), timeout=self.connect_timeout
+            ):
+                return True
+        except OSError:
+            return False
+
+    def to_args(self, name: str) -> List[str]:
+        return ["--tcp", f"{name}={self.host}:{self.port}"]
+
+
+@attrs.define
+class FileProbe(Probe):
+    path: Path
+
+    def check(self) -> bool:
+        return self.path.exists()
+
+    def to_args(self, name: str) -> List[str]:
+        return ["--file", f"{name}={self.path}"]
+
+
+def log_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+@attrs.define
+class LogProbe(Probe):
+    """
+    Matches lines appended to a log file past `offset`, by default its size
+    when first checked; a log that shrinks (truncated or rotated) is read
+    again from its start.
+    """
+
+    path: Path
+    pattern: re.Pattern
+    _offset: int = -1
+    _partial: str = attrs.field(init=False, default="")
+
+    def check(self) -> bool:
+        size = log_size(self.path)
+        if self._offset == -1:
+            self._offset = size
+            return False
+        if size < self._offset:
+            self._offset, self._partial = 0, ""
+        if size == self._offset:
+            return False
+
+        with open(self.path, errors="replace") as file:
+            file.seek(self._offset)
+            chunk = self._partial + file.read(size - self._offset)
+        self._offset = size
+        lines = chunk.split("\n")
+        self._partial = lines.pop()
+        return any(self.pattern.search(line) for line in lines)
+
+    def to_args(self, name: str) -> List[str]:
+        return [
+            "--log",
+            f"{name}={self.path}",
+            "--pattern",
+            f"{name}={self.pattern.pattern}",
+        ]
+
+
+def probe_from_config(
+    config: "ReadinessProbeConfig", cwd: Optional[Path] = None
+) -> Probe:
+    """Builds a probe, resolving relative paths against the pane's directory."""
+
+    def resolve(path: Path) -> Path:
+        path = path.expanduser()
+        return cwd / path if cwd and not path.is_absolute() else path
+
+    if config.tcp is not None:
+        return TcpProbe.parse(str(config.tcp))
+    if config.file is not None:
+        return FileProbe(path=resolve(config.file))
+    assert config.log is not None and config.pattern is not None
+    return LogProbe(path=resolve(config.log), pattern=re.compile(config.pattern))
+
+
+def check_dependencies(dependencies: Mapping[str, List[str]]) -> List[str]:
+    """
+    Returns pane names in an order where each comes after its dependencies,
+    raising ValueError for unknown panes and dependency cycles.
+    """
+    order: List[str] = []
+    state: Dict[str, bool] = {}  # False while visiting, True once done
+
+    def visit(name: str, path: List[str]) -> None:
+        if state.get(name) is True:
+            return
+        if state.get(name) is False:
+            cycle = " -> ".join([*path[path.index(name) :], name])
+            raise ValueError(f"Dependency cycle between panes: {cycle}")
+        state[name] = False
+        for dependency in dependencies[name]:
+            if dependency not in dependencies:
+                raise ValueError(
+                    f"Pane '{name}' depends on unknown pane '{dependency}'."
+                )
+            visit(dependency, [*path, name])
+        state[name] = True
+        order.append(name)
+
+    for name in dependencies:
+        visit(name, [])
+    return order
+
+
+def write_log_offsets(path: Path, logs: Iterable[Path]) -> None:
+    """Records the current size of the logs, one `<size> <path>` per line."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(f"{log_size(log)} {log}\n" for log in logs))
+
+
+def read_log_offsets(path: Path) -> Dict[Path, int]:
+    try:
+        with open(path) as file:
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return {}
+    offsets = {}
+    for line in lines:
+        size, _, log = line.strip().partition(" ")
+        offsets[Path(log)] = int(size)
+    return offsets
+
+
+def reset_log_offsets(path: Path) -> None:
+    """Records the sizes of the logs listed in the offsets file anew."""
+    if path.exists():
+        write_log_offsets(path, read_log_offsets(path))
+
+
+def wait_command(
+    *,
+    pane: str,
+    probes: Dict[str, Probe],
+    timeout: float,
+    readiness_log: Optional[Path] = None,
+    offsets: Optional[Path] = None,
+) -> List[str]:
+    cmd = [
+        *module_command("magician.readiness"),
+        "wait",
+        "--pane",
+        pane,
+        "--timeout",
+        f"{timeout:g}",
+    ]
+    if readiness_log:
+        cmd.extend(["--readiness-log", str(readiness_log)])
+    if offsets and any(isinstance(probe, LogProbe) for probe in probes.values()):
+        cmd.extend(["--offsets", str(offsets)])
+    for name, probe in probes.items():
+        cmd.extend(probe.to_args(name))
+    return cmd
+
+
+def wait_for(
+    probes: Dict[str, Probe],
+    timeout: float,
+    interval: float = 0.1,
+    on_ready: Optional[Callable[[str, float], None]] = None,
+) -> List[str]:
+    """
+    Polls every probe until all pass or `timeout` seconds elapse, calling
+    `on_ready` with each name and seconds it took. Returns pending names.
+    """
+    started = time.monotonic()
+    pending = dict(probes)
+    while pending:
+        for name, probe in list(pending.items()):
+            if probe.check():
+                del pending[name]
+                if on_ready:
+                    on_ready(name, time.monotonic() - started)
+        if not pending or time.monotonic() - started >= timeout:
+            break
+        time.sleep(interval)
+    return list(pending)
+
+
+class ReadinessLog:
+    """Append-only JSON lines log of when panes got ready."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def record(self, **fields) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write(json.dumps({"ts": time.time(), **fields}) + "\n")
+
+    def read(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        with open(self.path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+def _split_named(values: List[str]) -> Dict[str, str]:
+    named = {}
+    for value in values:
+        name, _, rest = value.partition("=")
+        named[name] = rest
+    return named
+
+
+def parse_probes(args: argparse.Namespace) -> Dict[str, Probe]:
+    probes: Dict[str, Probe] = {}
+    for name, address in _split_named(args.tcp).items():
+        probes[name] = TcpProbe.parse(address)
+    for name, path in _split_named(args.file).items():
+        probes[name] = FileProbe(path=Path(path))
+    patterns = _split_named(args.pattern)
+    offsets = read_log_offsets(args.offsets) if args.offsets else {}
+    for name, path in _split_named(args.log).items():
+        probes[name] = LogProbe(
+            path=Path(path),
+            pattern=re.compile(patterns[name]),
+            offset=offsets.get(Path(path), -1),
+        )
+    return probes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m magician.readiness")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    wait = subparsers.add_parser("wait", help="Waits for dependency probes.")
+    wait.add_argument("--pane", required=True)
+    wait.add_argument("--timeout", type=float, default=120)
+    wait.add_argument("--interval", type=float, default=0.1)
+    wait.add_argument("--readiness-log", type=Path, default=None)
+    wait.add_argument("--offsets", type=Path, default=None)
+    wait.add_argument("--tcp", action="append", default=[])
+    wait.add_argument("--file", action="append", default=[])
+    wait.add_argument("--log", action="append", default=[])
+    wait.add_argument("--pattern", action="append", default=[])
+    args = parser.parse_args(argv)
+
+    log = ReadinessLog(args.readiness_log) if args.readiness_log else None
+    probes = parse_probes(args)
+
+    def on_ready(dependency: str, elapsed: float) -> None:
+        if log:
+            log.record(
+                pane=args.pane,
+                event="dependency_ready",
+                dependency=dependency,
+                elapsed=elapsed,
+            )
+
+    pending = wait_for(
+        probes, timeout=args.timeout, interval=args.interval, on_ready=on_ready
+    )
+    if pending:
+        print(
+            f"magician: gave up waiting on {', '.join(pending)} "
+            f"after {args.timeout:g}s",
+            file=sys.stderr,
+        )
+        if log:
+            log.record(pane=args.pane, event="timeout", pending=pending)
+        return 1
+    if log:
+        log.record(pane=args.pane, event="started")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Compiling (or reusing cached compilations of) schemas and launching them,
+one at a time or several concurrently.
+"""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import attrs
+
+from magician.cache import CompileCache, CompileCacheEntry, SchemaCache
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.parser import parse_config_file
+from magician.settings import AppConfig
+from magician.utils.tracing import span
+
+
+@attrs.define
+class RunOutcome:
+    schema: str
+    ok: bool
+    cached: bool = False
+    error: Optional[str] = None
+    duration: float = 0
+
+
+class SchemaRunner:
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        use_cache: bool = True,
+        schema_cache: Optional[SchemaCache] = None,
+    ) -> None:
+        self.app_cfg = app_cfg
+        self.use_cache = app_cfg.compile_cache and use_cache
+        self.interpreter = ConfigInterpreter(app_cfg=app_cfg)
+        self.compile_cache = CompileCache(app_cfg=app_cfg)
+        if schema_cache is None and app_cfg.schema_cache:
+            schema_cache = SchemaCache(app_cfg=app_cfg)
+        self.schema_cache = schema_cache
+        # the compile manifest is shared by all schemas being prepared
+        self._cache_lock = threading.Lock()
+
+    def prepare(
+        self, schema_name: str, schema_path: Path
+    ) -> Tuple[CompileCacheEntry, bool]:
+        """
+        Compiles a schema unless its cached scripts are up to date.
+        Returns its cache entry and whether it was already cached.
+        """
+        with span("compile_cache.lookup", schema=schema_name):
+            key = self.compile_cache.compute_key(
+                schema_name=schema_name, schema_path=schema_path
+            )
+            with self._cache_lock:
+                entry = (
+                    self.compile_cache.get(schema_name=schema_name, key=key)
+                    if self.use_cache
+                    else None
+                )
+        if entry:
+            return entry, True
+
+        started = time.perf_counter()
+        with span("parse", schema=schema_name):
+            config = parse_config_file(file=schema_path, cache=self.schema_cache)
+        result = self.interpreter.compile(config=config, schema_name=schema_name)
+        compile_duration = time.perf_counter() - started
+        with span("compile_cache.store", schema=schema_name), self._cache_lock:
+            entry = self.compile_cache.put(
+                schema_name=schema_name,
+                key=key,
+                schema_path=schema_path.resolve(),
+                root_backend=result.root_backend,
+                scripts=result.scripts,
+                context=result.context,
+                compile_duration=compile_duration,
+            )
+        return entry, False
+
+    def precompile(self, schema_name: str, schema_path: Path) -> RunOutcome:
+        """
+        Compiles a schema ahead of running it, so that its run finds it
+        cached. Errors (invalid schemas mostly) are returned in full.
+        """
+        started = time.perf_counter()
+        try:
+            _, cached = self.prepare(schema_name, schema_path)
+        except Exception as e:
+            return RunOutcome(
+                schema=schema_name,
+                ok=False,
+                error=str(e) or e.__class__.__name__,
+                duration=time.perf_counter() - started,
+            )
+        return RunOutcome(
+            schema=schema_name,
+            ok=True,
+            cached=cached,
+            duration=time.perf_counter() - started,
+        )
+
+    def run(self, schema_name: str, schema_path: Path) -> None:
+        entry, _ = self.prepare(schema_name, schema_path)
+        self.interpreter.run_compiled(
+            root_backend=entry.root_backend, schema_name=schema_name
+        )
+
+    async def run_async(self, schema_name: str, schema_path: Path) -> RunOutcome:
+        started = time.perf_counter()
+        try:
+            entry, cached = await asyncio.to_thread(
+                self.prepare, schema_name, schema_path
+            )
+            await self.interpreter.run_compiled_async(
+                root_backend=entry.root_backend, schema_name=schema_name
+            )
+        except Exception as e:
+            return RunOutcome(
+                schema=schema_name,
+                ok=False,
+                error=(str(e) or e.__class__.__name__).splitlines()[0],
+                duration=time.perf_counter() - started,
+            )
+        return RunOutcome(
+            schema=schema_name,
+            ok=True,
+            cached=cached,
+            duration=time.perf_counter() - started,
+        )
+
+    async def run_many_async(
+        self, schemas: Dict[str, Path], jobs: int
+    ) -> List[RunOutcome]:
+        semaphore = asyncio.Semaphore(max(jobs, 1))
+
+        async def limited(schema_name: str, schema_path: Path) -> RunOutcome:
+            async with semaphore:
+                return await self.run_async(schema_name, schema_path)
+
+        return list(
+            await asyncio.gather(
+                *(limited(name, path) for name, path in schemas.items())
+            )
+        )
+
+    def run_many(self, schemas: Dict[str, Path], jobs: int) -> List[RunOutcome]:
+        """
+        Prepares and launches schemas concurrently, at most `jobs` at a time.
+        Failures are reported per schema instead of stopping the others.
+        """
+        return asyncio.run(self.run_many_async(schemas, jobs))
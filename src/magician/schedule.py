@@ -0,0 +1,265 @@
+"""
+Staged pane starts.
+
+With `max_concurrent_starts` set in the app config, panes get a
+`python -m magician.schedule gate ...` command ahead of their own. Panes are
+ordered by `stage` (then by where they're declared) and released in waves
+of at most `max_concurrent_starts` panes of the same stage, one wave every
+`start_interval` seconds. Waves shrink while the CPU is under pressure.
+
+Gates take turns releasing waves through a state file, which `magic run`
+resets before launching. They run in every waiting pane, so this module
+sticks to the standard library to start quickly.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from magician.utils.modules import module_command
+
+PRESSURE_PATH = Path("/proc/pressure/cpu")
+
+K = TypeVar("K", bound=Hashable)
+
+
+def read_pressure(path: Path = PRESSURE_PATH) -> Optional[Tuple[float, int]]:
+    """`some` CPU pressure: 10s average percentage and total stall µs."""
+    try:
+        with open(path) as file:
+            for line in file:
+                kind, *fields = line.split()
+                if kind == "some":
+                    values = dict(field.split("=") for field in fields)
+                    return float(values["avg10"]), int(values["total"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+class CpuMonitor:
+    """
+    How busy the CPU is, from pressure stall information where available
+    (measured since an earlier sample) or else the load average.
+    """
+
+    def __init__(
+        self,
+        pressure_path: Path = PRESSURE_PATH,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.pressure_path = pressure_path
+        self.clock = clock
+
+    def sample(self) -> Optional[List[float]]:
+        """When it was taken and total stall µs, to measure pressure since."""
+        pressure = read_pressure(self.pressure_path)
+        return None if pressure is None else [self.clock(), pressure[1]]
+
+    def busy(self, since: Optional[Sequence[float]] = None) -> float:
+        """Between 0 (idle) and 1 (saturated)."""
+        pressure = read_pressure(self.pressure_path)
+        if pressure is None:
+            try:
+                load = os.getloadavg()[0]
+            except OSError:
+                return 0.0
+            return min(load / (os.cpu_count() or 1), 1.0)
+
+        avg10, total = pressure
+        now = self.clock()
+        if since and now > since[0]:
+            stalled = (total - since[1]) / 1e6 / (now - since[0])
+            return min(max(stalled, 0.0), 1.0)
+        return min(avg10 / 100, 1.0)
+
+
+def wave_size(max_starts: int, busy: float) -> int:
+    """Panes a wave starts, none while the CPU is saturated."""
+    return round(max_starts * (1 - busy))
+
+
+def new_state() -> Dict[str, Any]:
+    # panes released so far by position, when the last wave was and the
+    # pressure sample the next one measures from
+    return {"released": 0, "last_release": 0, "pressure": None}
+
+
+def reset_schedule(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(new_state()))
+
+
+class Schedule:
+    """
+    Pane positions get released in waves that never span stages,
+    `stage_ends` being the position following each stage's last pane.
+    Waves are held back while the CPU is saturated, for up to
+    `MAX_HELD_INTERVALS` intervals.
+    """
+
+    MAX_HELD_INTERVALS = 10
+
+    def __init__(
+        self,
+        path: Path,
+        stage_ends: Sequence[int],
+        max_starts: int,
+        interval: float,
+        monitor: Optional[CpuMonitor] = None,
+    ) -> None:
+        self.path = path
+        self.stage_ends = sorted(stage_ends)
+        self.max_starts = max_starts
+        self.interval = interval
+        self.monitor = monitor or CpuMonitor()
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.path.with_suffix(".lock")
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return {**new_state(), **json.loads(self.path.read_text())}
+        except (OSError, ValueError, TypeError):
+            return new_state()
+
+    def _stage_end(self, released: int) -> int:
+        return next((end for end in self.stage_ends if end > released), sys.maxsize)
+
+    def _wave(self, state: Dict[str, Any], now: float) -> int:
+        """Size of the wave to release now, if any."""
+        if now - state["last_release"] < self.interval:
+            return 0
+        if not state["released"]:
+            # the first wave goes right away
+            return max(wave_size(self.max_starts, self.monitor.busy()), 1)
+
+        since = state["pressure"]
+        size = wave_size(self.max_starts, self.monitor.busy(since=since))
+        if since is None or now - since[0] >= self.interval:
+            state["pressure"] = self.monitor.sample()
+        held_for = now - state["last_release"]
+        if not size and held_for >= self.interval * self.MAX_HELD_INTERVALS:
+            size = 1
+        return size
+
+    def try_release(self, position: int) -> bool:
+        """Whether `position` is released, releasing the next wave if due."""
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self._read()
+            released = int(state["released"])
+            if position < released:
+                return True
+
+            now = time.time()
+            previous = dict(state)
+            if size := self._wave(state, now):
+                released = min(released + size, self._stage_end(released))
+                state.update(
+                    released=released,
+                    last_release=now,
+                    pressure=self.monitor.sample(),
+                )
+            if state != previous:
+                self.path.write_text(json.dumps(state))
+            return position < released
+
+    def wait(self, position: int, timeout: float, poll: float = 0.05) -> bool:
+        """Waits for `position` to be released, for up to `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        while not self.try_release(position):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+
+def start_positions(stages: Dict[K, int]) -> Tuple[Dict[K, int], List[int]]:
+    """
+    Positions panes start at, by stage and then in the given order, along
+    with where every stage ends.
+    """
+    ordered = sorted(stages, key=lambda name: stages[name])
+    positions = {name: position for position, name in enumerate(ordered)}
+    stage_ends: Dict[int, int] = {}
+    for position, name in enumerate(ordered):
+        stage_ends[stages[name]] = position + 1
+    return positions, sorted(stage_ends.values())
+
+
+def gate_command(
+    *,
+    state: Path,
+    position: int,
+    stage_ends: Sequence[int],
+    max_starts: int,
+    interval: float,
+    timeout: float = 300,
+) -> List[str]:
+    return [
+        *module_command("magician.schedule"),
+        "gate",
+        "--state",
+        str(state),
+        "--position",
+        str(position),
+        "--stage-ends",
+        ",".join(str(end) for end in stage_ends),
+        "--max-starts",
+        str(max_starts),
+        "--interval",
+        f"{interval:g}",
+        "--timeout",
+        f"{timeout:g}",
+    ]
+
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m magician.schedule")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gate = subparsers.add_parser("gate", help="Waits for the pane's turn to start.")
+    gate.add_argument("--state", type=Path, required=True)
+    gate.add_argument("--position", type=int, required=True)
+    gate.add_argument("--stage-ends", type=_ints, default=[])
+    gate.add_argument("--max-starts", type=int, required=True)
+    gate.add_argument("--interval", type=float, default=1)
+    gate.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args(argv)
+
+    schedule = Schedule(
+        path=args.state,
+        stage_ends=args.stage_ends,
+        max_starts=args.max_starts,
+        interval=args.interval,
+    )
+    if not schedule.wait(args.position, timeout=args.timeout):
+        print(
+            f"magician: starting without waiting for a turn after {args.timeout:g}s",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
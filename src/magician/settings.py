@@ -2,36 +2,33 @@
 Deals with app config itself.
 """
 
-
-
 from enum import Enum
 import shutil
 import os
 from pathlib import Path
-from typing import Any
+from typing import Optional
 
 from pydantic import Field
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
-     SettingsConfigDict,
+    SettingsConfigDict,
     TomlConfigSettingsSource,
 )
 
-# from platformdirs import user_config_path
-# CONFIG_FOLDER = user_config_path("Magician", "vieiraleao2005")
+from magician import paths
 
-ROOT_FOLDER = Path(__file__).parent.parent.parent.resolve()
-CONFIG_FILE_PATH = ROOT_FOLDER / "./config.toml"
-SAMPLE_CONFIG_FILE_PATH = ROOT_FOLDER / "./config.sample.toml"
+ROOT_FOLDER = Path(paths.ROOT_FOLDER).resolve()
+CONFIG_FILE_PATH = Path(paths.CONFIG_FILE)
+SAMPLE_CONFIG_FILE_PATH = Path(paths.SAMPLE_CONFIG_FILE)
 
-a
 
 class ShellType(Enum):
     BASH = "bash"
     ZSH = "zsh"
     FISH = "fish"
 
+
 class AppConfig(BaseSettings):
     default_shell: ShellType = Field(
         default=ShellType.BASH,
@@ -49,6 +46,52 @@ class AppConfig(BaseSettings):
         default=ROOT_FOLDER / "data/",
         description="Folder for application data and scripts.",
     )
+    compile_cache: bool = Field(
+        default=True,
+        description="Reuse compiled scripts while a schema stays unchanged.",
+    )
+    compile_cache_max_entries: int = Field(
+        default=64,
+        description="Maximum amount of schemas kept in the compile cache.",
+    )
+    compile_cache_max_age: float = Field(
+        default=60 * 60 * 24 * 30,
+        description="Seconds an unused compile cache entry is kept for.",
+    )
+    schema_cache: bool = Field(
+        default=True,
+        description="Keep validated schemas on disk to skip YAML parsing.",
+    )
+    run_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description="Maximum amount of schemas compiled and launched at once.",
+    )
+
+    watch_debounce: float = Field(
+        default=0.3,
+        ge=0,
+        description="Seconds schema files have to stay unchanged before being precompiled.",
+    )
+
+    telemetry: bool = Field(
+        default=False,
+        description="Record when panes get ready and how long their commands take.",
+    )
+
+    max_concurrent_starts: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description=(
+            "Panes started at once, in waves by `stage`. Unlimited if unset. "
+            "Not applied with kitty's `launch_per_command`."
+        ),
+    )
+    start_interval: float = Field(
+        default=1.0,
+        ge=0,
+        description="Seconds between waves of pane starts.",
+    )
 
     model_config = SettingsConfigDict(toml_file=CONFIG_FILE_PATH)
 
@@ -59,9 +102,14 @@ class AppConfig(BaseSettings):
 
     @classmethod
     def settings_customise_sources(
-        cls, settings_cls: type[BaseSettings], *_, **__
+        cls,
+        settings_cls: type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        *_,
+        **__,
     ) -> tuple[PydanticBaseSettingsSource, ...]:
-        return (TomlConfigSettingsSource(settings_cls),)
+        # explicit overrides take precedence over the config file
+        return (init_settings, TomlConfigSettingsSource(settings_cls))
 
 
 def get_config() -> AppConfig:
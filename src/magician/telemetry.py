@@ -0,0 +1,280 @@
+"""
+Runtime telemetry of launched panes.
+
+With `telemetry` enabled in the app config, compiled panes get their
+commands wrapped with markers appending timestamps to the schema's log:
+when the pane's shell got ready and when every command started and exited
+(with its exit code). `magic run` marks where each run starts, so that
+`magic stats` can tell how long panes take to get ready across runs.
+
+Lines are tab separated `<time> <event> <pane> [<command> [<exit code>]]`,
+small enough for appends to never interleave.
+"""
+
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import attrs
+
+from magician.ir.ops import Chdir, CreatePane, Env, Exec, Op
+from magician.settings import AppConfig, ShellType
+from magician.utils.shell import ShellWord
+
+RUN = "run"
+READY = "ready"
+START = "start"
+EXIT = "exit"
+
+LINE_FORMAT = "%s\\t%s\\t%s\\t%s\\t%s\\n"
+# microseconds like `TelemetryLog.record_run`, from any shell; date without %N
+# support prints it as is, leaving whole seconds once stripped
+PRECISE_NOW = ShellWord("\"$(date +%s.%N | sed 's/[.]N$//')\"")
+
+
+def telemetry_log_path(app_cfg: AppConfig, schema_name: str) -> Path:
+    return app_cfg.data_folder / "telemetry" / f"{schema_name}.log"
+
+
+@attrs.define(frozen=True)
+class Telemetry:
+    """Instruments panes' ops so that they record their events to `path`."""
+
+    path: Path
+    shell: ShellType = ShellType.BASH
+    # prefix of pane names, like the root pane of child panes
+    scope: Optional[str] = None
+
+    def scoped(self, scope: str) -> "Telemetry":
+        return attrs.evolve(self, scope=scope)
+
+    @property
+    def _now(self) -> ShellWord:
+        match self.shell:
+            case ShellType.FISH:
+                return ShellWord("(date +%s.%N)")
+            case _:
+                # bash older than 5 has no EPOCHREALTIME, settle for seconds
+                return ShellWord("${EPOCHREALTIME:-$(date +%s)}")
+
+    @property
+    def _exit_code(self) -> ShellWord:
+        return ShellWord("$status" if self.shell is ShellType.FISH else "$?")
+
+    def marker(
+        self,
+        event: str,
+        pane: str,
+        index: Optional[int] = None,
+        code: bool = False,
+        now: Optional[ShellWord] = None,
+    ) -> List[str]:
+        """Command appending an event to the log, as the pane's shell runs it."""
+        return [
+            "printf",
+            LINE_FORMAT,
+            now or self._now,
+            event,
+            f"{self.scope}/{pane}" if self.scope else pane,
+            "" if index is None else str(index),
+            self._exit_code if code else "",
+            ShellWord(">>"),
+            str(self.path),
+        ]
+
+    def ready_commands(self, pane: str) -> List[List[str]]:
+        commands = [self.marker(READY, pane)]
+        if self.shell is ShellType.ZSH:
+            # EPOCHREALTIME comes with a module
+            commands.insert(0, ["zmodload", "zsh/datetime"])
+        return commands
+
+    def instrument(self, ops: List[Op]) -> List[Op]:
+        """
+        Pass recording when each pane's shell runs its first command, and
+        the start and exit of every command it runs.
+        """
+        instrumented: List[Op] = []
+        pane: Optional[str] = None
+        pending_ready = False  # leaves directory and environment ops be
+        index = 0
+        for op in ops:
+            if pending_ready and not isinstance(op, (Chdir, Env, Exec)):
+                instrumented.append(Exec(*self.ready_commands(pane or "")))
+                pending_ready = False
+            if isinstance(op, CreatePane):
+                pane, index, pending_ready = op.name or "", 0, True
+                instrumented.append(op)
+            elif pane is not None and isinstance(op, Exec):
+                commands: List[Sequence[str]] = []
+                if pending_ready:
+                    commands.extend(self.ready_commands(pane))
+                    pending_ready = False
+                for command in op.commands:
+                    commands.append(self.marker(START, pane, index))
+                    commands.append(command)
+                    commands.append(self.marker(EXIT, pane, index, code=True))
+                    index += 1
+                instrumented.append(Exec(*commands))
+            else:
+                instrumented.append(op)
+        if pending_ready:
+            instrumented.append(Exec(*self.ready_commands(pane or "")))
+        return instrumented
+
+
+class TelemetryLog:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def record_run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write(f"{time.time():.6f}\t{RUN}\t\t\t\n")
+
+    def read_runs(self) -> List["Run"]:
+        """Events of every run, skipping those recorded before the first."""
+        if not self.path.exists():
+            return []
+        runs: List[Run] = []
+        with open(self.path, errors="replace") as file:
+            for line in file:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 5:
+                    continue
+                try:
+                    # EPOCHREALTIME follows the locale's decimal separator
+                    at = float(fields[0].replace(",", "."))
+                except ValueError:
+                    continue
+                event, pane, index, code = fields[1:]
+                if event == RUN:
+                    runs.append(Run(started=at))
+                elif runs:
+                    runs[-1].add(
+                        at=at,
+                        event=event,
+                        pane=pane,
+                        index=int(index) if index.isdigit() else None,
+                        code=int(code) if code.lstrip("-").isdigit() else None,
+                    )
+        return runs
+
+
+@attrs.define
+class PaneRun:
+    ready: Optional[float] = None
+    # command index to seconds since the run started
+    starts: Dict[int, float] = attrs.field(factory=dict)
+    durations: Dict[int, float] = attrs.field(factory=dict)
+    codes: Dict[int, int] = attrs.field(factory=dict)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for code in self.codes.values() if code)
+
+
+@attrs.define
+class Run:
+    started: float
+    panes: Dict[str, PaneRun] = attrs.field(factory=dict)
+
+    def add(
+        self,
+        *,
+        at: float,
+        event: str,
+        pane: str,
+        index: Optional[int] = None,
+        code: Optional[int] = None,
+    ) -> None:
+        pane_run = self.panes.setdefault(pane, PaneRun())
+        elapsed = at - self.started
+        if event == READY and pane_run.ready is None:
+            pane_run.ready = elapsed
+        elif index is None:
+            return
+        elif event == START:
+            pane_run.starts[index] = elapsed
+        elif event == EXIT and index in pane_run.starts:
+            pane_run.durations[index] = elapsed - pane_run.starts[index]
+            if code is not None:
+                pane_run.codes[index] = code
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """`q`th percentile, interpolating between the closest values."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@attrs.define
+class Summary:
+    name: str
+    count: int
+    p50: float
+    p95: float
+    failed: int = 0
+
+    @classmethod
+    def of(cls, name: str, values: List[float], failed: int = 0) -> "Summary":
+        return cls(
+            name=name,
+            count=len(values),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            failed=failed,
+        )
+
+
+def _pane_names(runs: List[Run]) -> List[str]:
+    names: Dict[str, None] = {}
+    for run in runs:
+        names.update(dict.fromkeys(run.panes))
+    return list(names)
+
+
+def ready_summaries(runs: List[Run]) -> List[Summary]:
+    """Time to ready of every pane across runs, in first seen order."""
+    summaries = []
+    for name in _pane_names(runs):
+        pane_runs = [run.panes[name] for run in runs if name in run.panes]
+        ready = [pane.ready for pane in pane_runs if pane.ready is not None]
+        if ready:
+            summaries.append(
+                Summary.of(name, ready, failed=sum(pane.failed for pane in pane_runs))
+            )
+    return summaries
+
+
+def command_summaries(runs: List[Run]) -> List[Summary]:
+    """Durations of every pane's commands that exited, across runs."""
+    durations: Dict[str, List[float]] = {}
+    failed: Dict[str, int] = {}
+    for name in _pane_names(runs):
+        for run in runs:
+            pane = run.panes.get(name)
+            for index, duration in sorted(pane.durations.items()) if pane else ():
+                command = f"{name} #{index}"
+                durations.setdefault(command, []).append(duration)
+                failed[command] = failed.get(command, 0) + bool(pane.codes.get(index))
+    return [
+        Summary.of(command, values, failed=failed[command])
+        for command, values in durations.items()
+    ]
+
+
+def format_summaries(summaries: List[Summary], title: str) -> str:
+    width = max([len(title), *(len(summary.name) for summary in summaries)])
+    lines = [f"{title:<{width}}  {'runs':>5}  {'p50':>9}  {'p95':>9}  {'failed':>6}"]
+    for summary in summaries:
+        lines.append(
+            f"{summary.name:<{width}}  {summary.count:>5}  "
+            f"{summary.p50 * 1000:>7.0f}ms  {summary.p95 * 1000:>7.0f}ms  "
+            f"{summary.failed:>6}"
+        )
+    return "\n".join(lines)
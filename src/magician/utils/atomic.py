@@ -0,0 +1,44 @@
+import os
+import stat
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+# lines are buffered up to this many bytes before hitting the file
+WRITE_BUFFER_SIZE = 1 << 16
+
+
+@contextmanager
+def atomic_open(path: Path, executable: bool = False) -> Iterator[IO[str]]:
+    """
+    Opens a temporary file next to `path` for writing, which replaces `path`
+    only once the block exits cleanly. Readers never see a partially
+    written file, and a failure leaves the previous one in place.
+    """
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, "x", buffering=WRITE_BUFFER_SIZE) as file:
+            yield file
+        if executable:
+            mode = tmp_path.stat().st_mode
+            tmp_path.chmod(mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_lines(file: IO[str], lines: Iterable[str]) -> None:
+    """Writes lines separated by newlines, consuming them lazily."""
+    for index, line in enumerate(lines):
+        if index:
+            file.write("\n")
+        file.write(line)
+
+
+def write_lines_atomic(
+    path: Path, lines: Iterable[str], executable: bool = False
+) -> None:
+    with atomic_open(path, executable=executable) as file:
+        write_lines(file, lines)
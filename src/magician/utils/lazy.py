@@ -0,0 +1,44 @@
+import importlib
+from typing import Dict, Generic, Iterator, MutableMapping, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def import_string(path: str):
+    """Imports an object from a 'package.module:attribute' path."""
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class LazyMapping(Generic[K, V], MutableMapping[K, V]):
+    """
+    Mapping whose values are given as import paths and only get imported
+    once looked up. Values may also be set directly.
+    """
+
+    def __init__(self, paths: Dict[K, str]) -> None:
+        self._paths: Dict[K, str] = dict(paths)
+        self._loaded: Dict[K, V] = {}
+
+    def __getitem__(self, key: K) -> V:
+        if key not in self._loaded:
+            self._loaded[key] = import_string(self._paths[key])
+        return self._loaded[key]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._paths.pop(key, None)
+        self._loaded[key] = value
+
+    def __delitem__(self, key: K) -> None:
+        if key not in self._paths and key not in self._loaded:
+            raise KeyError(key)
+        self._paths.pop(key, None)
+        self._loaded.pop(key, None)
+
+    def __iter__(self) -> Iterator[K]:
+        yield from self._loaded
+        yield from (key for key in self._paths if key not in self._loaded)
+
+    def __len__(self) -> int:
+        return len(self._loaded.keys() | self._paths.keys())
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+from typing import List
+
+import magician
+
+
+def module_command(module: str) -> List[str]:
+    """
+    Command running one of magician's modules in panes with the interpreter
+    compiling the scripts, importing magician from where that one does (it
+    needn't be installed, e.g. when run from a checkout).
+    """
+    import_root = Path(magician.__file__).resolve().parent.parent
+    return ["env", f"PYTHONPATH={import_root}", sys.executable, "-m", module]
@@ -1,9 +1,38 @@
+import asyncio
 import subprocess
 import platform
 from typing import List
 
+from .tracing import span
+
 
 def open_app(run_cmd: List[str]):
+    with span("open_app", cmd=" ".join(run_cmd)):
+        _open_app(run_cmd)
+
+
+def platform_cmd(run_cmd: List[str]) -> List[str]:
+    system = platform.system()
+
+    match system:
+        case "Windows":
+            return ["cmd", "/c", "start", "", *run_cmd]
+        case "Darwin":
+            return ["open", "-a", *run_cmd]
+        case "Linux":
+            return run_cmd
+        case _:
+            raise NotImplementedError(f"Platform name '{system}' not supported!")
+
+
+async def open_app_async(run_cmd: List[str]) -> int:
+    """Like `open_app`, without blocking the event loop. Returns the exit code."""
+    with span("open_app", cmd=" ".join(run_cmd)):
+        process = await asyncio.create_subprocess_exec(*platform_cmd(run_cmd))
+        return await process.wait()
+
+
+def _open_app(run_cmd: List[str]):
     system = platform.system()
 
     match system:
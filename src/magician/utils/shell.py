@@ -0,0 +1,13 @@
+import shlex
+from typing import Iterable
+
+
+class ShellWord(str):
+    """Command argument left for the shell to expand (e.g. `$?`), unquoted."""
+
+
+def join_command(command: Iterable[str]) -> str:
+    """Like `shlex.join`, except for `ShellWord` arguments."""
+    return " ".join(
+        arg if isinstance(arg, ShellWord) else shlex.quote(arg) for arg in command
+    )
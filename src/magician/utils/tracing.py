@@ -0,0 +1,120 @@
+"""
+Lightweight span tracing, exported as Chrome trace events
+(chrome://tracing, https://ui.perfetto.dev).
+
+Tracing is off by default, in which case `span` hands back a shared no-op
+context manager and records nothing.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import attrs
+
+_NOOP = contextlib.nullcontext()
+
+
+@attrs.define
+class SpanEvent:
+    name: str
+    start_us: float
+    duration_us: float
+    thread_id: int
+    args: Dict[str, Any] = attrs.field(factory=dict)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: List[SpanEvent] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def reset(self) -> None:
+        self.enabled = False
+        self.events = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def _span(self, name: str, args: Dict[str, Any]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = SpanEvent(
+                name=name,
+                start_us=(start - self._origin) * 1e6,
+                duration_us=(end - start) * 1e6,
+                thread_id=threading.get_ident(),
+                args=args,
+            )
+            with self._lock:
+                self.events.append(event)
+
+    def span(self, name: str, /, **args: Any) -> contextlib.AbstractContextManager:
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, {k: str(v) for k, v in args.items()})
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": event.name,
+                    "cat": event.name.partition(".")[0],
+                    "ph": "X",
+                    "ts": round(event.start_us, 3),
+                    "dur": round(event.duration_us, 3),
+                    "pid": pid,
+                    "tid": event.thread_id,
+                    "args": event.args,
+                }
+                for event in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_chrome_trace(self, path: Path) -> None:
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file)
+
+    def format_summary(self) -> str:
+        totals: Dict[str, List[float]] = {}
+        for event in self.events:
+            totals.setdefault(event.name, []).append(event.duration_us / 1000)
+
+        width = max((len(name) for name in totals), default=4)
+        lines = [f"{'span':<{width}}  {'count':>5}  {'total ms':>9}  {'max ms':>8}"]
+        for name, durations in sorted(
+            totals.items(), key=lambda item: sum(item[1]), reverse=True
+        ):
+            lines.append(
+                f"{name:<{width}}  {len(durations):>5}  "
+                f"{sum(durations):>9.2f}  {max(durations):>8.2f}"
+            )
+        return "\n".join(lines)
+
+
+tracer = Tracer()
+
+
+def span(name: str, /, **args: Any) -> contextlib.AbstractContextManager:
+    """
+    Times the wrapped block under `name` while tracing is enabled.
+    Extra keyword arguments show up as span arguments in the trace.
+    """
+    return tracer.span(name, **args)
+
+
+def enable() -> None:
+    tracer.enable()
@@ -0,0 +1,211 @@
+"""
+Watching the schemas folder to precompile schemas as they get saved, for
+`magic watch` and `magic serve --watch`, so that the next `magic run`
+finds them in the compile cache (and invalid schemas are reported while
+still being edited).
+
+Changes are read from inotify on Linux and by polling the folder
+elsewhere. Editors tend to save in bursts (temporary files, renames,
+several writes), so changes are only reported once the folder stayed
+quiet for a moment.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from magician.cache.index import SCHEMA_SUFFIXES, SchemaIndex
+from magician.runner import RunOutcome, SchemaRunner
+
+POLL_INTERVAL = 0.5
+# how often a watcher waiting for changes checks whether it was stopped
+STOP_CHECK_INTERVAL = 0.5
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _schema_name(file_name: str) -> Optional[str]:
+    stem, suffix = os.path.splitext(file_name)
+    return stem if suffix in SCHEMA_SUFFIXES else None
+
+
+class ChangeSource(ABC):
+    @abstractmethod
+    def wait(self, timeout: float) -> Set[str]:
+        """
+        Waits up to `timeout` seconds for schema files to change. Returns
+        the names of the changed (or removed) schemas, if any.
+        """
+
+    def close(self) -> None: ...
+
+
+class PollingChangeSource(ChangeSource):
+    def __init__(self, folder: Path, interval: float = POLL_INTERVAL) -> None:
+        self.folder = folder
+        self.interval = interval
+        self._stamps = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        stamps: Dict[str, Tuple[int, int]] = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for dir_entry in it:
+                    if _schema_name(dir_entry.name) is None:
+                        continue
+                    try:
+                        stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    stamps[dir_entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return stamps
+
+    def _changed(self) -> Set[str]:
+        stamps = self._scan()
+        changed = {
+            name
+            for name in stamps.keys() | self._stamps.keys()
+            if stamps.get(name) != self._stamps.get(name)
+        }
+        self._stamps = stamps
+        return {name for file_name in changed if (name := _schema_name(file_name))}
+
+    def wait(self, timeout: float) -> Set[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            if changed := self._changed():
+                return changed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            time.sleep(min(self.interval, remaining))
+
+
+class InotifyChangeSource(ChangeSource):
+    """Reads inotify events of the folder through libc, on Linux."""
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self._fd, os.fsencode(folder), INOTIFY_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"Can't watch {folder}")
+
+    def _read_events(self) -> Set[str]:
+        changed: Set[str] = set()
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            raw_name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                logger.trace("Missed inotify events, treating every schema as changed")
+                changed.update(
+                    name
+                    for file_name in os.listdir(self.folder)
+                    if (name := _schema_name(file_name))
+                )
+            elif name := _schema_name(os.fsdecode(raw_name)):
+                changed.add(name)
+        return changed
+
+    def wait(self, timeout: float) -> Set[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return set()
+            # events of other files (swap files and such) keep waiting
+            if changed := self._read_events():
+                return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def open_change_source(folder: Path) -> ChangeSource:
+    try:
+        return InotifyChangeSource(folder)
+    except (OSError, AttributeError) as e:
+        logger.trace(f"Polling {folder} for changes: {e}")
+        return PollingChangeSource(folder)
+
+
+class SchemaWatcher:
+    """
+    Reports which schemas of a folder changed, once saving them is over:
+    changes are collected until none came in for `debounce` seconds.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        debounce: float,
+        source: Optional[ChangeSource] = None,
+    ) -> None:
+        self.folder = folder
+        self.debounce = debounce
+        self.source = source or open_change_source(folder)
+
+    def __enter__(self) -> "SchemaWatcher":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.source.close()
+
+    def changes(self, stop: Optional[threading.Event] = None) -> Iterator[Set[str]]:
+        """Yields names of changed schemas, until `stop` gets set."""
+        pending: Set[str] = set()
+        while not (stop and stop.is_set()):
+            timeout = self.debounce if pending else STOP_CHECK_INTERVAL
+            if changed := self.source.wait(timeout):
+                pending |= changed
+            elif pending:
+                yield pending
+                pending = set()
+
+
+def precompile(
+    runner: SchemaRunner, index: SchemaIndex, names: Iterable[str]
+) -> List[RunOutcome]:
+    """Precompiles the named schemas, skipping the ones that no longer exist."""
+    outcomes = []
+    for name in sorted(names):
+        schema_path = index.resolve(name)
+        if schema_path and schema_path.exists():
+            outcomes.append(runner.precompile(name, schema_path))
+    return outcomes
@@ -0,0 +1,11 @@
+SESSION_NAME=magician
+if tmux has-session -t "$SESSION_NAME" 2>/dev/null; then
+   tmux attach-session -t "$SESSION_NAME"
+   exit 0
+fi
+tmux new-session -d -s "$SESSION_NAME"
+tmux new-window -t :1 -k -n test_pane
+tmux send-keys -t "$SESSION_NAME":1 'cd /root' C-m
+tmux send-keys -t "$SESSION_NAME":1 'echo Hello' C-m
+tmux send-keys -t "$SESSION_NAME":1 bash C-m
+tmux attach-session -t "$SESSION_NAME"
\ No newline at end of file
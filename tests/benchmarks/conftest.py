@@ -0,0 +1,28 @@
+import os
+import stat
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from tests.benchmarks.tmux_shim import TMUX_PATH, TmuxShim
+
+
+@pytest.fixture
+def tmux_shim(tmp_path: Path) -> Iterator[TmuxShim]:
+    bin_folder = tmp_path / "bin"
+    bin_folder.mkdir()
+    log_file = tmp_path / "tmux.log"
+    socket_name = f"magician-bench-{os.getpid()}"
+
+    shim = bin_folder / "tmux"
+    shim.write_text(
+        f'#!/bin/sh\necho "$*" >> {log_file}\nexec {TMUX_PATH} -L {socket_name} "$@"\n'
+    )
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR)
+
+    tmux_shim = TmuxShim(
+        bin_folder=bin_folder, log_file=log_file, socket_name=socket_name
+    )
+    yield tmux_shim
+    tmux_shim.tmux("kill-server")
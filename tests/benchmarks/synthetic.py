@@ -0,0 +1,71 @@
+"""
+Generates synthetic schemas along the axes compile time scales with.
+"""
+
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import attrs
+import yaml
+
+MACROS: List[Dict[str, Any]] = [
+    {"macro": "python-activate-venv"},
+    {"macro": "goto-dir", "options": {"dir": "/srv/project/shared"}},
+]
+
+
+@attrs.define(frozen=True)
+class ScaleCase:
+    name: str
+    root_panes: int
+    # roots with children are nested, the others are plain panes
+    children_per_root: int = 0
+    commands_per_pane: int = 1
+    # share of commands that are macros rather than plain strings
+    macro_density: float = 0.0
+
+    @property
+    def panes(self) -> int:
+        return self.root_panes * max(self.children_per_root, 1)
+
+
+def run_commands(case: ScaleCase, rng: random.Random, pane: str) -> List[Any]:
+    return [
+        rng.choice(MACROS)
+        if rng.random() < case.macro_density
+        else f"echo {pane} step-{index} --flag={rng.randint(0, 99)}"
+        for index in range(case.commands_per_pane)
+    ]
+
+
+def build_schema(case: ScaleCase, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    setup: Dict[str, Any] = {}
+    for root in range(case.root_panes):
+        name = f"root{root}"
+        pane: Dict[str, Any] = {
+            "dir": f"svc{root}",
+            "run": run_commands(case, rng, name),
+        }
+        if case.children_per_root:
+            pane["nested"] = True
+            pane["panes"] = {
+                f"{name}-child{child}": {
+                    "dir": f"part{child % 7}",
+                    "run": run_commands(case, rng, f"{name}-child{child}"),
+                }
+                for child in range(case.children_per_root)
+            }
+        setup[name] = pane
+
+    return {
+        "wizard": {"root": {"backend": "kitty", "nested": {"backend": "tmux"}}},
+        "project": {"dir": "/srv/project", "setup": setup},
+    }
+
+
+def write_schema(case: ScaleCase, folder: Path) -> Path:
+    path = folder / f"{case.name}.yml"
+    path.write_text(yaml.safe_dump(build_schema(case), sort_keys=False))
+    return path
@@ -0,0 +1,149 @@
+"""
+Times parsing, compiling and writing scripts for synthetic schemas. Timings
+depend too much on the machine (and whatever else it is running) to compare
+them to `baseline.json` on every test run, so by default stages only have
+to finish within a generous limit.
+
+Environment variables:
+- MAGICIAN_BENCH=1 fails on regressions from the baseline
+- MAGICIAN_UPDATE_BASELINE=1 stores this run as the new baseline
+- MAGICIAN_BENCH_RESULTS=<path> saves this run's results as JSON
+- MAGICIAN_BENCH_THRESHOLD=<ratio> slowdown tolerated before failing (2.5)
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+import pytest
+
+from magician.config.interpreter import CompileResult, ConfigInterpreter
+from magician.config.parser import parse_config_file
+from magician.config.schema import MagicConfigSchema
+from magician.settings import AppConfig
+from magician.utils.atomic import write_lines_atomic
+
+from tests.benchmarks.synthetic import ScaleCase, write_schema
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+REPEATS = 3
+# timings this short are mostly noise, so they're compared as if they took this
+MIN_COMPARED_MS = 5.0
+MEMORY_THRESHOLD = 1.5
+# smoke check of runs not comparing to the baseline
+SMOKE_LIMIT_MS = 10_000
+
+CASES = [
+    ScaleCase(name="flat", root_panes=200, commands_per_pane=3),
+    ScaleCase(name="nested", root_panes=10, children_per_root=50, commands_per_pane=3),
+    ScaleCase(
+        name="long-runs", root_panes=4, children_per_root=10, commands_per_pane=50
+    ),
+    ScaleCase(
+        name="macro-heavy",
+        root_panes=10,
+        children_per_root=50,
+        commands_per_pane=6,
+        macro_density=0.5,
+    ),
+]
+
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+
+def measure(run: Callable[[], Any]) -> Dict[str, float]:
+    """Best wall time out of a few runs, and peak traced memory of one."""
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": round(min(timings) * 1000, 2), "peak_kb": round(peak / 1024)}
+
+
+def read_scripts(result: CompileResult) -> Dict[Path, List[str]]:
+    return {path: path.read_text().split("\n") for path in result.scripts}
+
+
+def write_scripts(scripts: Dict[Path, List[str]]) -> None:
+    for path, lines in scripts.items():
+        write_lines_atomic(path, lines)
+
+
+@pytest.fixture(scope="module")
+def results() -> Iterator[Results]:
+    results: Results = {}
+    yield results
+
+    if os.environ.get("MAGICIAN_UPDATE_BASELINE"):
+        baseline = (
+            json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        )
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    if output := os.environ.get("MAGICIAN_BENCH_RESULTS"):
+        Path(output).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(case: str, stages: Dict[str, Dict[str, float]]) -> List[str]:
+    if os.environ.get("MAGICIAN_UPDATE_BASELINE") or not BASELINE_PATH.exists():
+        return []
+    baseline = json.loads(BASELINE_PATH.read_text()).get(case, {})
+    threshold = float(os.environ.get("MAGICIAN_BENCH_THRESHOLD", 2.5))
+
+    found = []
+    for stage, current in stages.items():
+        previous = baseline.get(stage)
+        if not previous:
+            continue
+        slowdown = max(current["ms"], MIN_COMPARED_MS) / max(
+            previous["ms"], MIN_COMPARED_MS
+        )
+        if slowdown > threshold:
+            found.append(f"{stage}: {previous['ms']}ms -> {current['ms']}ms")
+        if current["peak_kb"] > previous["peak_kb"] * MEMORY_THRESHOLD:
+            found.append(
+                f"{stage}: peak {previous['peak_kb']}KB -> {current['peak_kb']}KB"
+            )
+    return found
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: case.name)
+def test_compile_scale(
+    case: ScaleCase, tmp_app_config: AppConfig, tmp_path: Path, results: Results
+):
+    schema_path = write_schema(case, folder=tmp_path)
+    config: MagicConfigSchema = parse_config_file(file=schema_path)
+
+    def compile_schema() -> CompileResult:
+        interpreter = ConfigInterpreter(app_cfg=tmp_app_config)
+        return interpreter.compile(config=config, schema_name=case.name)
+
+    scripts = read_scripts(compile_schema())
+    stages = {
+        "parse": measure(lambda: parse_config_file(file=schema_path)),
+        "compile": measure(compile_schema),
+        "write": measure(lambda: write_scripts(scripts)),
+    }
+    results[case.name] = stages
+
+    print(
+        f"\n{case.name} ({case.panes} panes): "
+        + ", ".join(
+            f"{stage} {stats['ms']}ms/{stats['peak_kb']}KB"
+            for stage, stats in stages.items()
+        )
+    )
+    assert all(stats["ms"] < SMOKE_LIMIT_MS for stats in stages.values())
+    if os.environ.get("MAGICIAN_BENCH"):
+        assert not regressions(case.name, stages)
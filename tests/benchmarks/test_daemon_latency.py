@@ -0,0 +1,110 @@
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+
+from magician.daemon.client import SOCKET_ENV, request
+from magician.daemon.server import serve
+from magician.settings import AppConfig
+
+from tests.plugins.fake_kitty import FakeKittyServer
+
+RUNS = 10
+
+# opens tabs in a running kitty, so that the run is over once the daemon
+# (or the process) has talked to it
+SCHEMA = """
+wizard:
+  root:
+    backend:
+      name: kitty
+      options:
+        remote: true
+        listen_on: {listen_on}
+project:
+  dir: /tmp
+  setup:
+    editor:
+      run: ["nvim ."]
+    shell: {{}}
+"""
+
+# `magic run` without a daemon, against the temporary app config
+IN_PROCESS_SCRIPT = """
+import sys
+from magician import settings
+from magician.init import main
+
+app_cfg = settings.AppConfig(data_folder=sys.argv[1], schemas_folder=sys.argv[2])
+settings.get_config = lambda: app_cfg
+sys.argv = ["magic", "run", "bench"]
+main()
+"""
+
+
+@pytest.fixture
+def fake_kitty(tmp_path: Path) -> Iterator[FakeKittyServer]:
+    server = FakeKittyServer(path=tmp_path / "kitty.sock").start()
+    yield server
+    server.stop()
+
+
+def timed_runs(cmd: List[str], env: Dict[str, str]) -> List[float]:
+    durations = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def test_run_latency(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_kitty: FakeKittyServer,
+):
+    (tmp_app_config.schemas_folder / "bench.yml").write_text(
+        SCHEMA.format(listen_on=fake_kitty.listen_on)
+    )
+    env = dict(os.environ)
+    in_process = timed_runs(
+        [
+            sys.executable,
+            "-c",
+            IN_PROCESS_SCRIPT,
+            str(tmp_app_config.data_folder),
+            str(tmp_app_config.schemas_folder),
+        ],
+        env=env,
+    )
+
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    path = tmp_path / "magic.sock"
+    thread = threading.Thread(target=serve, args=(path,), daemon=True)
+    thread.start()
+    while request({"command": "ping"}, path=path) is None:
+        thread.join(0.01)
+    try:
+        through_daemon = timed_runs(
+            [sys.executable, "-m", "magician.init", "run", "bench"],
+            env={**env, SOCKET_ENV: str(path)},
+        )
+    finally:
+        request({"command": "stop"}, path=path)
+        thread.join(5)
+
+    assert len(fake_kitty.received) == 2 * 2 * RUNS  # every run opened both tabs
+    floor = timed_runs([sys.executable, "-c", "pass"], env=env)
+    print(
+        f"\n`magic run` medians: in process {statistics.median(in_process) * 1000:.1f}ms, "
+        f"through the daemon {statistics.median(through_daemon) * 1000:.1f}ms "
+        f"(bare interpreter {statistics.median(floor) * 1000:.1f}ms)"
+    )
+    assert statistics.median(through_daemon) < statistics.median(in_process)
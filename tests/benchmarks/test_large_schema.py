@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# compiles in a fresh interpreter, so that peak RSS is the compile's own
+COMPILE_SCRIPT = """
+import json, resource, sys
+from pathlib import Path
+
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.schema import MagicConfigSchema
+from magician.settings import AppConfig
+
+data_folder, root_panes, child_panes = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+schema = MagicConfigSchema.model_validate({
+    "wizard": {"root": {"backend": "kitty", "nested": {"backend": "tmux"}}},
+    "project": {"dir": "/srv", "setup": {
+        f"root{r}": {
+            "nested": True,
+            "run": ["git fetch", {"macro": "python-activate-venv"}],
+            "panes": {
+                f"pane{c}": {"dir": f"svc{c % 50}", "run": [f"make serve PORT={c}"]}
+                for c in range(child_panes)
+            },
+        }
+        for r in range(root_panes)
+    }},
+})
+app_cfg = AppConfig.model_validate({
+    "data_folder": data_folder, "schemas_folder": data_folder,
+})
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result = ConfigInterpreter(app_cfg=app_cfg).compile(config=schema, schema_name="big")
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "before_kb": before,
+    "peak_kb": after,
+    "script_bytes": sum(Path(p).stat().st_size for p in result.scripts),
+}))
+"""
+
+
+def compile_synthetic(tmp_path: Path, root_panes: int, child_panes: int) -> dict:
+    data_folder = tmp_path / f"data-{root_panes * child_panes}"
+    data_folder.mkdir()
+    result = subprocess.run(
+        [sys.executable, "-c", COMPILE_SCRIPT, str(data_folder)]
+        + [str(root_panes), str(child_panes)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_compile_10k_panes_peak_rss(tmp_path: Path):
+    small = compile_synthetic(tmp_path, root_panes=10, child_panes=100)
+    large = compile_synthetic(tmp_path, root_panes=10, child_panes=1000)
+
+    for panes, stats in ((1_000, small), (10_000, large)):
+        print(
+            f"\ncompile {panes} panes: peak RSS {stats['peak_kb'] / 1024:.1f}MB "
+            f"(+{(stats['peak_kb'] - stats['before_kb']) / 1024:.1f}MB), "
+            f"scripts {stats['script_bytes'] / 1024:.0f}KB"
+        )
+    # scripts aren't held in memory, so growth stays well under their size
+    assert large["script_bytes"] > 10 * small["script_bytes"] * 0.9
+    assert (large["peak_kb"] - large["before_kb"]) * 1024 < large["script_bytes"]
@@ -0,0 +1,103 @@
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.config.interpreter import ConfigInterpreter
+from magician.settings import AppConfig
+from magician.telemetry import TelemetryLog, telemetry_log_path
+
+from tests.fakes import FakeTerminals
+
+PANE_COUNT = 8
+FIRST_STAGE = ("pane-0", "pane-1")
+START_INTERVAL = 0.1
+# a CPU bound startup, like an editor loading its plugins
+STARTUP = f"{sys.executable} -S -c 'sum(range(10_000_000))'"
+
+
+def build_schema(project_dir: Path) -> str:
+    lines = [
+        "wizard:",
+        "  root:",
+        "    backend: kitty",
+        "project:",
+        f"  dir: {project_dir}",
+        "  setup:",
+    ]
+    for index in range(PANE_COUNT):
+        name = f"pane-{index}"
+        lines.append(f"    {name}:")
+        lines.append(f"      stage: {0 if name in FIRST_STAGE else 1}")
+        lines.append(f'      run: ["{STARTUP}"]')
+    return "\n".join(lines) + "\n"
+
+
+def startups(app_cfg: AppConfig) -> Dict[str, Tuple[float, float]]:
+    """Seconds since launch each pane's startup began and ended at."""
+    (run,) = TelemetryLog(telemetry_log_path(app_cfg, "bench")).read_runs()
+    spans = {}
+    for name, pane in run.panes.items():
+        last = max(pane.durations)  # startup comes after waiting for a turn
+        spans[name] = (pane.starts[last], pane.starts[last] + pane.durations[last])
+    return spans
+
+
+def launch(
+    app_cfg: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+    max_concurrent_starts: Optional[int],
+) -> Dict[str, Tuple[float, float]]:
+    app_cfg = app_cfg.model_copy(
+        update={
+            "telemetry": True,
+            "max_concurrent_starts": max_concurrent_starts,
+            "start_interval": START_INTERVAL,
+        }
+    )
+    monkeypatch.setattr("magician.settings.get_config", lambda: app_cfg)
+    telemetry_log_path(app_cfg, "bench").unlink(missing_ok=True)
+
+    result = CliRunner().invoke(cli, ["run", "bench", "--no-cache"])
+
+    assert result.exit_code == 0, result.output
+    return startups(app_cfg)
+
+
+def test_staged_starts(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_terminals: FakeTerminals,
+):
+    (tmp_app_config.schemas_folder / "bench.yml").write_text(build_schema(tmp_path))
+
+    results = {}
+    for mode, max_starts in (("all at once", None), ("staged", 2)):
+        spans = launch(tmp_app_config, monkeypatch, max_concurrent_starts=max_starts)
+        assert len(spans) == PANE_COUNT
+        first_stage = max(spans[name][1] for name in FIRST_STAGE)
+        all_ready = max(end for _, end in spans.values())
+        results[mode] = (first_stage, all_ready)
+        if max_starts:
+            # every pane went through its gate, which released them all
+            state_path = ConfigInterpreter(tmp_app_config).schedule_state_path("bench")
+            assert json.loads(state_path.read_text())["released"] == PANE_COUNT
+            # later stages wait for a wave of their own, an interval later
+            later_starts = [
+                start for name, (start, _) in spans.items() if name not in FIRST_STAGE
+            ]
+            first_starts = [spans[name][0] for name in FIRST_STAGE]
+            assert min(later_starts) >= min(first_starts) + START_INTERVAL
+
+    print(
+        f"\nstarting {PANE_COUNT} panes, first stage ready / all ready: "
+        + ", ".join(
+            f"{mode} {first * 1000:.0f}ms / {last * 1000:.0f}ms"
+            for mode, (first, last) in results.items()
+        )
+    )
@@ -0,0 +1,110 @@
+import subprocess
+import time
+from pathlib import Path
+from typing import List
+
+from magician.plugins.tmux import TmuxPlugin
+from magician.settings import AppConfig
+
+from tests.benchmarks.tmux_shim import TmuxShim, requires_tmux
+from tests.fakes import FakeTerminals
+
+PANE_COUNT = 30
+# every fake tmux call starts a python interpreter, so fewer panes
+FAKE_PANE_COUNT = 10
+
+
+def build_script(
+    plugin: TmuxPlugin, session_name: str, pane_count: int = PANE_COUNT
+) -> List[str]:
+    contents = [*plugin.pre_init(session_name=session_name)]
+    for index in range(pane_count):
+        contents.extend(plugin.create_pane(name=f"pane-{index}"))
+        contents.extend(plugin.goto_dir(path=Path("/tmp")))
+        contents.extend(plugin.run_cmd(command=["echo", f"pane {index}"]))
+    contents.extend(plugin.post_init())
+    return contents
+
+
+def run_script(plugin: TmuxPlugin, tmux_shim: TmuxShim, name: str) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        plugin.get_script_cmd(script_name=name),
+        env=tmux_shim.env,
+        capture_output=True,
+    )
+    return time.perf_counter() - started
+
+
+def window_names(tmux_shim: TmuxShim, session_name: str) -> List[str]:
+    result = tmux_shim.tmux("list-windows", "-t", session_name, "-F", "#{window_name}")
+    return result.stdout.splitlines()
+
+
+@requires_tmux
+def test_batch_forks_and_wall_time(tmp_app_config: AppConfig, tmux_shim: TmuxShim):
+    timings = {}
+    forks = {}
+    for batch in (False, True):
+        mode = "batch" if batch else "per-line"
+        plugin = TmuxPlugin(app_cfg=tmp_app_config, batch=batch)
+        session_name = f"bench-{mode}"
+        plugin.write_script(
+            name=mode, contents=build_script(plugin, session_name=session_name)
+        )
+
+        tmux_shim.reset()
+        timings[mode] = run_script(plugin, tmux_shim, name=mode)
+        forks[mode] = len(tmux_shim.invocations)
+
+        assert window_names(tmux_shim, session_name) == [
+            f"pane-{index}" for index in range(PANE_COUNT)
+        ]
+
+    print(
+        f"\ntmux {PANE_COUNT} panes: "
+        + ", ".join(
+            f"{mode} {forks[mode]} forks / {timings[mode] * 1000:.1f}ms"
+            for mode in timings
+        )
+    )
+    # has-session + per-pane commands + attach vs. has-session + one build + attach
+    assert forks["per-line"] == 3 + PANE_COUNT * 3
+    assert forks["batch"] == 3
+
+
+def test_batch_forks_with_fake_tmux(
+    tmp_app_config: AppConfig, fake_terminals: FakeTerminals
+):
+    """Same comparison without tmux installed, with a fixed cost per client."""
+    fake_terminals.set_latency({"tmux": 0.002})
+    timings = {}
+    for batch in (False, True):
+        mode = "batch" if batch else "per-line"
+        plugin = TmuxPlugin(app_cfg=tmp_app_config, batch=batch)
+        session_name = f"bench-{mode}"
+        plugin.write_script(
+            name=mode,
+            contents=build_script(
+                plugin, session_name=session_name, pane_count=FAKE_PANE_COUNT
+            ),
+        )
+
+        fake_terminals.reset()
+        started = time.perf_counter()
+        subprocess.run(plugin.get_script_cmd(script_name=mode), capture_output=True)
+        timings[mode] = time.perf_counter() - started
+
+        assert fake_terminals.windows(session_name) == [
+            f"pane-{index}" for index in range(FAKE_PANE_COUNT)
+        ]
+        if batch:
+            assert fake_terminals.forks("tmux") == 3
+        else:
+            assert fake_terminals.forks("tmux") == 3 + FAKE_PANE_COUNT * 3
+
+    print(
+        f"\nfake tmux {FAKE_PANE_COUNT} panes: "
+        + ", ".join(f"{mode} {timing * 1000:.1f}ms" for mode, timing in timings.items())
+    )
+    assert timings["batch"] < timings["per-line"]
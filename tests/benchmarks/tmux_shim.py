@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List
+
+import attrs
+import pytest
+
+TMUX_PATH = shutil.which("tmux")
+
+requires_tmux = pytest.mark.skipif(TMUX_PATH is None, reason="tmux not installed")
+
+
+@attrs.define
+class TmuxShim:
+    """
+    `tmux` executable placed first in PATH that logs every client
+    invocation and forwards it to a private server socket.
+    """
+
+    bin_folder: Path
+    log_file: Path
+    socket_name: str
+
+    @property
+    def env(self) -> dict:
+        # a bare shell keeps window startup from dominating the measurements
+        return {
+            **os.environ,
+            "PATH": f"{self.bin_folder}:{os.environ['PATH']}",
+            "SHELL": "/bin/sh",
+        }
+
+    @property
+    def invocations(self) -> List[str]:
+        if not self.log_file.exists():
+            return []
+        return self.log_file.read_text().splitlines()
+
+    def reset(self) -> None:
+        self.log_file.unlink(missing_ok=True)
+
+    def tmux(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [str(TMUX_PATH), "-L", self.socket_name, *args],
+            capture_output=True,
+            text=True,
+        )
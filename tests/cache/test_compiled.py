@@ -0,0 +1,147 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from magician.cache import CompileCache
+from magician.cache.compiled import CompileManifest
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.parser import parse_config_file
+from magician.settings import AppConfig
+
+
+def compile_and_store(app_cfg: AppConfig, cache: CompileCache, schema_path: Path):
+    name = schema_path.stem
+    key = cache.compute_key(schema_name=name, schema_path=schema_path)
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(
+        config=parse_config_file(file=schema_path), schema_name=name
+    )
+    return cache.put(
+        schema_name=name,
+        key=key,
+        schema_path=schema_path,
+        root_backend=result.root_backend,
+        scripts=result.scripts,
+        context=result.context,
+    )
+
+
+def test_hit_after_compile(tmp_app_config: AppConfig, example_schema: Path):
+    cache = CompileCache(app_cfg=tmp_app_config)
+    entry = compile_and_store(tmp_app_config, cache, example_schema)
+
+    # kitty session, plus a script and a layout per nested tmux session
+    assert len(entry.scripts) == 5
+    assert all(script.exists() for script in entry.scripts)
+
+    # fresh instance reads manifest back from disk
+    cache = CompileCache(app_cfg=tmp_app_config)
+    key = cache.compute_key(schema_name="example", schema_path=example_schema)
+    hit = cache.get(schema_name="example", key=key)
+    assert hit is not None
+    assert hit.root_backend.name.value == "kitty"
+
+
+def test_miss_on_change(tmp_app_config: AppConfig, example_schema: Path):
+    cache = CompileCache(app_cfg=tmp_app_config)
+    entry = compile_and_store(tmp_app_config, cache, example_schema)
+
+    example_schema.write_text(example_schema.read_text() + "\n# edited\n")
+    key = cache.compute_key(schema_name="example", schema_path=example_schema)
+    assert key != entry.key
+    assert cache.get(schema_name="example", key=key) is None
+
+
+def test_miss_on_missing_script(tmp_app_config: AppConfig, example_schema: Path):
+    cache = CompileCache(app_cfg=tmp_app_config)
+    entry = compile_and_store(tmp_app_config, cache, example_schema)
+
+    entry.scripts[0].unlink()
+    assert cache.get(schema_name="example", key=entry.key) is None
+
+
+def test_miss_once_baked_in_path_changes(
+    tmp_app_config: AppConfig, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    (tmp_path / ".venv" / "bin").mkdir(parents=True)
+    (tmp_path / ".venv" / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    schema_path = tmp_app_config.schemas_folder / "venv.yml"
+    schema_path.write_text(
+        "wizard: {root: {backend: kitty}}\n"
+        f"project: {{dir: {tmp_path}, setup: {{api: {{run: "
+        "[{macro: python-activate-venv}, serve]}}}\n"
+    )
+    monkeypatch.setenv("PATH", "/usr/bin")
+    cache = CompileCache(app_cfg=tmp_app_config)
+    entry = compile_and_store(tmp_app_config, cache, schema_path)
+    assert entry.context == {"PATH": "/usr/bin"}
+
+    monkeypatch.chdir(tmp_path)  # no relative dirs, so the directory is fine
+    assert cache.get(schema_name="venv", key=entry.key)
+    monkeypatch.setenv("PATH", "/opt/bin:/usr/bin")
+    assert cache.get(schema_name="venv", key=entry.key) is None
+
+
+def test_evicts_by_count_and_age(tmp_app_config: AppConfig, example_schema: Path):
+    cache = CompileCache(app_cfg=tmp_app_config, max_entries=2, max_age=60)
+    schemas = []
+    for name in ("a", "b", "c"):
+        path = tmp_app_config.schemas_folder / f"{name}.yml"
+        path.write_text(example_schema.read_text())
+        schemas.append(path)
+        compile_and_store(tmp_app_config, cache, path)
+
+    assert set(cache.manifest.entries) == {"b", "c"}
+    assert not (
+        tmp_app_config.data_folder / "scripts" / "a" / "kitty" / "a.conf"
+    ).exists()
+
+    # last used long ago, as recorded by another process
+    manifest = CompileManifest.model_validate_json(cache.manifest_path.read_bytes())
+    manifest.entries["b"].last_used = time.time() - 120
+    cache.manifest_path.write_text(manifest.model_dump_json())
+    assert cache.evict() == ["b"]
+    assert set(cache.manifest.entries) == {"c"}
+
+
+def test_refresh_after_other_process_writes(
+    tmp_app_config: AppConfig, example_schema: Path
+):
+    cache = CompileCache(app_cfg=tmp_app_config)
+    assert not cache.manifest.entries
+    compile_and_store(
+        tmp_app_config, CompileCache(app_cfg=tmp_app_config), example_schema
+    )
+
+    cache.refresh()
+
+    assert "example" in cache.manifest.entries
+
+
+def test_writers_keep_each_others_entries(
+    tmp_app_config: AppConfig, example_schema: Path
+):
+    other = tmp_app_config.schemas_folder / "other.yml"
+    other.write_text(example_schema.read_text())
+    first, second = (CompileCache(app_cfg=tmp_app_config) for _ in range(2))
+    assert not first.manifest.entries and not second.manifest.entries
+
+    compile_and_store(tmp_app_config, first, example_schema)
+    compile_and_store(tmp_app_config, second, other)
+
+    manifest = CompileCache(app_cfg=tmp_app_config).manifest
+    assert set(manifest.entries) == {"example", "other"}
+    assert not list(first.manifest_path.parent.glob("*.tmp"))
+
+
+def test_hits_leave_manifest_alone(tmp_app_config: AppConfig, example_schema: Path):
+    cache = CompileCache(app_cfg=tmp_app_config)
+    entry = compile_and_store(tmp_app_config, cache, example_schema)
+    written = cache.manifest_path.stat().st_mtime_ns
+
+    for _ in range(3):
+        assert CompileCache(app_cfg=tmp_app_config).get(
+            schema_name="example", key=entry.key
+        )
+
+    assert cache.manifest_path.stat().st_mtime_ns == written
@@ -0,0 +1,137 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from magician.cache import SchemaIndex
+from magician.settings import AppConfig
+
+OLD_MTIME = (1_000_000, 1_000_000)
+
+
+def add_schema(app_cfg: AppConfig, example: Path, name: str, **replace: str) -> Path:
+    contents = example.read_text()
+    for old, new in replace.items():
+        contents = contents.replace(old, new)
+    path = app_cfg.schemas_folder / name
+    path.write_text(contents)
+    os.utime(path, OLD_MTIME)
+    return path
+
+
+def age_folder(app_cfg: AppConfig) -> None:
+    # recent mtimes aren't trusted, see RACY_MTIME_WINDOW_NS
+    os.utime(app_cfg.schemas_folder, OLD_MTIME)
+
+
+def test_resolve(tmp_app_config: AppConfig, example_schema: Path):
+    add_schema(tmp_app_config, example_schema, "both.yaml")
+    both_yml = add_schema(tmp_app_config, example_schema, "both.yml")
+    age_folder(tmp_app_config)
+
+    index = SchemaIndex(app_cfg=tmp_app_config)
+    assert index.resolve("example") == example_schema
+    assert index.resolve("both") == both_yml
+    assert index.resolve("missing") is None
+
+
+def test_resolve_skips_scan_when_folder_unchanged(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    age_folder(tmp_app_config)
+    SchemaIndex(app_cfg=tmp_app_config).resolve("example")
+
+    index = SchemaIndex(app_cfg=tmp_app_config)
+    monkeypatch.setattr(index, "_scan", lambda: pytest.fail("rescanned folder"))
+    assert index.resolve("example") == example_schema
+
+    # new files move the folder mtime and get picked up
+    monkeypatch.undo()
+    added = add_schema(tmp_app_config, example_schema, "added.yml")
+    assert index.resolve("added") == added
+
+
+def test_list_and_filter(tmp_app_config: AppConfig, example_schema: Path):
+    add_schema(
+        tmp_app_config,
+        example_schema,
+        "api.yml",
+        **{
+            "# name: my-project": "name: payments",
+            "# description: This is my project and an optional field.": (
+                "description: Payment service"
+            ),
+        },
+    )
+    (tmp_app_config.schemas_folder / "broken.yml").write_text("project: {}\n")
+    (tmp_app_config.schemas_folder / "notes.txt").write_text("not a schema")
+
+    index = SchemaIndex(app_cfg=tmp_app_config)
+    entries = {entry.name: entry for entry in index.list()}
+
+    assert list(entries) == ["api", "broken", "example"]
+    assert entries["api"].project_name == "payments"
+    assert entries["api"].root_panes == 2
+    assert entries["api"].child_panes == 6
+    assert entries["broken"].error
+
+    assert [entry.name for entry in index.list(filter="PAYMENT")] == ["api"]
+    assert [entry.name for entry in index.list(filter="ex*")] == ["example"]
+
+
+def test_list_only_rereads_changed(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    other = add_schema(tmp_app_config, example_schema, "other.yml")
+    os.utime(example_schema, OLD_MTIME)
+    SchemaIndex(app_cfg=tmp_app_config).list()
+
+    index = SchemaIndex(app_cfg=tmp_app_config)
+    read = []
+    original_read_entry = index._read_entry
+    monkeypatch.setattr(
+        index,
+        "_read_entry",
+        lambda name, path: read.append(name) or original_read_entry(name, path),
+    )
+    other.write_text(other.read_text() + "\n")
+    index.list()
+
+    assert read == ["other"]
+
+
+def test_corrupt_index_is_rebuilt(tmp_app_config: AppConfig, example_schema: Path):
+    index = SchemaIndex(app_cfg=tmp_app_config)
+    index.index_path.parent.mkdir(parents=True, exist_ok=True)
+    index.index_path.write_text('{"version": 1, "entr')
+
+    assert index.resolve("example") == example_schema
+    assert SchemaIndex(app_cfg=tmp_app_config).resolve("example") == example_schema
+
+
+def test_save_merges_entries_read_elsewhere(
+    tmp_app_config: AppConfig, example_schema: Path
+):
+    other = add_schema(tmp_app_config, example_schema, "other.yml")
+    os.utime(example_schema, OLD_MTIME)
+    age_folder(tmp_app_config)
+    SchemaIndex(app_cfg=tmp_app_config).resolve("example")
+
+    # both load the unread index, then each reads a different schema
+    first = SchemaIndex(app_cfg=tmp_app_config)
+    second = SchemaIndex(app_cfg=tmp_app_config)
+    assert first.data.entries and second.data.entries
+    first.data.entries["example"] = first._read_entry("example", example_schema)
+    first._save({"example"}, scanned=False)
+    second.data.entries["other"] = second._read_entry("other", other)
+    second._save({"other"}, scanned=False)
+
+    entries = SchemaIndex(app_cfg=tmp_app_config).data.entries
+    assert (
+        entries["example"].mtime_ns == entries["other"].mtime_ns == OLD_MTIME[1] * 10**9
+    )
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_app_config.data_folder / "cache")) == [
+        "index.json",
+        "index.lock",
+    ]
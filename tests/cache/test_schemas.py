@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from magician.cache import WarmSchemaCache, schemas
+from magician.settings import AppConfig
+
+
+def test_warm_cache_rereads_changed_files(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    validated: List[Any] = []
+    validate_config = schemas.validate_config
+    monkeypatch.setattr(
+        schemas,
+        "validate_config",
+        lambda data: validated.append(data) or validate_config(data),
+    )
+    cache = WarmSchemaCache(app_cfg=tmp_app_config, persist=False)
+    # recent mtimes aren't trusted, see RACY_MTIME_WINDOW_NS
+    os.utime(example_schema, (1_000_000, 1_000_000))
+
+    first = cache.load(example_schema)
+    assert cache.load(example_schema) is first
+    assert len(validated) == 1
+
+    example_schema.write_text(example_schema.read_text() + "\n")
+    os.utime(example_schema, (2_000_000, 2_000_000))
+    assert cache.load(example_schema) is not first
+    assert len(validated) == 2
+
+
+def test_cache_entries_are_written_atomically(
+    tmp_app_config: AppConfig, example_schema: Path
+):
+    cache = schemas.SchemaCache(app_cfg=tmp_app_config)
+    config = cache.load(example_schema)
+
+    assert os.listdir(cache.folder) == [cache._entry_path(example_schema).name]
+    assert schemas.SchemaCache(app_cfg=tmp_app_config).load(example_schema) == config
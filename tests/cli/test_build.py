@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cache import CompileCache
+from magician.cli.cli import cli
+from magician.settings import AppConfig
+
+SCHEMA = """
+wizard:
+  root:
+    backend: kitty
+    nested:
+      backend: tmux
+project:
+  dir: /tmp
+  setup:
+    {pane}:
+      nested: true
+      panes:
+        shell:
+          run:
+            - echo {pane}
+"""
+
+
+def test_build_compiles_every_schema_once(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    schemas_folder = tmp_app_config.schemas_folder
+    # both have a tmux script named "work_api_x"
+    (schemas_folder / "work.yml").write_text(SCHEMA.format(pane="api_x"))
+    (schemas_folder / "work_api.yml").write_text(SCHEMA.format(pane="x"))
+    (schemas_folder / "broken.yml").write_text("wizard: 1\n")
+
+    result = CliRunner().invoke(cli, ["build", "--jobs", "2"])
+
+    assert result.exit_code == 1
+    assert "3 compiled, 0 up to date, 1 failed" in result.output
+    manifest = CompileCache(app_cfg=tmp_app_config).manifest
+    assert set(manifest.entries) == {"example", "work", "work_api"}
+    assert all(entry.compile_duration > 0 for entry in manifest.entries.values())
+    scripts = [
+        script for entry in manifest.entries.values() for script in entry.scripts
+    ]
+    assert len(set(scripts)) == len(scripts)
+    assert all(script.exists() for script in scripts)
+
+    (schemas_folder / "broken.yml").unlink()
+    (schemas_folder / "work.yml").write_text(SCHEMA.format(pane="web"))
+    result = CliRunner().invoke(cli, ["build"])
+
+    assert result.exit_code == 0, result.output
+    assert "1 compiled, 2 up to date, 0 failed" in result.output
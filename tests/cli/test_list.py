@@ -0,0 +1,24 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.settings import AppConfig
+
+
+def test_list(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    (tmp_app_config.schemas_folder / "broken.yml").write_text("wizard: 1\n")
+
+    result = CliRunner().invoke(cli, ["list"])
+
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].startswith("broken  invalid:")
+    assert lines[1] == "example  2 root / 6 child panes"
+
+    result = CliRunner().invoke(cli, ["list", "--filter", "exa"])
+    assert result.output.splitlines() == ["example  2 root / 6 child panes"]
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Iterator, List
+
+import attrs
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.settings import AppConfig
+from magician.utils import tracing
+
+
+@attrs.define
+class FakeProcess:
+    returncode: int
+
+    async def wait(self) -> int:
+        await asyncio.sleep(0.01)
+        return self.returncode
+
+
+@pytest.fixture
+def launched(
+    tmp_app_config: AppConfig, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[List[List[str]]]:
+    """Records commands `open_app` would spawn instead of running them."""
+    calls: List[List[str]] = []
+
+    async def create_subprocess_exec(*cmd, **_):
+        calls.append(list(cmd))
+        return FakeProcess(returncode=1 if Path(cmd[-1]).stem == "fail" else 0)
+
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    monkeypatch.setattr(
+        "magician.utils.open.subprocess.run", lambda cmd, **_: calls.append(cmd)
+    )
+    monkeypatch.setattr(
+        "magician.utils.open.asyncio.create_subprocess_exec", create_subprocess_exec
+    )
+    yield calls
+    tracing.tracer.reset()
+
+
+def test_run_profile_and_timings(
+    example_schema: Path, launched: List[List[str]], tmp_path: Path
+):
+    profile = tmp_path / "trace.json"
+
+    result = CliRunner().invoke(
+        cli, ["--profile", str(profile), "--timings", "run", "example"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert launched[0][:2] == ["kitty", "--detach"]
+
+    names = [event["name"] for event in json.loads(profile.read_text())["traceEvents"]]
+    for expected in (
+        "get_config",
+        "parse",
+        "compile",
+        "compile.root_pane",
+        "compile.child_pane",
+        "compile.process_macros",
+        "compile.write_script",
+        "open_app",
+    ):
+        assert expected in names
+    assert names.count("compile.child_pane") == 6
+    assert "compile.write_script" in result.stderr
+
+
+def test_run_uses_compile_cache(example_schema: Path, launched: List[List[str]]):
+    runner = CliRunner()
+    assert runner.invoke(cli, ["run", "example"]).exit_code == 0
+
+    result = runner.invoke(cli, ["--timings", "run", "example"])
+
+    assert result.exit_code == 0, result.output
+    assert len(launched) == 2
+    assert "compile_cache.lookup" in result.stderr
+    assert "compile.root_pane" not in result.stderr
+
+
+@pytest.fixture
+def schemas(example_schema: Path) -> List[str]:
+    names = ["work-api", "work-web", "home"]
+    for name in names:
+        (example_schema.parent / f"{name}.yml").write_text(example_schema.read_text())
+    return names
+
+
+def test_run_many(schemas: List[str], launched: List[List[str]]):
+    result = CliRunner().invoke(cli, ["run", "work-*", "home", "-j", "2"])
+
+    assert result.exit_code == 0, result.output
+    sessions = sorted(Path(cmd[-1]).stem for cmd in launched)
+    assert sessions == ["home", "work-api", "work-web"]
+    assert "3 launched, 0 failed" in result.stderr
+
+
+def test_run_many_reports_failures(
+    schemas: List[str], launched: List[List[str]], tmp_app_config: AppConfig
+):
+    (tmp_app_config.schemas_folder / "fail.yml").write_text(
+        (tmp_app_config.schemas_folder / "home.yml").read_text()
+    )
+    (tmp_app_config.schemas_folder / "broken.yml").write_text("wizard: {}\n")
+
+    result = CliRunner().invoke(cli, ["run", "home", "fail", "broken", "missing"])
+
+    assert result.exit_code == 1
+    # one failing schema doesn't keep the others from launching
+    assert [Path(cmd[-1]).stem for cmd in launched].count("home") == 1
+    assert "1 launched, 3 failed" in result.stderr
+    assert "fail  fail: kitty exited with code 1" in result.stderr
+    assert "fail  missing: no matching schema" in result.stderr
+
+
+def test_cached_scripts_depend_on_cwd_only_for_relative_dirs(
+    tmp_app_config: AppConfig,
+    launched: List[List[str]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    for name, project_dir in (("absolute", tmp_path / "api"), ("relative", "api")):
+        (tmp_app_config.schemas_folder / f"{name}.yml").write_text(
+            "wizard: {root: {backend: kitty}}\n"
+            f"project: {{dir: {project_dir}, setup: {{api: {{run: [serve]}}}}}}\n"
+        )
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+    runner = CliRunner()
+    monkeypatch.chdir(tmp_path / "a")
+    assert runner.invoke(cli, ["build"]).exit_code == 0
+
+    monkeypatch.chdir(tmp_path / "b")
+    absolute = runner.invoke(cli, ["--timings", "run", "absolute"])
+    relative = runner.invoke(cli, ["--timings", "run", "relative"])
+
+    assert absolute.exit_code == 0, absolute.output
+    assert "compile.root_pane" not in absolute.stderr
+    assert relative.exit_code == 0, relative.output
+    assert "compile.root_pane" in relative.stderr
+    assert (
+        str(tmp_path / "b" / "api")
+        in (
+            tmp_app_config.data_folder
+            / "scripts"
+            / "relative"
+            / "kitty"
+            / "relative.conf"
+        ).read_text()
+    )
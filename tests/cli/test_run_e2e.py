@@ -0,0 +1,101 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.settings import AppConfig
+from magician.utils import tracing
+
+from tests.fakes import FakeTerminals
+
+SCHEMA = """
+wizard:
+  root:
+    backend: kitty
+    nested:
+      backend: tmux
+
+project:
+  dir: {dir}
+  setup:
+    editor:
+      run:
+        - nvim .
+    services:
+      nested: true
+      run:
+        - git fetch
+      panes:
+        api:
+          run:
+            - make serve
+        worker:
+          run-before:
+            - export QUEUE=jobs
+          run:
+            - make work
+"""
+
+
+@pytest.fixture
+def schemas(
+    tmp_app_config: AppConfig, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> Iterator[Path]:
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    for name in ("work", "play"):
+        (tmp_app_config.schemas_folder / f"{name}.yml").write_text(
+            SCHEMA.format(dir=tmp_path)
+        )
+    yield tmp_app_config.schemas_folder
+    tracing.tracer.reset()
+
+
+def test_run_end_to_end(schemas: Path, fake_terminals: FakeTerminals):
+    result = CliRunner().invoke(cli, ["run", "work"])
+
+    assert result.exit_code == 0, result.output
+    assert fake_terminals.tabs() == ["editor", "services"]
+    assert fake_terminals.windows("work_services") == ["api", "worker"]
+    sent = fake_terminals.state["tmux"]["work_services"]["windows"]["1"]["sent"]
+    assert sent[-1] == "export QUEUE=jobs; git fetch; make work"
+
+    # kitty opens first and its tab then runs the tmux script, line by line
+    calls = fake_terminals.invocations
+    assert [call.bin for call in calls] == ["kitty"] + ["tmux"] * 9
+    assert [call.argv[0] for call in calls[1:]] == [
+        "has-session",
+        "new-session",
+        "new-window",
+        "send-keys",  # cd
+        "send-keys",
+        "set-option",  # tags the window before moving on to the next
+        "send-keys",
+        "send-keys",
+        "set-option",
+    ]
+    assert all(previous.end <= call.start for previous, call in zip(calls, calls[1:]))
+    assert calls[1].code == 1  # session wasn't running yet
+
+
+def test_reconcile_after_run(schemas: Path, fake_terminals: FakeTerminals):
+    runner = CliRunner()
+    assert runner.invoke(cli, ["run", "work"]).exit_code == 0
+
+    result = runner.invoke(cli, ["reconcile", "work", "--plan"])
+
+    assert result.exit_code == 0, result.output
+    assert "= keep    0 api" in result.output
+    assert "= keep    1 worker" in result.output
+
+
+def test_concurrent_runs_overlap(schemas: Path, fake_terminals: FakeTerminals):
+    fake_terminals.set_latency({"kitty": 0.3})
+
+    result = CliRunner().invoke(cli, ["run", "work", "play"])
+
+    assert result.exit_code == 0, result.output
+    first, second = (call for call in fake_terminals.invocations if call.bin == "kitty")
+    assert second.start < first.end
+    assert sorted(fake_terminals.state["tmux"]) == ["play_services", "work_services"]
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# cold start budget for `magic --help`, in milliseconds of import time
+STARTUP_BUDGET_MS = float(os.environ.get("MAGICIAN_STARTUP_BUDGET_MS", 150))
+
+HEAVY_MODULES = {
+    "pydantic",
+    "pydantic_settings",
+    "yaml",
+    "loguru",
+    "magician.settings",
+    "magician.config.interpreter",
+    "magician.plugins.kitty",
+    "magician.plugins.tmux",
+}
+
+
+def import_times(args: List[str]) -> Dict[str, int]:
+    """Returns cumulative import time in microseconds per imported module."""
+    cmd = [sys.executable, "-X", "importtime", *args]
+    # first run writes bytecode caches, only the second one is measured
+    subprocess.run(cmd, capture_output=True)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_help_skips_heavy_imports():
+    times = import_times(["-m", "magician.init", "--help"])
+
+    assert HEAVY_MODULES.isdisjoint(times)
+
+
+def test_help_startup_budget():
+    times = import_times(["-m", "magician.init", "--help"])
+
+    startup_ms = times["magician.cli.cli"] / 1000
+    assert startup_ms < STARTUP_BUDGET_MS, (
+        f"`magic --help` imports took {startup_ms:.1f}ms "
+        f"(budget {STARTUP_BUDGET_MS:.0f}ms)"
+    )
+
+
+def test_plugins_and_macros_load_on_use():
+    script = (
+        "import sys;"
+        "from magician.config.interpreter import PLUGIN_BACKEND_MAP;"
+        "from magician.config.schema import WizardBackendType;"
+        "PLUGIN_BACKEND_MAP[WizardBackendType.TMUX];"
+        "print(*sys.modules, sep='\\n')"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True
+    )
+    modules = set(result.stdout.splitlines())
+
+    assert "magician.plugins.tmux" in modules
+    assert "magician.plugins.kitty" not in modules
+    assert "magician.macros.python.activate_venv" not in modules
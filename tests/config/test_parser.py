@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+import pytest
+import yaml
+from pydantic import ValidationError
+
+from magician.cache import SchemaCache
+from magician.config import parser
+from magician.config.parser import parse_config_file
+from magician.config.schema import ExecModeConfig, PaneEntry
+from magician.settings import AppConfig
+
+
+def test_parse_example(example_schema: Path):
+    config = parse_config_file(file=example_schema)
+
+    assert config.wizard.root.backend.value == "kitty"
+    assert list(config.project.setup) == ["project_code", "project_run"]
+    panes = config.project.setup["project_code"].panes
+    assert panes["notifications-service"].run_before == [
+        'echo "Starting nvim in 1 second..."',
+        "sleep 1",
+    ]
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (False, None),
+        (True, ExecModeConfig()),
+        ({"shell": True}, ExecModeConfig(shell=True)),
+    ],
+)
+def test_exec_mode(value, expected):
+    assert PaneEntry.model_validate({"exec": value}).exec_mode == expected
+
+
+def test_uses_libyaml_when_available():
+    if yaml.__with_libyaml__:
+        assert parser.YamlLoader is yaml.CSafeLoader
+
+
+def test_rejects_unknown_fields(tmp_path: Path, example_schema: Path):
+    schema = tmp_path / "typo.yml"
+    schema.write_text(example_schema.read_text() + "\nprojcet: {}\n")
+
+    with pytest.raises(ValidationError):
+        parse_config_file(file=schema)
+
+
+def test_cache_roundtrip(tmp_app_config: AppConfig, example_schema: Path):
+    cache = SchemaCache(app_cfg=tmp_app_config)
+    config = parse_config_file(file=example_schema, cache=cache)
+
+    assert config == parse_config_file(file=example_schema)
+    assert cache.load(example_schema) == config
+
+
+def test_cache_skips_yaml_on_hit(
+    tmp_app_config: AppConfig, example_schema: Path, monkeypatch: pytest.MonkeyPatch
+):
+    cache = SchemaCache(app_cfg=tmp_app_config)
+    # age the file so that its mtime is trusted
+    os.utime(example_schema, (1_000_000, 1_000_000))
+    config = cache.load(example_schema)
+
+    monkeypatch.setattr(parser, "load_yaml", lambda *_: pytest.fail("parsed YAML"))
+    monkeypatch.setattr(
+        "magician.cache.schemas.load_yaml", lambda *_: pytest.fail("parsed YAML")
+    )
+    assert cache.load(example_schema) == config
+
+    # touched but unchanged contents are matched by hash
+    os.utime(example_schema, (2_000_000, 2_000_000))
+    assert cache.load(example_schema) == config
+
+
+def test_cache_invalidates_on_change(tmp_app_config: AppConfig, example_schema: Path):
+    cache = SchemaCache(app_cfg=tmp_app_config)
+    os.utime(example_schema, (1_000_000, 1_000_000))
+    cache.load(example_schema)
+
+    example_schema.write_text(
+        example_schema.read_text().replace("# name: my-project", "name: renamed")
+    )
+    os.utime(example_schema, (1_000_000, 1_000_000))
+
+    assert cache.load(example_schema).project.name == "renamed"
@@ -0,0 +1,44 @@
+from pathlib import Path
+import pytest
+
+from magician.daemon.client import SOCKET_ENV
+from magician.settings import AppConfig
+
+from tests.fakes import FakeTerminals
+
+ROOT_FOLDER = Path(__file__).parent.parent.resolve()
+EXAMPLE_SCHEMA_PATH = ROOT_FOLDER / "examples" / "example.yml"
+
+
+@pytest.fixture(autouse=True)
+def no_daemon(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keeps runs in process, whatever daemon the developer has running."""
+    monkeypatch.setenv(SOCKET_ENV, str(tmp_path / "no-daemon.sock"))
+
+
+@pytest.fixture
+def tmp_app_config(tmp_path: Path) -> AppConfig:
+    schemas_folder = tmp_path / "schemas"
+    schemas_folder.mkdir()
+    return AppConfig.model_validate(
+        {
+            "data_folder": tmp_path / "data",
+            "schemas_folder": schemas_folder,
+        }
+    )
+
+
+@pytest.fixture
+def example_schema(tmp_app_config: AppConfig) -> Path:
+    dst_path = tmp_app_config.schemas_folder / "example.yml"
+    dst_path.write_text(EXAMPLE_SCHEMA_PATH.read_text())
+    return dst_path
+
+
+@pytest.fixture
+def fake_terminals(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FakeTerminals:
+    """Routes `kitty` and `tmux` launches to recording fakes."""
+    fakes = FakeTerminals.install(tmp_path / "fake-terminals")
+    for name, value in fakes.env().items():
+        monkeypatch.setenv(name, value)
+    return fakes
@@ -0,0 +1,98 @@
+"""
+Hermetic stand-ins for the terminal programs plugins launch.
+"""
+
+import json
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import attrs
+
+FAKES_FOLDER = Path(__file__).parent
+BINARIES = ("kitty", "tmux")
+
+
+@attrs.define
+class Invocation:
+    bin: str
+    argv: List[str]
+    pid: int
+    start: float
+    end: float
+    code: int
+
+
+@attrs.define
+class FakeTerminals:
+    """
+    Fake `kitty` and `tmux` executables placed first in PATH (see
+    `tests.fakes.terminal`), with helpers for reading what they went through.
+    """
+
+    folder: Path
+
+    @property
+    def bin_folder(self) -> Path:
+        return self.folder / "bin"
+
+    @classmethod
+    def install(cls, folder: Path) -> "FakeTerminals":
+        fakes = cls(folder=folder)
+        fakes.bin_folder.mkdir(parents=True, exist_ok=True)
+        for binary in BINARIES:
+            path = fakes.bin_folder / binary
+            # without site and importing only the stdlib, to keep startup quick
+            path.write_text(
+                f"#!{sys.executable} -S\n"
+                "import sys\n"
+                f"sys.path.insert(0, {str(FAKES_FOLDER)!r})\n"
+                "from terminal import main\n"
+                f"main({binary!r})\n"
+            )
+            path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return fakes
+
+    def env(self, exec_launches: str = "bash") -> Dict[str, str]:
+        """
+        Variables routing launches to the fakes. kitty only runs launched
+        programs listed in `exec_launches`, so that editors don't hang tests.
+        """
+        return {
+            "PATH": f"{self.bin_folder}{os.pathsep}{os.environ['PATH']}",
+            "FAKE_TERMINAL_DIR": str(self.folder),
+            "FAKE_KITTY_EXEC": exec_launches,
+        }
+
+    def set_latency(self, latencies: Dict[str, float]) -> None:
+        """Seconds per "kitty"/"tmux" invocation or "tmux <command>"."""
+        (self.folder / "latency.json").write_text(json.dumps(latencies))
+
+    @property
+    def invocations(self) -> List[Invocation]:
+        log = self.folder / "log.jsonl"
+        if not log.exists():
+            return []
+        return [Invocation(**json.loads(line)) for line in log.read_text().splitlines()]
+
+    def forks(self, binary: Optional[str] = None) -> int:
+        return sum(1 for call in self.invocations if binary in (None, call.bin))
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        path = self.folder / "state.json"
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def windows(self, session_name: str) -> List[str]:
+        """Window names of a tmux session, by index."""
+        windows = self.state.get("tmux", {})[session_name]["windows"]
+        return [windows[index]["name"] for index in sorted(windows, key=int)]
+
+    def tabs(self) -> List[str]:
+        return [tab["name"] for tab in self.state.get("kitty", {}).get("tabs", [])]
+
+    def reset(self) -> None:
+        for name in ("log.jsonl", "state.json"):
+            (self.folder / name).unlink(missing_ok=True)
@@ -0,0 +1,294 @@
+"""
+Fake `kitty` and `tmux` executables.
+
+Each invocation is appended to a JSON lines log with timestamps, sleeps for
+its configured latency and updates a shared state file holding the tmux
+sessions and kitty tabs, so that `list-windows` and friends answer like the
+real thing. Everything lives in $FAKE_TERMINAL_DIR.
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# re, shlex and subprocess are imported where needed: tmux gets invoked
+# once per script line, so every fake's startup adds up
+
+Session = Dict[str, Any]
+State = Dict[str, Any]
+
+TMUX_GLOBAL_FLAGS_WITH_VALUE = {"-L", "-S", "-f"}
+
+
+class FakeTerminalError(Exception): ...
+
+
+def folder() -> Path:
+    return Path(os.environ["FAKE_TERMINAL_DIR"])
+
+
+def latency(key: str) -> float:
+    """
+    Seconds to stall for `key`: "tmux" or "kitty" apply once per invocation,
+    "tmux <command>" once per tmux command.
+    """
+    path = folder() / "latency.json"
+    latencies = json.loads(path.read_text()) if path.exists() else {}
+    return latencies.get(key, 0.0)
+
+
+def log(binary: str, argv: List[str], started: float, code: int) -> None:
+    record = {
+        "bin": binary,
+        "argv": argv,
+        "pid": os.getpid(),
+        "start": started,
+        "end": time.time(),
+        "code": code,
+    }
+    with open(folder() / "log.jsonl", "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+
+def split_commands(args: List[str]) -> List[List[str]]:
+    """Splits chained tmux commands, given as `;` or `\\;` arguments."""
+    commands: List[List[str]] = [[]]
+    for arg in args:
+        if arg in (";", "\\;"):
+            commands.append([])
+        elif arg.endswith("\\;"):
+            commands[-1].append(arg[:-2])
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+    return [command for command in commands if command]
+
+
+def parse_flags(args: List[str], with_value: str) -> Dict[str, Any]:
+    flags: Dict[str, Any] = {"args": []}
+    rest = iter(args)
+    for arg in rest:
+        if arg.startswith("-") and len(arg) == 2:
+            flags[arg] = next(rest, None) if arg[1] in with_value else True
+        else:
+            flags["args"].append(arg)
+    return flags
+
+
+class FakeTmux:
+    def __init__(self, state: State) -> None:
+        self.sessions: Dict[str, Session] = state.setdefault("tmux", {})
+        self.output: List[str] = []
+
+    def session(self, target: str) -> Session:
+        name = target.split(":", 1)[0]
+        if not name and self.sessions:
+            # no session given targets the current, latest one here
+            name = list(self.sessions)[-1]
+        if name not in self.sessions:
+            raise FakeTerminalError(f"can't find session: {name}")
+        return self.sessions[name]
+
+    def window(self, target: str) -> Dict[str, Any]:
+        session = self.session(target)
+        index = target.partition(":")[2] or str(session["active"])
+        if index not in session["windows"]:
+            raise FakeTerminalError(f"can't find window: {target}")
+        return session["windows"][index]
+
+    def run(self, command: List[str]) -> None:
+        name, args = command[0], command[1:]
+        flags = parse_flags(args, with_value="tsnF")
+        match name:
+            case "has-session":
+                self.session(flags["-t"])
+            case "new-session":
+                session_name = flags.get("-s") or str(len(self.sessions))
+                if session_name in self.sessions:
+                    raise FakeTerminalError(f"duplicate session: {session_name}")
+                self.sessions[session_name] = {
+                    "windows": {
+                        "0": {
+                            "name": flags.get("-n") or "sh",
+                            "options": {},
+                            "sent": [],
+                        }
+                    },
+                    "active": 0,
+                }
+            case "new-window":
+                target = flags["-t"]
+                session = self.session(target)
+                index = target.partition(":")[2] or str(len(session["windows"]))
+                if index in session["windows"] and not flags.get("-k"):
+                    raise FakeTerminalError(f"index in use: {index}")
+                session["windows"][index] = {
+                    "name": flags.get("-n") or "sh",
+                    "options": {},
+                    "sent": [],
+                }
+                session["active"] = int(index)
+            case "rename-window":
+                self.window(flags["-t"])["name"] = flags["args"][0]
+            case "kill-window":
+                target = flags["-t"]
+                self.window(target)
+                del self.session(target)["windows"][target.partition(":")[2]]
+            case "kill-server":
+                self.sessions.clear()
+            case "set-option":
+                option, value = flags["args"]
+                self.window(flags["-t"])["options"][option] = value
+            case "send-keys":
+                keys = flags["args"]
+                text = " ".join(key for key in keys if key != "C-m")
+                self.window(flags["-t"])["sent"].append(text)
+            case "list-windows":
+                import re
+
+                session = self.session(flags["-t"])
+                fmt = flags.get("-F") or "#{window_index}: #{window_name}"
+                for index, window in sorted(
+                    session["windows"].items(), key=lambda item: int(item[0])
+                ):
+                    values = {
+                        "window_index": index,
+                        "window_name": window["name"],
+                        **window["options"],
+                    }
+                    self.output.append(
+                        re.sub(
+                            r"#\{([^}]+)\}",
+                            lambda m: str(values.get(m.group(1), "")),
+                            fmt,
+                        )
+                    )
+            case "source-file":
+                import shlex
+
+                for line in Path(flags["args"][0]).read_text().splitlines():
+                    if line.strip() and not line.startswith("#"):
+                        for sourced in split_commands(shlex.split(line)):
+                            self.run(sourced)
+            case "start-server":
+                pass
+            case "attach-session" | "attach" | "switch-client":
+                # there is no terminal to attach to
+                pass
+            case _:
+                raise FakeTerminalError(f"unknown command: {name}")
+
+
+def tmux_main(argv: List[str], state: State) -> int:
+    args = list(argv)
+    while args and args[0].startswith("-"):
+        flag = args.pop(0)
+        if flag == "-C":
+            print("control mode is not supported", file=sys.stderr)
+            return 1
+        if flag in TMUX_GLOBAL_FLAGS_WITH_VALUE:
+            args.pop(0)
+
+    tmux = FakeTmux(state)
+    commands = split_commands(args)
+    try:
+        for command in commands:
+            time.sleep(latency(f"tmux {command[0]}"))
+            tmux.run(command)
+    except FakeTerminalError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if tmux.output:
+            print("\n".join(tmux.output))
+    return 0
+
+
+def kitty_main(argv: List[str], state: State) -> List[Dict[str, Any]]:
+    """Opens the session's tabs, returning the launches to execute."""
+    import shlex
+
+    if "--session" not in argv:
+        return []
+    session_file = Path(argv[argv.index("--session") + 1])
+
+    tabs: List[Dict[str, Any]] = state.setdefault("kitty", {}).setdefault("tabs", [])
+    launches = []
+    cwd: Optional[str] = None
+    for line in session_file.read_text().splitlines():
+        keyword, _, rest = line.partition(" ")
+        match keyword:
+            case "new_tab":
+                tabs.append({"name": rest, "cwd": None, "launched": []})
+                cwd = None
+            case "cd":
+                cwd = rest
+                if tabs:
+                    tabs[-1]["cwd"] = rest
+            case "launch":
+                if not tabs:
+                    tabs.append({"name": "", "cwd": None, "launched": []})
+                tabs[-1]["launched"].append(rest)
+                launch: Dict[str, Any] = {
+                    "cmd": shlex.split(rest),
+                    "cwd": cwd,
+                    "env": {},
+                }
+                while launch["cmd"] and launch["cmd"][0].startswith("--"):
+                    option, _, value = launch["cmd"].pop(0).partition("=")
+                    value = value or launch["cmd"].pop(0)
+                    if option == "--cwd":
+                        launch["cwd"] = value
+                    elif option == "--env":
+                        key, _, env_value = value.partition("=")
+                        launch["env"][key] = env_value
+                launches.append(launch)
+    return launches
+
+
+def execute(launches: List[Dict[str, Any]]) -> None:
+    """Runs launched programs allowed through $FAKE_KITTY_EXEC, all at once."""
+    import subprocess
+
+    allowed = set(filter(None, os.environ.get("FAKE_KITTY_EXEC", "").split(",")))
+    processes = []
+    for launch in launches:
+        cmd = launch["cmd"]
+        if not cmd or Path(cmd[0]).name not in allowed:
+            continue
+        cwd = launch["cwd"] if launch["cwd"] and Path(launch["cwd"]).is_dir() else None
+        env = {**os.environ, **launch["env"]}
+        processes.append(
+            subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL)
+        )
+    for process in processes:
+        process.wait()
+
+
+def main(binary: str) -> None:
+    argv = sys.argv[1:]
+    started = time.time()
+    time.sleep(latency(binary))
+
+    with open(folder() / "state.lock", "w") as lock:
+        # one invocation at a time, like commands hitting a tmux server
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state_path = folder() / "state.json"
+        state = json.loads(state_path.read_text()) if state_path.exists() else {}
+        launches: List[Dict[str, Any]] = []
+        if binary == "tmux":
+            code = tmux_main(argv, state)
+        else:
+            launches = kitty_main(argv, state)
+            code = 0
+        state_path.write_text(json.dumps(state))
+    log(binary, argv, started=started, code=code)
+
+    # kitty runs its windows' programs once it's done setting up; unlike
+    # the real one, this waits for them so that runs are deterministic
+    execute(launches)
+    sys.exit(code)
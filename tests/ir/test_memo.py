@@ -0,0 +1,97 @@
+import shlex
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from magician.commands.shell import ShellCommand
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.schema import MagicConfigSchema
+from magician.macros.base import BaseMacro
+from magician.macros.mapping import MACRO_MAPPINGS
+from magician.settings import AppConfig
+
+
+class EchoMacro(BaseMacro):
+    created: List[Path] = []
+
+    def __init__(self, plugin, app_cfg, cwd: Path = Path(), **kwargs) -> None:
+        super().__init__(plugin, app_cfg, **kwargs)
+        self.cwd = cwd
+        EchoMacro.created.append(cwd)
+
+    def process(self) -> ShellCommand:
+        return ShellCommand(plugin=self.plugin, cmd=f"echo {self.cwd}")
+
+
+class EchoCwdMacro(EchoMacro):
+    CWD_DEPENDENT = True
+
+
+@pytest.fixture
+def echo_macros(monkeypatch: pytest.MonkeyPatch) -> List[Path]:
+    monkeypatch.setitem(MACRO_MAPPINGS, "echo", EchoMacro)
+    monkeypatch.setitem(MACRO_MAPPINGS, "echo-cwd", EchoCwdMacro)
+    monkeypatch.setattr(EchoMacro, "created", [])
+    return EchoMacro.created
+
+
+def compile_children(app_cfg: AppConfig, run: list, dirs: List[str]) -> str:
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {"root": {"backend": "kitty", "nested": {"backend": "tmux"}}},
+            "project": {
+                "dir": "/srv",
+                "setup": {
+                    "main": {
+                        "nested": True,
+                        "run": run,
+                        "panes": {
+                            f"pane{i}": {"dir": pane_dir, "run": ["make serve"]}
+                            for i, pane_dir in enumerate(dirs)
+                        },
+                    }
+                },
+            },
+        }
+    )
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(config=schema, schema_name="s")
+    return next(path for path in result.scripts if path.stem == "s_main").read_text()
+
+
+def test_parent_run_expanded_once(
+    tmp_app_config: AppConfig,
+    monkeypatch: pytest.MonkeyPatch,
+    echo_macros: List[Path],
+):
+    splits: List[str] = []
+
+    def spy_split(cmd: str) -> List[str]:
+        splits.append(cmd)
+        return real_split(cmd)
+
+    real_split = shlex.split
+    monkeypatch.setattr("magician.commands.shell.shlex.split", spy_split)
+
+    script = compile_children(
+        tmp_app_config,
+        run=["git fetch", {"macro": "echo"}, "make deps"],
+        dirs=["a"] * 40,
+    )
+
+    assert len(echo_macros) == 1
+    assert sorted(splits) == ["echo .", "git fetch", "make deps", "make serve"]
+    # every pane still gets the shared commands
+    assert script.count("git fetch") == 40
+
+
+def test_cwd_dependent_macro_expanded_per_dir(
+    tmp_app_config: AppConfig, echo_macros: List[Path]
+):
+    script = compile_children(
+        tmp_app_config, run=[{"macro": "echo-cwd"}], dirs=["a", "b", "a", "b", "a"]
+    )
+
+    assert echo_macros == [Path("/srv/a"), Path("/srv/b")]
+    assert script.count("echo /srv/a") == 3
+    assert script.count("echo /srv/b") == 2
@@ -0,0 +1,186 @@
+import json
+import os
+from pathlib import Path
+
+import attrs
+import pytest
+
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.parser import parse_config_file
+from magician.ir.ops import Chdir, CreatePane, Env, Exec, lower
+from magician.ir.optimize import (
+    direct_exec,
+    drop_redundant_chdir,
+    inject_env,
+    merge_exec,
+    optimize,
+    passes_for,
+)
+from magician.plugins.tmux import TmuxPlugin
+from magician.settings import AppConfig
+
+GOLDEN_FOLDER = Path(__file__).parent / "golden"
+
+
+def test_ops_are_immutable_values():
+    assert Exec(["ls", "-l"]) == Exec(("ls", "-l"))
+    assert hash(Chdir(Path("/a"))) == hash(Chdir(Path("/a")))
+    assert Chdir(Path("/a")) != Exec(["/a"])
+    with pytest.raises(AttributeError):
+        CreatePane("a").name = "b"  # type: ignore[misc]
+    assert not hasattr(CreatePane("a"), "__dict__")
+
+
+def test_drop_redundant_chdir():
+    ops = [
+        CreatePane("a"),
+        Chdir(Path("/srv")),
+        Env("A", "1"),
+        Chdir(Path("/srv")),
+        Exec(["make"]),
+        Chdir(Path("/srv")),
+        Exec(["cd", "docs"]),
+        Chdir(Path("/srv")),
+        CreatePane("b"),
+        Chdir(Path("/srv")),
+    ]
+
+    assert drop_redundant_chdir(ops) == [
+        CreatePane("a"),
+        Chdir(Path("/srv")),
+        Env("A", "1"),
+        Exec(["make"]),
+        Exec(["cd", "docs"]),
+        Chdir(Path("/srv")),
+        CreatePane("b"),
+        Chdir(Path("/srv")),
+    ]
+
+
+def test_inject_env():
+    ops = [
+        CreatePane("a"),
+        Chdir(Path("/srv")),
+        Env("A", "1"),
+        Env("B", "2"),
+        Exec(["make"]),
+        Env("C", "3"),
+        CreatePane("b"),
+        Env("D", "4"),
+    ]
+
+    assert inject_env(ops) == [
+        CreatePane("a", env=[("A", "1"), ("B", "2")]),
+        Chdir(Path("/srv")),
+        Exec(["make"]),
+        Env("C", "3"),  # commands already ran without it
+        CreatePane("b", env=[("D", "4")]),
+    ]
+
+
+def test_direct_exec():
+    ops = [
+        CreatePane("a", direct=True),
+        Chdir(Path("/srv")),
+        Exec(["make"]),
+        Chdir(Path("web")),
+        Env("A", "1"),
+        Exec(["serve"]),
+        CreatePane("b"),
+        Chdir(Path("/srv")),
+    ]
+
+    assert direct_exec(ops) == [
+        CreatePane(
+            "a",
+            direct=True,
+            cwd=Path("/srv"),
+            run=(Exec(["make"]), Chdir(Path("web")), Env("A", "1"), Exec(["serve"])),
+        ),
+        CreatePane("b"),
+        Chdir(Path("/srv")),
+    ]
+
+
+def test_direct_pane_starts_with_its_commands(tmp_app_config: AppConfig):
+    plugin = TmuxPlugin(app_cfg=tmp_app_config, batch=True)
+    plugin.pre_init(session_name="s")
+    ops = optimize(
+        [
+            CreatePane("a", direct=True, then_shell=True),
+            Chdir(Path("/srv")),
+            Exec(["make", "serve"]),
+        ],
+        passes=[direct_exec],
+    )
+
+    assert lower(ops, plugin=plugin) == [
+        "new-window -t s:0 -k -n a -c /srv "
+        "bash -c 'trap : INT; make serve; exec bash -l'"
+    ]
+
+
+def test_injected_env_keeps_direct_panes(tmp_app_config: AppConfig):
+    plugin = TmuxPlugin(app_cfg=tmp_app_config, batch=True)
+    plugin.pre_init(session_name="s")
+    ops = optimize(
+        [
+            CreatePane("a", direct=True),
+            Env("VIRTUAL_ENV", "/srv/.venv"),
+            Chdir(Path("/srv")),
+            Exec(["python", "-m", "http.server"]),
+        ],
+        passes=passes_for(plugin),
+    )
+
+    assert lower(ops, plugin=plugin) == [
+        "new-window -t s:0 -k -n a -e VIRTUAL_ENV=/srv/.venv -c /srv "
+        "bash -c 'python -m http.server'"
+    ]
+
+
+def test_merge_exec():
+    ops = [Exec(["a"]), Exec(["b"], ["c"]), Env("A", "1"), Exec(["d"])]
+
+    assert merge_exec(ops) == [Exec(["a"], ["b"], ["c"]), Env("A", "1"), Exec(["d"])]
+    assert ops[0] == Exec(["a"])  # input is left untouched
+
+
+def test_merged_exec_is_a_single_send(tmp_app_config: AppConfig):
+    plugin = TmuxPlugin(app_cfg=tmp_app_config, batch=True)
+    plugin.pre_init(session_name="s")
+    ops = optimize(
+        [CreatePane("a"), Exec(["echo", "a b"]), Exec(["ls"])], passes=[merge_exec]
+    )
+
+    assert (
+        lower(ops, plugin=plugin)[-1]
+        == "send-keys -t s:0 'echo '\"'\"'a b'\"'\"'; ls' C-m"
+    )
+
+
+@pytest.mark.parametrize(
+    "schema_path",
+    [
+        Path(__file__).parents[2] / "examples" / "example.yml",
+        GOLDEN_FOLDER / "services.yml",
+    ],
+    ids=lambda path: path.stem,
+)
+def test_golden_op_counts(tmp_app_config: AppConfig, schema_path: Path):
+    """
+    Op counts per compiled script, before and after optimization.
+    Run with MAGICIAN_UPDATE_GOLDEN=1 to regenerate.
+    """
+    schema = schema_path.stem
+    result = ConfigInterpreter(app_cfg=tmp_app_config).compile(
+        config=parse_config_file(file=schema_path), schema_name=schema
+    )
+    op_stats = {
+        script: attrs.asdict(stats) for script, stats in sorted(result.op_stats.items())
+    }
+
+    golden_path = GOLDEN_FOLDER / f"{schema}.json"
+    if os.environ.get("MAGICIAN_UPDATE_GOLDEN"):
+        golden_path.write_text(json.dumps(op_stats, indent=2) + "\n")
+    assert op_stats == json.loads(golden_path.read_text())
@@ -0,0 +1,152 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.schema import MagicConfigSchema
+from magician.macros.python.venv import find_venv, poetry_env_prefix
+from magician.settings import AppConfig
+
+
+def make_venv(path: Path) -> Path:
+    (path / "bin").mkdir(parents=True)
+    (path / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    return path
+
+
+@pytest.mark.parametrize("name", [".venv", "venv"])
+def test_find_in_project_venv(tmp_path: Path, name: str):
+    venv = make_venv(tmp_path / name)
+
+    found = find_venv(tmp_path)
+
+    assert found and found.path == venv
+    assert found.environment(path="/usr/bin") == {
+        "VIRTUAL_ENV": str(venv),
+        "PATH": f"{venv / 'bin'}:/usr/bin",
+    }
+
+
+def test_find_poetry_venv(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pyproject.toml").write_text('[tool.poetry]\nname = "My App"\n')
+    virtualenvs = tmp_path / "virtualenvs"
+    monkeypatch.setenv("POETRY_VIRTUALENVS_PATH", str(virtualenvs))
+    prefix = poetry_env_prefix("My App", project)
+    make_venv(virtualenvs / f"{prefix}-py3.9")
+    newest = make_venv(virtualenvs / f"{prefix}-py3.12")
+
+    found = find_venv(project)
+
+    assert prefix.startswith("my_app-")
+    assert found and found.path == newest
+
+
+def test_no_venv(tmp_path: Path):
+    (tmp_path / ".venv").mkdir()  # not an environment without pyvenv.cfg
+
+    assert find_venv(tmp_path) is None
+
+
+def compile_pane(
+    app_cfg: AppConfig, project_dir: Path, root_backend: str, **options
+) -> str:
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {
+                "root": {"backend": root_backend, "nested": {"backend": "tmux"}}
+            },
+            "project": {
+                "dir": project_dir,
+                "setup": {
+                    "main": {
+                        "nested": True,
+                        "panes": {
+                            "api": {
+                                "run": [
+                                    {
+                                        "macro": "python-activate-venv",
+                                        "options": options,
+                                    },
+                                    "make serve",
+                                ]
+                            }
+                        },
+                    }
+                },
+            },
+        }
+    )
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(config=schema, schema_name="s")
+    return next(path for path in result.scripts if path.stem == "s_main").read_text()
+
+
+def test_venv_injected_into_window(
+    tmp_app_config: AppConfig, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("PATH", "/usr/bin")
+    venv = make_venv(tmp_path / ".venv")
+
+    script = compile_pane(tmp_app_config, tmp_path, root_backend="kitty")
+
+    assert (
+        f"new-window -t s_main:0 -k -n api -e VIRTUAL_ENV={venv} "
+        f"-e PATH={venv}/bin:/usr/bin" in script
+    )
+    assert "source" not in script
+    assert "'make serve'" in script
+
+
+def test_falls_back_to_sourcing(tmp_app_config: AppConfig, tmp_path: Path):
+    script = compile_pane(tmp_app_config, tmp_path, root_backend="kitty")
+    assert "'source .venv/bin/activate; make serve'" in script
+
+    venv = make_venv(tmp_path / "venv")
+    script = compile_pane(tmp_app_config, tmp_path, root_backend="kitty", inject=False)
+    assert f"'source {venv}/bin/activate; make serve'" in script
+    assert "-e VIRTUAL_ENV" not in script
+
+
+@pytest.mark.parametrize("shell", ["bash", "zsh", "fish"])
+def test_fallback_sources_script_of_real_venv(
+    tmp_app_config: AppConfig, tmp_path: Path, shell: str
+):
+    venv = tmp_path / ".venv"
+    subprocess.run(
+        [sys.executable, "-m", "venv", "--without-pip", str(venv)], check=True
+    )
+
+    script = compile_pane(
+        tmp_app_config, tmp_path, root_backend="kitty", inject=False, shell=shell
+    )
+
+    sourced = re.search(r"'source (\S+);", script)
+    assert sourced and Path(sourced.group(1)).is_file()
+    if shell == "fish":
+        assert sourced.group(1) == f"{venv}/bin/activate.fish"
+
+
+def test_kitty_launches_with_env(tmp_app_config: AppConfig, tmp_path: Path):
+    venv = make_venv(tmp_path / ".venv")
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {"root": {"backend": "kitty"}},
+            "project": {
+                "dir": tmp_path,
+                "setup": {
+                    "api": {"run": [{"macro": "python-activate-venv"}, "make serve"]}
+                },
+            },
+        }
+    )
+    result = ConfigInterpreter(app_cfg=tmp_app_config).compile(
+        config=schema, schema_name="s"
+    )
+
+    launch = result.scripts[0].read_text().splitlines()[-1]
+    assert launch.startswith(f"launch --env VIRTUAL_ENV={venv} --env PATH={venv}/bin:")
+    assert launch.endswith(f" --cwd {tmp_path.resolve()} bash -c 'make serve'")
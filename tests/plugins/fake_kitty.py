@@ -0,0 +1,68 @@
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from magician.plugins.kitty_remote import KITTY_CMD_PREFIX, KITTY_CMD_SUFFIX
+
+
+class FakeKittyServer:
+    """
+    Unix socket server speaking kitty's remote control framing. Records every
+    command it receives and answers `launch` with increasing window ids.
+    """
+
+    def __init__(self, path: Path, fail_cmds: Optional[List[str]] = None) -> None:
+        self.path = path
+        self.fail_cmds = fail_cmds or []
+        self.received: List[Dict[str, Any]] = []
+        self.raw: List[bytes] = []
+        self._next_window_id = 1
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    @property
+    def listen_on(self) -> str:
+        return f"unix:{self.path}"
+
+    def start(self) -> "FakeKittyServer":
+        self._sock.bind(str(self.path))
+        self._sock.listen()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._sock.close()
+        self.path.unlink(missing_ok=True)
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with conn:
+                self._handle(conn)
+
+    def _handle(self, conn: socket.socket) -> None:
+        buffer = b""
+        while chunk := conn.recv(4096):
+            buffer += chunk
+            while (end := buffer.find(KITTY_CMD_SUFFIX)) != -1:
+                raw = buffer[: end + len(KITTY_CMD_SUFFIX)]
+                buffer = buffer[end + len(KITTY_CMD_SUFFIX) :]
+                self.raw.append(raw)
+                message = json.loads(raw[len(KITTY_CMD_PREFIX) : end])
+                self.received.append(message)
+                if message.get("no_response"):
+                    continue
+                conn.sendall(self._respond(message))
+
+    def _respond(self, message: Dict[str, Any]) -> bytes:
+        if message["cmd"] in self.fail_cmds:
+            response: Dict[str, Any] = {"ok": False, "error": "simulated failure"}
+        else:
+            response = {"ok": True, "data": self._next_window_id}
+            self._next_window_id += 1
+        return KITTY_CMD_PREFIX + json.dumps(response).encode() + KITTY_CMD_SUFFIX
@@ -0,0 +1,107 @@
+from pathlib import Path
+
+import pytest
+
+from magician.config.interpreter import ConfigInterpreter, InterpreterException
+from magician.config.schema import MagicConfigSchema
+from magician.plugins.kitty_remote import SessionLaunch, parse_launch
+from magician.settings import AppConfig
+
+
+def compile_session(app_cfg: AppConfig, project_dir: Path, **options) -> str:
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {"root": {"backend": {"name": "kitty", "options": options}}},
+            "project": {
+                "dir": project_dir,
+                "setup": {
+                    "api": {"run": ["git pull", "make serve"]},
+                    "shell": {},
+                },
+            },
+        }
+    )
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(config=schema, schema_name="s")
+    return result.scripts[0].read_text()
+
+
+def test_tab_runs_in_one_launch(tmp_app_config: AppConfig, tmp_path: Path):
+    session = compile_session(tmp_app_config, tmp_path)
+
+    assert session.splitlines() == [
+        "new_tab api",
+        f"launch --cwd {tmp_path.resolve()} bash -c 'git pull; make serve'",
+        "new_tab shell",
+        f"cd {tmp_path.resolve()}",
+    ]
+
+
+def test_launch_per_command(tmp_app_config: AppConfig, tmp_path: Path):
+    session = compile_session(tmp_app_config, tmp_path, launch_per_command=True)
+
+    assert session.splitlines()[:4] == [
+        "new_tab api",
+        f"cd {tmp_path.resolve()}",
+        "launch git pull",
+        "launch make serve",
+    ]
+
+
+def test_launch_per_command_skips_gates(tmp_app_config: AppConfig, tmp_path: Path):
+    app_cfg = tmp_app_config.model_copy(update={"max_concurrent_starts": 1})
+    session = compile_session(app_cfg, tmp_path, launch_per_command=True)
+
+    # a gate launched on its own would hold nothing back
+    assert "magician.schedule" not in session
+    assert "launch git pull" in session.splitlines()
+
+
+def test_launch_per_command_rejects_dependencies(
+    tmp_app_config: AppConfig, tmp_path: Path
+):
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {
+                "root": {
+                    "backend": "kitty",
+                    "nested": {
+                        "backend": {
+                            "name": "kitty",
+                            "options": {"launch_per_command": True},
+                        }
+                    },
+                }
+            },
+            "project": {
+                "dir": tmp_path,
+                "setup": {
+                    "services": {
+                        "nested": True,
+                        "panes": {
+                            "db": {"run": ["make db"], "ready": {"tcp": 5432}},
+                            "api": {"run": ["make api"], "depends-on": ["db"]},
+                        },
+                    },
+                },
+            },
+        }
+    )
+
+    with pytest.raises(InterpreterException, match="'api' has 'depends-on'"):
+        ConfigInterpreter(app_cfg=tmp_app_config).compile(
+            config=schema, schema_name="s"
+        )
+
+
+@pytest.mark.parametrize(
+    ("rest", "expected"),
+    [
+        ("nvim .", SessionLaunch(args=["nvim", "."])),
+        (
+            "launch --env A=1 --cwd=/srv bash -c 'make serve'",
+            SessionLaunch(args=["bash", "-c", "make serve"], cwd="/srv", env=["A=1"]),
+        ),
+    ],
+)
+def test_parse_launch(rest: str, expected: SessionLaunch):
+    assert parse_launch(rest.removeprefix("launch ")) == expected
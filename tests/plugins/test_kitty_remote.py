@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from magician.plugins import kitty
+from magician.plugins.kitty import KittyPlugin
+from magician.plugins.kitty_remote import (
+    KITTY_CMD_PREFIX,
+    KITTY_CMD_SUFFIX,
+    KittyConnections,
+    KittyRemoteClient,
+    KittyRemoteError,
+)
+from magician.settings import AppConfig
+
+from tests.plugins.fake_kitty import FakeKittyServer
+
+
+@pytest.fixture
+def fake_kitty(tmp_path: Path) -> Iterator[FakeKittyServer]:
+    server = FakeKittyServer(path=tmp_path / "kitty.sock").start()
+    yield server
+    server.stop()
+
+
+def write_session(plugin: KittyPlugin, name: str) -> None:
+    plugin.write_script(
+        name=name,
+        contents=[
+            *plugin.create_pane(name="code"),
+            *plugin.goto_dir(path=Path("/tmp")),
+            *plugin.run_cmd(command=["nvim", "."]),
+            *plugin.run_cmd(command=["echo", "'two words'"]),
+            *plugin.create_pane(name="shell"),
+        ],
+    )
+
+
+def test_message_framing(fake_kitty: FakeKittyServer):
+    with KittyRemoteClient(listen_on=fake_kitty.listen_on) as client:
+        assert client.launch(args=["htop"], launch_type="tab") == 1
+
+    (raw,) = fake_kitty.raw
+    assert raw.startswith(KITTY_CMD_PREFIX) and raw.endswith(KITTY_CMD_SUFFIX)
+    (message,) = fake_kitty.received
+    assert message["cmd"] == "launch"
+    assert message["no_response"] is False
+    assert message["payload"] == {"args": ["htop"], "type": "tab"}
+
+
+def test_error_response(tmp_path: Path):
+    server = FakeKittyServer(path=tmp_path / "k.sock", fail_cmds=["launch"]).start()
+    try:
+        with KittyRemoteClient(listen_on=server.listen_on) as client:
+            with pytest.raises(KittyRemoteError):
+                client.launch(args=[])
+    finally:
+        server.stop()
+
+
+def test_connections_kept_open(tmp_path: Path):
+    server = FakeKittyServer(path=tmp_path / "k.sock", fail_cmds=["close-tab"]).start()
+    connections = KittyConnections()
+    connections.keep_open = True
+    try:
+        with connections.client(server.listen_on) as first:
+            first.launch(args=["htop"])
+        with connections.client(server.listen_on) as second:
+            second.launch(args=["top"])
+        assert second is first
+
+        # a failed command might leave replies behind, the next use reconnects
+        with pytest.raises(KittyRemoteError):
+            with connections.client(server.listen_on) as client:
+                client.send("close-tab", {})
+        assert not first.alive()
+    finally:
+        connections.close()
+        server.stop()
+
+
+def test_run_script_in_running_kitty(
+    app_config: AppConfig, fake_kitty: FakeKittyServer, monkeypatch
+):
+    monkeypatch.setattr(
+        kitty, "open_app", lambda *_: pytest.fail("must not spawn kitty")
+    )
+    plugin = KittyPlugin(
+        app_cfg=app_config, remote=True, listen_on=fake_kitty.listen_on
+    )
+    write_session(plugin, name="test_remote")
+
+    plugin.run_script(name="test_remote")
+
+    payloads = [message["payload"] for message in fake_kitty.received]
+    assert payloads == [
+        {"args": ["nvim", "."], "type": "tab", "cwd": "/tmp", "tab_title": "code"},
+        {
+            "args": ["echo", "two words"],
+            "type": "window",
+            "cwd": "/tmp",
+            "match": "window_id:1",
+        },
+        {"args": [], "type": "tab", "tab_title": "shell"},
+    ]
+    plugin.remove_script(name="test_remote")
+
+
+def test_falls_back_to_session_file(app_config: AppConfig, tmp_path: Path, monkeypatch):
+    spawned = []
+    monkeypatch.setattr(kitty, "open_app", spawned.append)
+    plugin = KittyPlugin(
+        app_cfg=app_config, remote=True, listen_on=f"unix:{tmp_path / 'missing.sock'}"
+    )
+    write_session(plugin, name="test_fallback")
+
+    plugin.run_script(name="test_fallback")
+
+    assert spawned == [plugin.get_script_cmd(script_name="test_fallback")]
+    plugin.remove_script(name="test_fallback")
@@ -8,6 +8,8 @@ from magician.settings import AppConfig
 
 import pytest
 
+pytestmark = pytest.mark.usefixtures("fake_terminals")
+
 
 def base_plugin_asserts(
     plugin: BasePlugin,
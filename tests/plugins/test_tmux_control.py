@@ -0,0 +1,95 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from magician.plugins.tmux_control import (
+    TmuxControlClient,
+    TmuxControlError,
+    TmuxControlPlugin,
+    build_session,
+)
+from magician.settings import AppConfig
+
+pytestmark = pytest.mark.skipif(shutil.which("tmux") is None, reason="needs tmux")
+
+
+@pytest.fixture
+def socket_name(monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    monkeypatch.setenv("SHELL", "/bin/sh")
+    name = f"magician-test-{os.getpid()}"
+    yield name
+    subprocess.run(["tmux", "-L", name, "kill-server"], capture_output=True)
+
+
+def list_windows(socket_name: str, session_name: str) -> list[str]:
+    result = subprocess.run(
+        ["tmux", "-L", socket_name, "list-windows", "-t", session_name]
+        + ["-F", "#{window_index} #{window_name}"],
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.splitlines()
+
+
+def test_client_replies_and_errors(socket_name: str):
+    client = TmuxControlClient(socket_name=socket_name)
+    client.open("control")
+    with client:
+        assert client.command("display-message -p '#{session_name}'") == ["control"]
+
+        with pytest.raises(TmuxControlError) as e:
+            client.run(["new-window -t control:1 -n ok", "not-a-command"])
+        assert e.value.command == "not-a-command"
+
+        # connection is still usable after a failed command
+        assert client.command("display-message -p ok") == ["ok"]
+
+    assert list_windows(socket_name, "control") == ["0 sh", "1 ok"]
+
+
+def test_plugin_builds_session(app_config: AppConfig, socket_name: str):
+    plugin = TmuxControlPlugin(app_cfg=app_config, socket_name=socket_name)
+    contents = [
+        *plugin.pre_init(session_name="plugin"),
+        *plugin.create_pane(name="first"),
+        *plugin.goto_dir(path=Path.home()),
+        *plugin.run_cmd(command=["echo", "it's quoted; $HOME"]),
+        *plugin.create_pane(name="second"),
+        *plugin.post_init(),
+    ]
+    plugin.write_script(name="test_control", contents=contents)
+
+    script_cmd = plugin.get_script_cmd(script_name="test_control")
+    assert "bash" not in script_cmd
+
+    attach_cmd = build_session(
+        script_path=plugin.get_script_path(script_name="test_control")
+    )
+    assert attach_cmd[-2:] == ["-t", "plugin"]
+    assert list_windows(socket_name, "plugin") == ["0 first", "1 second"]
+
+    # existing sessions are left alone
+    build_session(script_path=plugin.get_script_path(script_name="test_control"))
+    assert list_windows(socket_name, "plugin") == ["0 first", "1 second"]
+
+    plugin.remove_script(name="test_control")
+
+
+def test_plugin_surfaces_failures(app_config: AppConfig, socket_name: str):
+    plugin = TmuxControlPlugin(app_cfg=app_config, socket_name=socket_name)
+    contents = [
+        *plugin.pre_init(session_name="failing"),
+        *plugin.create_pane(name="first"),
+        "send-keys -t failing:7 oops C-m",
+    ]
+    plugin.write_script(name="test_control_fail", contents=contents)
+
+    with pytest.raises(TmuxControlError):
+        build_session(
+            script_path=plugin.get_script_path(script_name="test_control_fail")
+        )
+    plugin.remove_script(name="test_control_fail")
@@ -0,0 +1,211 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+
+from magician.plugins.tmux_control import TmuxControlPlugin, build_session
+from magician.plugins.tmux_reconcile import (
+    ActionKind,
+    LiveWindow,
+    SessionLayout,
+    WindowSpec,
+    plan,
+    reconcile,
+)
+from magician.settings import AppConfig
+
+requires_tmux = pytest.mark.skipif(shutil.which("tmux") is None, reason="needs tmux")
+
+
+def test_plan():
+    desired = [
+        WindowSpec(index=0, name="editor", sends=["nvim ."]),
+        WindowSpec(index=1, name="server", sends=["make serve"]),
+        WindowSpec(index=2, name="logs", sends=["tail -f log"]),
+        WindowSpec(index=3, name="new", sends=["htop"]),
+    ]
+    live = [
+        LiveWindow(index=0, name="editor", digest=desired[0].digest),
+        LiveWindow(index=1, name="srv", digest=desired[1].digest),
+        LiveWindow(index=2, name="logs", digest="outdated"),
+        LiveWindow(index=4, name="stale", digest="whatever"),
+        LiveWindow(index=5, name="staler", digest="whatever"),
+    ]
+
+    actions = plan(desired, live)
+
+    assert [(action.kind, action.index) for action in actions] == [
+        (ActionKind.KEEP, 0),
+        (ActionKind.RENAME, 1),
+        (ActionKind.REPLACE, 2),
+        (ActionKind.CREATE, 3),
+        (ActionKind.KILL, 5),
+        (ActionKind.KILL, 4),
+    ]
+    assert str(actions[1]) == "~ rename  1 srv -> server"
+
+
+def test_plan_keeps_windows_after_inserted_or_removed_ones():
+    a, new, b, c = (
+        WindowSpec(index=0, name=name, sends=[f"echo {name}"])
+        for name in ("a", "new", "b", "c")
+    )
+    live = [
+        LiveWindow(index=index, name=window.name or "", digest=window.digest)
+        for index, window in enumerate((a, b, c))
+    ]
+
+    new.index, b.index, c.index = 1, 2, 3
+    inserted = plan([a, new, b, c], live)
+    b.index, c.index = 0, 1
+    removed = plan([b, c], live)
+
+    assert [str(action) for action in inserted] == [
+        "= keep    0 a",
+        "+ create  1 new",
+        "= keep    2 b (from 1)",
+        "= keep    3 c (from 2)",
+    ]
+    assert [str(action) for action in removed] == [
+        "= keep    0 b (from 1)",
+        "= keep    1 c (from 2)",
+        "- kill    0 a",
+    ]
+
+
+def test_digest_ignores_name():
+    assert (
+        WindowSpec(index=0, name="a", sends=["ls"]).digest
+        == WindowSpec(index=0, name="b", sends=["ls"]).digest
+    )
+    assert WindowSpec(index=0, sends=["ls"]).digest != WindowSpec(index=0).digest
+
+
+@pytest.fixture
+def socket_name(monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    monkeypatch.setenv("SHELL", "/bin/sh")
+    name = f"magician-reconcile-{os.getpid()}"
+    yield name
+    subprocess.run(["tmux", "-L", name, "kill-server"], capture_output=True)
+
+
+def compile_session(
+    plugin: TmuxControlPlugin, windows: Dict[str, List[str]]
+) -> SessionLayout:
+    contents = [*plugin.pre_init(session_name="work.api")]
+    for name, commands in windows.items():
+        contents.extend(plugin.create_pane(name=name))
+        for command in commands:
+            contents.extend(plugin.run_cmd(command=command.split()))
+    contents.extend(plugin.post_init())
+    plugin.write_script(name="reconcile", contents=contents)
+    return SessionLayout.read(plugin.get_layout_path(script_name="reconcile"))
+
+
+def window_ids(socket_name: str) -> Dict[str, str]:
+    result = subprocess.run(
+        ["tmux", "-L", socket_name, "list-windows", "-t", "work_api"]
+        + ["-F", "#{window_name} #{window_id}"],
+        capture_output=True,
+        text=True,
+    )
+    return dict(line.split() for line in result.stdout.splitlines())
+
+
+@requires_tmux
+def test_reconcile_live_session(tmp_app_config: AppConfig, socket_name: str):
+    plugin = TmuxControlPlugin(app_cfg=tmp_app_config, socket_name=socket_name)
+    layout = compile_session(
+        plugin,
+        {"editor": ["echo editor"], "server": ["echo server"], "old": ["echo old"]},
+    )
+    assert layout.session_name == "work_api"
+    assert reconcile(layout) is None  # not running yet
+
+    build_session(script_path=plugin.get_script_path(script_name="reconcile"))
+    before = window_ids(socket_name)
+    # the freshly built session matches its layout
+    assert {action.kind for action in reconcile(layout, dry_run=True)} == {
+        ActionKind.KEEP
+    }
+
+    layout = compile_session(
+        plugin,
+        {"editor": ["echo editor"], "web": ["echo server"], "new": ["echo new"]},
+    )
+    actions = reconcile(layout, dry_run=True)
+    assert [action.kind for action in actions] == [
+        ActionKind.KEEP,
+        ActionKind.RENAME,
+        ActionKind.REPLACE,
+    ]
+    assert window_ids(socket_name) == before  # planning changes nothing
+
+    reconcile(layout)
+    after = window_ids(socket_name)
+    assert list(after) == ["editor", "web", "new"]
+    # unchanged and renamed windows kept running
+    assert after["editor"] == before["editor"]
+    assert after["web"] == before["server"]
+    assert after["new"] != before["old"]
+    assert {action.kind for action in reconcile(layout, dry_run=True)} == {
+        ActionKind.KEEP
+    }
+
+
+@requires_tmux
+def test_reconcile_kills_removed_windows(tmp_app_config: AppConfig, socket_name: str):
+    plugin = TmuxControlPlugin(app_cfg=tmp_app_config, socket_name=socket_name)
+    compile_session(plugin, {"a": ["echo a"], "b": ["echo b"], "c": ["echo c"]})
+    build_session(script_path=plugin.get_script_path(script_name="reconcile"))
+
+    layout = compile_session(plugin, {"a": ["echo a"]})
+    reconcile(layout)
+
+    assert list(window_ids(socket_name)) == ["a"]
+
+
+@requires_tmux
+def test_reconcile_moves_kept_windows(tmp_app_config: AppConfig, socket_name: str):
+    plugin = TmuxControlPlugin(app_cfg=tmp_app_config, socket_name=socket_name)
+    compile_session(plugin, {"a": ["echo a"], "b": ["echo b"], "c": ["echo c"]})
+    build_session(script_path=plugin.get_script_path(script_name="reconcile"))
+    before = window_ids(socket_name)
+
+    layout = compile_session(
+        plugin, {"a": ["echo a"], "new": ["echo new"], "b": ["echo b"], "c": ["echo c"]}
+    )
+    assert [action.kind for action in reconcile(layout)] == [
+        ActionKind.KEEP,
+        ActionKind.CREATE,
+        ActionKind.KEEP,
+        ActionKind.KEEP,
+    ]
+    inserted = window_ids(socket_name)
+
+    layout = compile_session(plugin, {"new": ["echo new"], "c": ["echo c"]})
+    assert [action.kind for action in reconcile(layout)] == [
+        ActionKind.KEEP,
+        ActionKind.KEEP,
+        ActionKind.KILL,
+        ActionKind.KILL,
+    ]
+    removed = window_ids(socket_name)
+
+    assert list(inserted) == ["a", "new", "b", "c"]
+    assert {name: inserted[name] for name in before} == before
+    assert list(removed) == ["new", "c"]
+    assert removed == {"new": inserted["new"], "c": before["c"]}
+    assert {action.kind for action in reconcile(layout, dry_run=True)} == {
+        ActionKind.KEEP
+    }
+
+
+def test_deterministic_session_names(tmp_app_config: AppConfig, tmp_path: Path):
+    plugin = TmuxControlPlugin(app_cfg=tmp_app_config)
+    first = compile_session(plugin, {"a": ["echo a"]})
+    second = compile_session(plugin, {"a": ["echo a"]})
+    assert first.session_name == second.session_name == "work_api"
@@ -0,0 +1,100 @@
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.daemon.client import SOCKET_ENV, request
+from magician.daemon.server import Daemon, DaemonError, bind, serve
+from magician.settings import AppConfig
+
+from tests.fakes import FakeTerminals
+
+SCHEMA = """
+wizard:
+  root:
+    backend: kitty
+
+project:
+  dir: {dir}
+  setup:
+    {pane}:
+      run:
+        - echo serving
+"""
+
+
+@pytest.fixture
+def daemon(
+    tmp_app_config: AppConfig, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Path]:
+    """Daemon serving the temporary app config from a thread."""
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    path = tmp_path / "magic.sock"
+    monkeypatch.setenv(SOCKET_ENV, str(path))
+    thread = threading.Thread(target=serve, args=(path,), daemon=True)
+    thread.start()
+    while request({"command": "ping"}, path=path) is None:
+        thread.join(0.01)
+    yield path
+    request({"command": "stop"}, path=path)
+    thread.join(5)
+
+
+@pytest.fixture
+def in_process_runs(monkeypatch: pytest.MonkeyPatch) -> None:
+    def run(*_, **__):
+        raise AssertionError("ran in process")
+
+    monkeypatch.setattr("magician.runner.SchemaRunner.run", run)
+
+
+def write_schema(app_cfg: AppConfig, tmp_path: Path, pane: str) -> None:
+    (app_cfg.schemas_folder / "work.yml").write_text(
+        SCHEMA.format(dir=tmp_path, pane=pane)
+    )
+
+
+def test_run_through_daemon(
+    daemon: Path,
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    fake_terminals: FakeTerminals,
+    in_process_runs: None,
+):
+    write_schema(tmp_app_config, tmp_path, pane="api")
+    runner = CliRunner()
+
+    assert runner.invoke(cli, ["run", "work"]).exit_code == 0
+    write_schema(tmp_app_config, tmp_path, pane="worker-api")
+    result = runner.invoke(cli, ["run", "work"])
+
+    assert result.exit_code == 0, result.output
+    # the edited schema got picked up
+    assert fake_terminals.tabs() == ["api", "worker-api"]
+
+
+def test_daemon_leaves_errors_to_client(daemon: Path):
+    result = CliRunner().invoke(cli, ["run", "missing"])
+
+    assert result.exit_code != 0
+    assert "No schema named 'missing'" in result.output
+
+
+def test_one_daemon_per_socket(daemon: Path):
+    with pytest.raises(DaemonError):
+        bind(daemon, Daemon())
+
+
+def test_socket_is_private(tmp_path: Path):
+    umask = os.umask(0o022)
+    try:
+        with bind(tmp_path / "magic.sock", Daemon()):
+            assert stat.S_IMODE((tmp_path / "magic.sock").stat().st_mode) == 0o600
+        assert os.umask(umask) == 0o022
+    finally:
+        os.umask(umask)
@@ -0,0 +1,148 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.settings import AppConfig
+from magician.telemetry import telemetry_log_path
+
+from tests.fakes import FakeTerminals
+
+SCHEMA = """
+wizard:
+  root:
+    backend: {backend}
+project:
+  dir: {dir}
+  setup:
+    api:
+      run:
+        - make serve
+    shell: {{}}
+"""
+
+
+@pytest.fixture
+def fake_magic(
+    tmp_app_config: AppConfig, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    """`magic` executable recording its arguments, for launchers to fall back to."""
+    path = tmp_path / "magic"
+    path.write_text(f'#!/bin/sh\necho "$@" > {tmp_path / "magic.args"}\n')
+    path.chmod(0o755)
+    monkeypatch.setattr("magician.launcher.shutil.which", lambda _: str(path))
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+    return tmp_path / "magic.args"
+
+
+def export(tmp_app_config: AppConfig, tmp_path: Path, backend: str) -> Path:
+    schema_path = tmp_app_config.schemas_folder / "work.yml"
+    schema_path.write_text(SCHEMA.format(backend=backend, dir=tmp_path))
+    launcher = tmp_path / "bin" / "magic-work"
+
+    result = CliRunner().invoke(cli, ["export", "work", "--output", str(launcher)])
+
+    assert result.exit_code == 0, result.output
+    return launcher
+
+
+def test_launcher_execs_compiled_session(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    fake_terminals: FakeTerminals,
+    fake_magic: Path,
+):
+    launcher = export(tmp_app_config, tmp_path, backend="kitty")
+
+    subprocess.run([launcher], env=os.environ, check=True)
+
+    assert fake_terminals.tabs() == ["api", "shell"]
+    assert not fake_magic.exists()
+    assert sys.executable not in launcher.read_text()
+    assert "-m magician" not in launcher.read_text()
+
+
+def test_launcher_records_run_with_subsecond_precision(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    fake_terminals: FakeTerminals,
+    fake_magic: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    app_cfg = tmp_app_config.model_copy(update={"telemetry": True})
+    monkeypatch.setattr("magician.settings.get_config", lambda: app_cfg)
+    launcher = export(app_cfg, tmp_path, backend="kitty")
+
+    # /bin/sh has no EPOCHREALTIME
+    subprocess.run(["/bin/sh", launcher], env=os.environ, check=True)
+
+    started, event = telemetry_log_path(app_cfg, "work").read_text().split("\t")[:2]
+    assert event == "run"
+    assert re.fullmatch(r"\d+\.\d{6,}", started)
+
+
+def test_stale_launcher_falls_back_to_magic_run(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    fake_terminals: FakeTerminals,
+    fake_magic: Path,
+):
+    launcher = export(tmp_app_config, tmp_path, backend="kitty")
+    schema_path = tmp_app_config.schemas_folder / "work.yml"
+    schema_path.write_text(schema_path.read_text() + "\n# edited\n")
+
+    subprocess.run([launcher], env=os.environ, check=True)
+
+    assert fake_magic.read_text() == "run work\n"
+    assert fake_terminals.tabs() == []
+
+
+def test_launcher_checks_what_scripts_depend_on(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    fake_terminals: FakeTerminals,
+    fake_magic: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+    monkeypatch.chdir(tmp_path / "a")
+    schema_path = tmp_app_config.schemas_folder / "work.yml"
+    schema_path.write_text(SCHEMA.format(backend="kitty", dir="project"))
+    launcher = tmp_path / "magic-work"
+    result = CliRunner().invoke(cli, ["export", "work", "--output", str(launcher)])
+    assert result.exit_code == 0, result.output
+
+    subprocess.run([launcher], cwd=tmp_path / "a", env=os.environ, check=True)
+    assert fake_terminals.tabs() == ["api", "shell"]
+    assert not fake_magic.exists()
+
+    # relative dirs got resolved against the directory exported from
+    subprocess.run([launcher], cwd=tmp_path / "b", env=os.environ, check=True)
+    assert fake_magic.read_text() == "run work\n"
+    fake_magic.unlink()
+
+    # scripts recompiled since (here by hand) are no longer the exported ones
+    script = next((tmp_app_config.data_folder / "scripts" / "work").rglob("*.conf"))
+    script.write_text(script.read_text() + "\n")
+    subprocess.run([launcher], cwd=tmp_path / "a", env=os.environ, check=True)
+    assert fake_magic.read_text() == "run work\n"
+    assert fake_terminals.tabs() == ["api", "shell"]
+
+
+def test_backends_needing_python_are_refused(
+    tmp_app_config: AppConfig, tmp_path: Path, fake_magic: Path
+):
+    schema_path = tmp_app_config.schemas_folder / "work.yml"
+    schema_path.write_text(SCHEMA.format(backend="tmux-control", dir=tmp_path))
+
+    result = CliRunner().invoke(cli, ["export", "work", "-o", str(tmp_path / "l")])
+
+    assert result.exit_code != 0
+    assert "can't be launched without magician" in result.output
+    assert not (tmp_path / "l").exists()
@@ -0,0 +1,257 @@
+import re
+import shlex
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from magician.config.interpreter import ConfigInterpreter, InterpreterException
+from magician.config.parser import validate_config
+from magician.readiness import (
+    FileProbe,
+    LogProbe,
+    ReadinessLog,
+    TcpProbe,
+    check_dependencies,
+    main,
+    read_log_offsets,
+    wait_for,
+    write_log_offsets,
+)
+from magician.settings import AppConfig
+
+
+@pytest.fixture
+def listener():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    yield server
+    server.close()
+
+
+def test_tcp_probe(listener: socket.socket):
+    probe = TcpProbe.parse(f"127.0.0.1:{listener.getsockname()[1]}")
+    assert not probe.check()
+
+    listener.listen()
+    assert probe.check()
+
+
+def test_tcp_probe_defaults_to_localhost():
+    assert TcpProbe.parse("5432") == TcpProbe(host="127.0.0.1", port=5432)
+
+
+def test_file_probe(tmp_path: Path):
+    probe = FileProbe(path=tmp_path / "ready")
+    assert not probe.check()
+
+    (tmp_path / "ready").touch()
+    assert probe.check()
+
+
+def test_log_probe_only_matches_new_lines(tmp_path: Path):
+    log = tmp_path / "server.log"
+    log.write_text("listening on :8000\n")
+    probe = LogProbe(path=log, pattern=re.compile(r"listening on"))
+    assert not probe.check()  # existing contents are skipped
+
+    with open(log, "a") as file:
+        file.write("starting\nlistening")
+    assert not probe.check()  # partial line
+    with open(log, "a") as file:
+        file.write(" on :8001\n")
+    assert probe.check()
+
+
+def test_log_probe_rereads_truncated_log(tmp_path: Path):
+    log = tmp_path / "server.log"
+    log.write_text("old line that is rather long\n")
+    probe = LogProbe(path=log, pattern=re.compile(r"^ready$"))
+    probe.check()
+
+    log.write_text("ready\n")
+    assert probe.check()
+
+
+def test_log_probe_matches_lines_past_recorded_offset(tmp_path: Path):
+    log = tmp_path / "server.log"
+    log.write_text("listening on :8000\n")
+    offsets = tmp_path / "deps.offsets"
+    write_log_offsets(offsets, [log, tmp_path / "missing.log"])
+    assert read_log_offsets(offsets) == {
+        log: len("listening on :8000\n"),
+        tmp_path / "missing.log": 0,
+    }
+
+    # written after the run started, but before the probe was created
+    with open(log, "a") as file:
+        file.write("listening on :8001\n")
+    probe = LogProbe(
+        path=log, pattern=re.compile(r":8001"), offset=read_log_offsets(offsets)[log]
+    )
+    assert probe.check()
+
+    probe = LogProbe(path=log, pattern=re.compile(r":8000"), offset=0)
+    assert probe.check()
+
+
+def test_wait_for_reports_ready_times(tmp_path: Path):
+    ready = []
+    pending = wait_for(
+        {"a": FileProbe(path=tmp_path), "b": FileProbe(path=tmp_path / "never")},
+        timeout=0.2,
+        interval=0.01,
+        on_ready=lambda name, elapsed: ready.append(name),
+    )
+
+    assert ready == ["a"]
+    assert pending == ["b"]
+
+
+def test_wait_command(tmp_path: Path, listener: socket.socket):
+    port = listener.getsockname()[1]
+    readiness_log = tmp_path / "readiness.jsonl"
+    started = time.monotonic()
+    threading.Timer(0.1, listener.listen).start()
+
+    code = main(
+        [
+            "wait",
+            "--pane",
+            "api",
+            "--interval",
+            "0.01",
+            "--readiness-log",
+            str(readiness_log),
+            "--tcp",
+            f"db=127.0.0.1:{port}",
+        ]
+    )
+
+    assert code == 0
+    assert time.monotonic() - started >= 0.1
+    events = ReadinessLog(readiness_log).read()
+    assert [event["event"] for event in events] == ["dependency_ready", "started"]
+    assert events[0]["dependency"] == "db"
+    # measured from when the wait started, which the timer didn't wait for
+    assert 0 < events[0]["elapsed"] <= time.monotonic() - started
+
+
+def test_wait_command_timeout(tmp_path: Path):
+    readiness_log = tmp_path / "readiness.jsonl"
+    code = main(
+        [
+            "wait",
+            "--pane",
+            "api",
+            "--timeout",
+            "0.05",
+            "--readiness-log",
+            str(readiness_log),
+            "--log",
+            f"db={tmp_path / 'db.log'}",
+            "--pattern",
+            "db=ready",
+        ]
+    )
+
+    assert code == 1
+    assert ReadinessLog(readiness_log).read()[-1]["pending"] == ["db"]
+
+
+def test_wait_sees_lines_logged_before_it_started(
+    tmp_app_config: AppConfig, tmp_path: Path
+):
+    interpreter = ConfigInterpreter(app_cfg=tmp_app_config)
+    log = tmp_path / "worker" / "app.log"
+    log.parent.mkdir()
+    log.write_text("started (previous run)\n")
+    panes = {
+        "worker": {"run": ["worker"], "ready": {"log": str(log), "pattern": "started"}},
+        "api": {"depends-on": ["worker"], "run": ["serve"]},
+    }
+    script = compile_panes(tmp_app_config, panes)
+    (api_wait,) = [line for line in script.splitlines() if "readiness" in line]
+    argv = shlex.split(api_wait[api_wait.index("wait --pane") : api_wait.index(";")])
+
+    assert "--offsets" in argv
+    interpreter.record_run("deps")
+    assert main([*argv, "--timeout", "0.05"]) == 1  # old lines don't count
+
+    interpreter.record_run("deps")
+    with open(log, "a") as file:
+        file.write("started\n")
+    # the worker got ready before the api pane's wait even started
+    assert main([*argv, "--timeout", "0.05"]) == 0
+
+
+def test_check_dependencies():
+    assert check_dependencies({"api": ["db"], "db": [], "web": ["api"]}) == [
+        "db",
+        "api",
+        "web",
+    ]
+    with pytest.raises(ValueError, match="unknown pane 'cache'"):
+        check_dependencies({"api": ["cache"]})
+    with pytest.raises(ValueError, match="api -> web -> api"):
+        check_dependencies({"api": ["web"], "web": ["api"]})
+
+
+def schema(panes: dict) -> dict:
+    return {
+        "wizard": {"root": {"backend": "kitty", "nested": {"backend": "tmux"}}},
+        "project": {
+            "dir": "/srv/project",
+            "setup": {"services": {"nested": True, "panes": panes}},
+        },
+    }
+
+
+def compile_panes(app_cfg: AppConfig, panes: dict) -> str:
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(
+        config=validate_config(schema(panes)), schema_name="deps"
+    )
+    tmux_script = next(path for path in result.scripts if path.suffix == ".sh")
+    return tmux_script.read_text()
+
+
+def test_compiles_wait_for_dependencies(tmp_app_config: AppConfig):
+    script = compile_panes(
+        tmp_app_config,
+        {
+            "db": {"run": ["postgres"], "ready": {"tcp": 5432}},
+            "worker": {
+                "dir": "worker",
+                "run": ["tail -f app.log"],
+                "ready": {"log": "app.log", "pattern": "started"},
+            },
+            "api": {"depends-on": ["db", "worker"], "run": ["serve"]},
+            "docs": {"run": ["mkdocs serve"]},
+        },
+    )
+
+    (api_wait,) = [line for line in script.splitlines() if "readiness" in line]
+    assert "--pane api" in api_wait
+    assert "--tcp db=127.0.0.1:5432" in api_wait
+    assert "--log worker=/srv/project/worker/app.log" in api_wait
+    assert str(tmp_app_config.data_folder / "readiness" / "deps.jsonl") in api_wait
+    # the wait runs ahead of the pane's own commands
+    assert script.index(api_wait) < script.index("serve")
+
+
+def test_dependencies_without_probe_need_no_wait(tmp_app_config: AppConfig):
+    script = compile_panes(
+        tmp_app_config,
+        {"db": {"run": ["postgres"]}, "api": {"depends-on": ["db"]}},
+    )
+    assert "readiness" not in script
+
+
+def test_rejects_dependency_cycles(tmp_app_config: AppConfig):
+    with pytest.raises(InterpreterException, match="cycle"):
+        compile_panes(
+            tmp_app_config,
+            {"a": {"depends-on": ["b"]}, "b": {"depends-on": ["a"]}},
+        )
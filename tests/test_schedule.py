@@ -0,0 +1,151 @@
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import pytest
+
+from magician.config.interpreter import ConfigInterpreter
+from magician.config.schema import MagicConfigSchema
+from magician.schedule import (
+    CpuMonitor,
+    Schedule,
+    main,
+    read_pressure,
+    reset_schedule,
+    start_positions,
+    wave_size,
+)
+from magician.settings import AppConfig
+
+
+class FixedMonitor(CpuMonitor):
+    def __init__(self, busy: float) -> None:
+        self._busy = busy
+
+    def sample(self) -> Optional[List[float]]:
+        return None
+
+    def busy(self, since: Optional[Sequence[float]] = None) -> float:
+        return self._busy
+
+
+def test_start_positions():
+    positions, stage_ends = start_positions({"a": 1, "b": 0, "c": 1, "d": 0})
+
+    assert positions == {"b": 0, "d": 1, "a": 2, "c": 3}
+    assert stage_ends == [2, 4]
+
+
+@pytest.mark.parametrize(("busy", "expected"), [(0.0, 4), (0.5, 2), (0.8, 1), (0.9, 0)])
+def test_wave_size(busy: float, expected: int):
+    assert wave_size(4, busy) == expected
+
+
+def test_read_pressure(tmp_path: Path):
+    path = tmp_path / "cpu"
+    path.write_text(
+        "some avg10=12.50 avg60=2.82 avg300=3.29 total=118635986\n"
+        "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n"
+    )
+
+    assert read_pressure(path) == (12.5, 118635986)
+    assert read_pressure(tmp_path / "missing") is None
+
+
+def test_monitor_measures_pressure_between_samples(tmp_path: Path):
+    path = tmp_path / "cpu"
+    now = [0.0]
+    monitor = CpuMonitor(pressure_path=path, clock=lambda: now[0])
+
+    path.write_text("some avg10=80.00 avg60=0 avg300=0 total=1000000\n")
+    assert monitor.busy() == 0.8  # nothing to compare with
+    since = monitor.sample()
+    now[0] = 2.0
+    path.write_text("some avg10=80.00 avg60=0 avg300=0 total=1500000\n")
+    assert monitor.busy(since=since) == 0.25
+
+
+def released(schedule: Schedule, positions: int) -> List[int]:
+    return [position for position in range(positions) if schedule.try_release(position)]
+
+
+def test_waves_stop_at_stage_ends(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    state = tmp_path / "s.json"
+    reset_schedule(state)
+    now = [1000.0]
+    monkeypatch.setattr("magician.schedule.time.time", lambda: now[0])
+    schedule = Schedule(
+        path=state,
+        stage_ends=[3, 7],
+        max_starts=2,
+        interval=1,
+        monitor=FixedMonitor(busy=0),
+    )
+
+    assert released(schedule, 7) == [0, 1]
+    now[0] += 0.5
+    assert released(schedule, 7) == [0, 1]  # too soon for another wave
+    now[0] += 0.5
+    assert released(schedule, 7) == [0, 1, 2]  # rest of the first stage
+    now[0] += 1
+    assert released(schedule, 7) == [0, 1, 2, 3, 4]
+    assert json.loads(state.read_text())["released"] == 5
+
+
+def test_busy_cpu_holds_waves(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    now = [1000.0]
+    monkeypatch.setattr("magician.schedule.time.time", lambda: now[0])
+    schedule = Schedule(
+        path=tmp_path / "s.json",
+        stage_ends=[8],
+        max_starts=4,
+        interval=1,
+        monitor=FixedMonitor(busy=0.75),
+    )
+
+    assert released(schedule, 8) == [0]
+    schedule.monitor = FixedMonitor(busy=1)
+    now[0] += 9
+    assert released(schedule, 8) == [0]
+    now[0] += 1  # held for long enough
+    assert released(schedule, 8) == [0, 1]
+
+
+def test_gate_times_out(tmp_path: Path, capsys: pytest.CaptureFixture):
+    state = tmp_path / "s.json"
+    reset_schedule(state)
+    args = ["gate", "--state", str(state), "--max-starts", "1", "--interval", "60"]
+
+    assert main([*args, "--position", "0"]) == 0
+    assert main([*args, "--position", "1", "--timeout", "0.1"]) == 0
+    assert "without waiting for a turn" in capsys.readouterr().err
+
+
+def test_compile_gates(tmp_app_config: AppConfig, tmp_path: Path):
+    app_cfg = tmp_app_config.model_copy(update={"max_concurrent_starts": 2})
+    schema = MagicConfigSchema.model_validate(
+        {
+            "wizard": {"root": {"backend": "kitty", "nested": {"backend": "tmux"}}},
+            "project": {
+                "dir": tmp_path,
+                "setup": {
+                    "editor": {"run": ["nvim ."], "stage": 1},
+                    "services": {
+                        "nested": True,
+                        "panes": {
+                            "db": {"run": ["make db"]},
+                            "api": {"run": ["make api"], "stage": 2},
+                        },
+                    },
+                },
+            },
+        }
+    )
+
+    result = ConfigInterpreter(app_cfg=app_cfg).compile(config=schema, schema_name="s")
+
+    scripts = {path.name: path.read_text() for path in result.scripts}
+    # db goes first and so never waits, the editor and api follow in stages
+    assert "magician.schedule gate" not in scripts["s_services.sh"].split("-n api")[0]
+    assert "--position 1 --stage-ends 1,2,3" in scripts["s.conf"]
+    assert "--position 2 --stage-ends 1,2,3" in scripts["s_services.sh"]
@@ -0,0 +1,148 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cli.cli import cli
+from magician.ir.ops import Chdir, CreatePane, Exec
+from magician.settings import AppConfig, ShellType
+from magician.telemetry import (
+    Telemetry,
+    TelemetryLog,
+    command_summaries,
+    percentile,
+    ready_summaries,
+)
+from magician.utils.shell import join_command
+
+from tests.fakes import FakeTerminals
+
+
+def test_instrument(tmp_path: Path):
+    telemetry = Telemetry(path=tmp_path / "s.log")
+    ops = [
+        CreatePane("a"),
+        Chdir(Path("/srv")),
+        Exec(["make"], ["make", "serve"]),
+        CreatePane("b"),
+    ]
+
+    instrumented = telemetry.instrument(ops)
+
+    assert instrumented[:2] == ops[:2]
+    assert instrumented[2] == Exec(
+        telemetry.marker("ready", "a"),
+        telemetry.marker("start", "a", 0),
+        ["make"],
+        telemetry.marker("exit", "a", 0, code=True),
+        telemetry.marker("start", "a", 1),
+        ["make", "serve"],
+        telemetry.marker("exit", "a", 1, code=True),
+    )
+    # panes without commands still tell when their shell is up
+    assert instrumented[3:] == [CreatePane("b"), Exec(telemetry.marker("ready", "b"))]
+
+
+@pytest.mark.parametrize(
+    ("shell", "expected"),
+    [
+        (
+            ShellType.BASH,
+            r"printf '%s\t%s\t%s\t%s\t%s\n' ${EPOCHREALTIME:-$(date +%s)} "
+            "exit root/api 2 $? >> /tmp/s.log",
+        ),
+        (
+            ShellType.FISH,
+            r"printf '%s\t%s\t%s\t%s\t%s\n' (date +%s.%N) "
+            "exit root/api 2 $status >> /tmp/s.log",
+        ),
+    ],
+)
+def test_marker(shell: ShellType, expected: str):
+    telemetry = Telemetry(path=Path("/tmp/s.log"), shell=shell).scoped("root")
+
+    assert join_command(telemetry.marker("exit", "api", 2, code=True)) == expected
+
+
+def test_percentile():
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([4.0, 1.0, 2.0, 3.0], 50) == 2.5
+    assert percentile([float(value) for value in range(101)], 95) == 95.0
+
+
+def test_summaries(tmp_path: Path):
+    log = tmp_path / "s.log"
+    log.write_text(
+        "5.0\tready\tstale\t\t\n"  # from before the first run
+        "10.0\trun\t\t\t\n"
+        "10.5\tready\tapi\t\t\n"
+        "10.5\tstart\tapi\t0\t\n"
+        "12.5\texit\tapi\t0\t0\n"
+        "20.0\trun\t\t\t\n"
+        "21,5\tready\tapi\t\t\n"  # decimal comma locales
+        "21.5\tstart\tapi\t0\t\n"
+        "22.5\texit\tapi\t0\t2\n"
+        "garbage\n"
+    )
+
+    runs = TelemetryLog(log).read_runs()
+
+    (ready,) = ready_summaries(runs)
+    assert (ready.name, ready.count, ready.failed) == ("api", 2, 1)
+    assert ready.p50 == pytest.approx(1.0)
+    assert ready.p95 == pytest.approx(1.45)
+    (command,) = command_summaries(runs)
+    assert (command.name, command.count, command.failed) == ("api #0", 2, 1)
+    assert command.p50 == pytest.approx(1.5)
+
+
+SCHEMA = """
+wizard:
+  root:
+    backend: kitty
+
+project:
+  dir: {dir}
+  setup:
+    api:
+      run:
+        - "true"
+        - "false"
+"""
+
+
+def test_stats_after_runs(
+    tmp_app_config: AppConfig,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    fake_terminals: FakeTerminals,
+):
+    app_cfg = tmp_app_config.model_copy(update={"telemetry": True})
+    monkeypatch.setattr("magician.settings.get_config", lambda: app_cfg)
+    (app_cfg.schemas_folder / "work.yml").write_text(SCHEMA.format(dir=tmp_path))
+    runner = CliRunner()
+
+    for _ in range(2):
+        assert runner.invoke(cli, ["run", "work"]).exit_code == 0
+    result = runner.invoke(cli, ["stats", "work", "--commands"])
+
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0] == "2 runs of work, time from launch until panes got ready:"
+    assert lines[2].split()[:2] == ["api", "2"]
+    assert lines[2].split()[-1] == "2"  # `false` failed on both runs
+    assert [line.split()[:3] for line in lines[5:]] == [
+        ["api", "#0", "2"],
+        ["api", "#1", "2"],
+    ]
+
+
+def test_stats_without_telemetry(
+    tmp_app_config: AppConfig, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+
+    result = CliRunner().invoke(cli, ["stats", "work"])
+
+    assert result.exit_code == 0
+    assert "set `telemetry = true`" in result.output
@@ -0,0 +1,93 @@
+import sys
+import threading
+from pathlib import Path
+from typing import List, Set
+
+import pytest
+from click.testing import CliRunner
+
+from magician.cache import CompileCache, SchemaIndex
+from magician.cli.cli import cli
+from magician.runner import SchemaRunner
+from magician.settings import AppConfig
+from magician.watch import (
+    ChangeSource,
+    InotifyChangeSource,
+    PollingChangeSource,
+    SchemaWatcher,
+    precompile,
+)
+
+
+class ScriptedChangeSource(ChangeSource):
+    """Hands out the given batches of changes, one per wait."""
+
+    def __init__(self, batches: List[Set[str]], stop: threading.Event) -> None:
+        self.batches = batches
+        self.stop = stop
+
+    def wait(self, timeout: float) -> Set[str]:
+        if not self.batches:
+            self.stop.set()
+            return set()
+        return self.batches.pop(0)
+
+
+@pytest.mark.parametrize("source_cls", [PollingChangeSource, InotifyChangeSource])
+def test_change_sources_report_schema_names(tmp_path: Path, source_cls):
+    if source_cls is InotifyChangeSource and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    source = source_cls(tmp_path)
+    try:
+        (tmp_path / "notes.txt").write_text("not a schema")
+        assert source.wait(0.1) == set()
+
+        (tmp_path / "work.yml").write_text("project: {}")
+        assert source.wait(2) == {"work"}
+
+        (tmp_path / "work.yml").unlink()
+        assert source.wait(2) == {"work"}
+    finally:
+        source.close()
+
+
+def test_bursts_of_saves_are_reported_once(tmp_path: Path):
+    stop = threading.Event()
+    # an empty batch is the folder staying quiet for the debounce period
+    source = ScriptedChangeSource([{"a"}, {"a", "b"}, {"a"}, set(), {"c"}], stop)
+    watcher = SchemaWatcher(tmp_path, debounce=0.1, source=source)
+
+    assert list(watcher.changes(stop)) == [{"a", "b"}, {"c"}]
+
+
+def test_precompiled_schemas_are_cached_for_runs(
+    tmp_app_config: AppConfig, example_schema: Path
+):
+    runner = SchemaRunner(app_cfg=tmp_app_config)
+    index = SchemaIndex(app_cfg=tmp_app_config)
+
+    outcomes = precompile(runner, index, {"example", "removed"})
+
+    assert [(outcome.schema, outcome.ok) for outcome in outcomes] == [("example", True)]
+    cache = CompileCache(app_cfg=tmp_app_config)
+    key = cache.compute_key(schema_name="example", schema_path=example_schema)
+    assert cache.get(schema_name="example", key=key)
+
+
+def test_edit_reports_invalid_schema(
+    tmp_app_config: AppConfig,
+    example_schema: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    editor = tmp_path / "editor"
+    editor.write_text('#!/bin/sh\necho "project: {setup: 3}" > "$1"\n')
+    editor.chmod(0o755)
+    monkeypatch.setenv("EDITOR", str(editor))
+    monkeypatch.setattr("magician.settings.get_config", lambda: tmp_app_config)
+
+    result = CliRunner().invoke(cli, ["edit", "example"])
+
+    assert result.exit_code == 0, result.output
+    assert "fail  example: " in result.output
+    assert "wizard" in result.output  # the validation error itself
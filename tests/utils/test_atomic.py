@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from magician.plugins.kitty import KittyPlugin
+from magician.settings import AppConfig
+from magician.utils.atomic import write_lines_atomic
+
+
+def test_write_lines_atomic(tmp_path: Path):
+    path = tmp_path / "script.sh"
+    write_lines_atomic(path, iter(["a", "b", "c"]), executable=True)
+
+    assert path.read_text() == "a\nb\nc"
+    assert os.access(path, os.X_OK)
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_write_keeps_previous_file(tmp_path: Path):
+    path = tmp_path / "script.sh"
+    path.write_text("previous")
+
+    def lines() -> Iterator[str]:
+        yield "new"
+        raise RuntimeError("compile crashed")
+
+    with pytest.raises(RuntimeError):
+        write_lines_atomic(path, lines())
+
+    assert path.read_text() == "previous"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_plugin_streams_contents(tmp_app_config: AppConfig):
+    plugin = KittyPlugin(app_cfg=tmp_app_config)
+    written = []
+
+    def contents() -> Iterator[str]:
+        for index in range(3):
+            written.append(index)
+            yield f"launch {index}"
+
+    plugin.write_script(name="stream", contents=contents())
+
+    assert written == [0, 1, 2]
+    assert plugin.get_script_path(script_name="stream").read_text() == (
+        "launch 0\nlaunch 1\nlaunch 2"
+    )
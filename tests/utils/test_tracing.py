@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from magician.utils import tracing
+from magician.utils.tracing import Tracer
+
+
+@pytest.fixture
+def tracer() -> Iterator[Tracer]:
+    tracer = Tracer()
+    yield tracer
+    tracer.reset()
+
+
+def test_disabled_records_nothing(tracer: Tracer):
+    first = tracer.span("a", x=1)
+    second = tracer.span("b")
+
+    # same shared no-op object, nothing to allocate per span
+    assert first is second
+    with first:
+        pass
+    assert tracer.events == []
+
+
+def test_nested_spans(tracer: Tracer):
+    tracer.enable()
+    with tracer.span("outer", name="pane"):
+        with tracer.span("inner"):
+            pass
+
+    inner, outer = tracer.events
+    assert (inner.name, outer.name) == ("inner", "outer")
+    assert outer.args == {"name": "pane"}
+    assert outer.start_us <= inner.start_us
+    assert inner.start_us + inner.duration_us <= outer.start_us + outer.duration_us
+
+
+def test_chrome_trace(tracer: Tracer, tmp_path: Path):
+    tracer.enable()
+    with tracer.span("compile.child_pane", name="api"):
+        pass
+
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(path)
+    (event,) = json.loads(path.read_text())["traceEvents"]
+
+    assert event["ph"] == "X"
+    assert event["cat"] == "compile"
+    assert event["args"] == {"name": "api"}
+    assert {"ts", "dur", "pid", "tid"} <= event.keys()
+
+
+def test_summary(tracer: Tracer):
+    tracer.enable()
+    for _ in range(3):
+        with tracer.span("parse"):
+            pass
+
+    header, row = tracer.format_summary().splitlines()
+    assert header.split() == ["span", "count", "total", "ms", "max", "ms"]
+    assert row.split()[:2] == ["parse", "3"]
+
+
+def test_module_level_span_is_noop_by_default():
+    assert not tracing.tracer.enabled
+    with tracing.span("anything"):
+        pass
+    assert tracing.tracer.events == []